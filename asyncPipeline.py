@@ -0,0 +1,283 @@
+from playwright.async_api import async_playwright, BrowserContext, Page, TimeoutError
+import traceback
+import asyncio
+import os
+import courseTables
+import httpEngine
+import downloader
+import attendanceTable
+from requestBlocking import RequestBlocker
+from failureCapture import FailureRecorder
+
+LMS_BUTTON_SELECTOR = "#sideMenuList > a:nth-child(16)"
+
+COURSES_SCRIPT = """() => {
+    return Array.from(document.querySelectorAll('#courseId option'))
+        .filter(opt => opt.value !== "")
+        .map(opt => ({ id: opt.value, name: opt.innerText.trim() }));
+}"""
+
+BROWSER_ARGS = [
+    "--window-size=1920,1080",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions",
+    "--disable-infobars",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-logging",
+    "--log-level=3",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-component-update",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-lazy-image-loading",
+    "--disable-features=Translate,RendererCodeIntegrity,IsolateOrigins,site-per-process",
+    "--disable-animations",
+    "--mute-audio"
+]
+
+class SurveyRequiredError(Exception):
+    """
+    @brief Raised when CMS redirects to the Quality Assurance Survey instead of the LMS.
+    """
+
+class ScrapePipeline:
+    """
+    @brief Scrapes LMS assignments and CMS attendance concurrently on separate pages of one browser context.
+
+    After the CMS login, three tasks run at the same time: the assignment tables (LMS), the attendance
+    table (CMS) and the assignment downloads. A failing task is recorded in `failures` together with the
+    HTML and a screenshot of its page, the other tasks keep their results.
+    """
+    def __init__(self, enrollment_number: str, password: str, institution: int, download_dir: str = "", download_workers: int = 4, cache=None, concurrency: int = 1, table_timeout: int = 5000, error_dir: str = "", storage_state_file: str = "", debug_mode: bool = False):
+        """
+        @brief Stores the pipeline settings, nothing is started until run() is awaited.
+        @param enrollment_number The enrollment number to log in with.
+        @param password The CMS password.
+        @param institution Position of the campus in the CMS institute list.
+        @param download_dir Root directory for assignment files, empty to skip downloads.
+        @param download_workers Maximum number of assignment files downloaded at the same time.
+        @param cache Optional DownloadCache used by the downloader.
+        @param concurrency Maximum number of pages loading course tables at the same time.
+        @param table_timeout Milliseconds to wait for a course table to finish loading before skipping the course.
+        @param error_dir Directory the failure reports of failed tasks are saved to, empty to skip.
+        @param storage_state_file Optional file the context's cookies are loaded from and saved back to, so the next run can skip the login.
+        @param debug_mode Boolean flag to show the browser and print progress.
+        """
+        self.enrollment_number = enrollment_number
+        self.password = password
+        self.institution = institution
+        self.download_dir = download_dir
+        self.download_workers = download_workers
+        self.cache = cache
+        self.concurrency = concurrency
+        self.table_timeout = table_timeout
+        self.error_dir = error_dir
+        self.storage_state_file = storage_state_file
+        self.debug_mode = debug_mode
+
+        self.deadlines = []
+        self.links = []
+        self.attendance = []
+        self.failures = []
+        self.downloader = None
+        self.request_blocker = RequestBlocker()
+        self.recorder = FailureRecorder(error_dir) if error_dir else None
+
+    async def run(self, browser=None):
+        """
+        @brief Logs in and runs the assignment, attendance and download tasks concurrently.
+        @param browser Optional running Browser shared with other pipelines, a new one is launched (and closed) if None.
+        @return None, results are left in deadlines, links, attendance and failures.
+        @throws Exception If the browser cannot start or the CMS login fails, nothing can be scraped then.
+        """
+        if browser is None:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=not self.debug_mode, args=BROWSER_ARGS)
+                try:
+                    await self._run_in_context(browser)
+                finally:
+                    await browser.close()
+        else:
+            await self._run_in_context(browser)
+
+        # Failed downloads are reported without an attachment
+        self.deadlines = [
+            (*deadline, download.result() if download and download.done() and not download.cancelled() and download.exception() is None else None)
+            for *deadline, download in self.deadlines
+        ]
+
+    async def _run_in_context(self, browser):
+        """
+        @brief Runs the tasks in a new, isolated context of the browser and closes it afterwards.
+        @param browser The running Browser.
+        @return None
+        """
+        storage_state = self.storage_state_file if self.storage_state_file and os.path.exists(self.storage_state_file) else None
+        context = await browser.new_context(viewport={"width": 1920, "height": 1080}, storage_state=storage_state)
+        try:
+            context.set_default_timeout(60000)
+            await self.request_blocker.install_async(context)
+            if self.recorder:
+                self.recorder.instrument_context(context)
+
+            lms_page = await context.new_page()
+            await self._login(lms_page)
+
+            # The CMS session is enough for attendance, it does not have to wait for the LMS hand-over
+            cms_page = await context.new_page()
+            assignments = asyncio.create_task(self._capture("assignments", self._scrape_assignments(context, lms_page), lms_page))
+            attendance = asyncio.create_task(self._capture("attendance", self._scrape_attendance(cms_page), cms_page))
+            downloads = asyncio.create_task(self._capture("downloads", self._wait_for_downloads(assignments), None))
+
+            await asyncio.gather(assignments, attendance, downloads)
+
+            if self.storage_state_file:
+                os.makedirs(os.path.dirname(os.path.abspath(self.storage_state_file)), exist_ok=True)
+                await context.storage_state(path=self.storage_state_file)
+        finally:
+            # Reached on success, failure and cancellation alike, queued downloads must not outlive the run
+            if self.downloader:
+                self.downloader.executor.shutdown(wait=False, cancel_futures=True)
+            await context.close()
+
+    async def _capture(self, name: str, coroutine, page: Page):
+        """
+        @brief Awaits one task and records its failure instead of propagating it.
+        @param name The task name used in the failure record.
+        @param coroutine The coroutine of the task.
+        @param page The page of the task, its HTML and screenshot are added to the failure report if enabled, or None.
+        @return The result of the coroutine, or None if it failed.
+        """
+        try:
+            return await coroutine
+        except Exception as e:
+            failure = {"task": name, "error": e, "traceback": traceback.format_exc(), "report_file": ""}
+            self.failures.append(failure)
+            print(f"Task {name} failed: {e}")
+
+            if self.recorder:
+                try:
+                    failure["report_file"] = await self.recorder.save_async(name, e, page)
+                except Exception as inner_e:
+                    print(f"Failed to save debug info for {name}: {inner_e}")
+            return None
+
+    async def _login(self, page: Page):
+        """
+        @brief Logs in to CMS, unless the stored state is still logged in, and waits until the dashboard is shown.
+        @param page The page to log in on, it later continues to the LMS.
+        @return None
+        """
+        await page.goto(httpEngine.CMS_LOGIN_URL)
+        if "Login.aspx" in page.url:
+            await page.fill("#BodyPH_tbEnrollment", self.enrollment_number)
+            await page.fill("#BodyPH_tbPassword", self.password)
+            await page.select_option("#BodyPH_ddlInstituteID", "1")
+            await page.click(f"#pageContent > div.container-fluid > div.row > div > div:nth-child({self.institution})")
+            await page.click("#BodyPH_btnLogin")
+        elif self.debug_mode:
+            print(f"Reusing the stored session of {self.enrollment_number}")
+        await page.wait_for_selector(LMS_BUTTON_SELECTOR)
+        print(f"Logged in as {self.enrollment_number}")
+
+    async def _scrape_assignments(self, context: BrowserContext, page: Page):
+        """
+        @brief Opens the LMS from the CMS dashboard and extracts every course table, queueing downloads as they are found.
+        @param context The browser context, extra pages are opened in it when concurrency > 1.
+        @param page The page showing the CMS dashboard.
+        @return None
+        """
+        lms_button = await page.wait_for_selector(LMS_BUTTON_SELECTOR)
+        await page.evaluate("el => el.removeAttribute('target')", lms_button)
+        # The survey redirect is only visible in the URL once the click has navigated
+        async with page.expect_navigation():
+            await lms_button.click()
+
+        if "QualityAssuranceSurveys.aspx" in page.url:
+            raise SurveyRequiredError("Please complete the Quality Assurance Survey to proceed.")
+
+        await page.goto(courseTables.ASSIGNMENTS_URL, wait_until="commit")
+        await page.wait_for_selector("#courseId", state="attached")
+        courses = await page.evaluate(COURSES_SCRIPT)
+
+        if self.download_dir:
+            session = httpEngine.session_from_cookies(await context.cookies(), self.download_workers)
+            self.downloader = downloader.AssignmentDownloader(session, self.download_dir, self.download_workers, cache=self.cache, debug_mode=self.debug_mode)
+
+        course_deadlines = [[] for _ in courses]
+        queue = asyncio.Queue()
+        for index, course in enumerate(courses):
+            queue.put_nowait((index, course))
+
+        async def worker(worker_page: Page):
+            if worker_page is not page:
+                await worker_page.goto(courseTables.ASSIGNMENTS_URL, wait_until="commit")
+            await worker_page.wait_for_selector("#courseId", state="attached")
+            # Rows of the default course parsed after the select would not be marked as stale
+            await worker_page.wait_for_load_state("domcontentloaded")
+
+            while not queue.empty():
+                index, course = queue.get_nowait()
+                await worker_page.evaluate(courseTables.MARK_AND_SELECT_SCRIPT, course["id"])
+                try:
+                    await worker_page.wait_for_function(courseTables.TABLE_READY_SCRIPT, timeout=self.table_timeout)
+                except TimeoutError:
+                    print(f"The table of {course['name']} did not load")
+                    continue
+                table_data = await worker_page.evaluate(courseTables.TABLE_SCRIPT)
+                course_deadlines[index] = [
+                    (*deadline, download)
+                    for deadline, download in courseTables.table_deadlines(course['name'], table_data, self._download if self.downloader else None)
+                ]
+
+        worker_pages = [page]
+        try:
+            for _ in range(max(1, min(self.concurrency, len(courses))) - 1):
+                worker_pages.append(await context.new_page())
+            await asyncio.gather(*(worker(worker_page) for worker_page in worker_pages))
+        finally:
+            for worker_page in worker_pages[1:]:
+                await worker_page.close()
+
+        self.deadlines = [deadline for deadlines_of_course in course_deadlines for deadline in deadlines_of_course]
+
+    def _download(self, subject_name: str, assignment_name: str, deadline_date: str, link: str):
+        """
+        @brief Queues an assignment file on the downloader and remembers its link.
+        @param subject_name The name of the subject for the assignment.
+        @param assignment_name The name of the assignment.
+        @param deadline_date The deadline date formatted as string.
+        @param link The URL link to the assignment file.
+        @return Future resolving to the final path of the file.
+        """
+        self.links.append(link)
+        return self.downloader.submit(subject_name, assignment_name, deadline_date, link)
+
+    async def _scrape_attendance(self, page: Page):
+        """
+        @brief Reads the attendance table from CMS in one evaluate call.
+        @param page A page of the logged-in context.
+        @return None
+        """
+        await page.goto(httpEngine.CMS_ATTENDANCE_URL)
+        if "Login.aspx" in page.url:
+            raise httpEngine.SessionExpiredError(f"Redirected to {page.url}")
+        self.attendance = attendanceTable.attendance_rows(await page.evaluate(attendanceTable.ATTENDANCE_SCRIPT))
+
+    async def _wait_for_downloads(self, assignments: asyncio.Task):
+        """
+        @brief Waits for the downloads queued by the assignment task without blocking the event loop.
+        @param assignments The assignment task, downloads keep being queued until it finishes.
+        @return None
+        @throws RuntimeError If any download failed.
+        """
+        await assignments
+        if self.downloader is None:
+            return
+
+        failures = await asyncio.to_thread(self.downloader.wait)
+        if failures:
+            raise RuntimeError(f"{len(failures)} download(s) failed: " + ", ".join(description for description, _ in failures))
@@ -0,0 +1,44 @@
+import re
+
+# Reads the whole attendance table in one round trip: the header texts and the texts of every body cell
+ATTENDANCE_SCRIPT = """() => {
+    const table = document.querySelector("#pageContent > div.container-fluid > div.table-responsive > table");
+    if (!table) return { headers: [], rows: [] };
+    const text = cell => cell.innerText.replace(/\\s+/g, " ").trim();
+    return {
+        headers: Array.from(table.querySelectorAll("thead th")).map(text),
+        rows: Array.from(table.querySelectorAll("tbody > tr")).map(row => Array.from(row.querySelectorAll("td")).map(text))
+    };
+}"""
+
+# Positions of the columns the scripts rely on
+SUBJECT_COLUMN = 2
+CREDITS_COLUMN = 3
+ABSENCES_COLUMN = 10
+
+def column_key(header: str) -> str:
+    """
+    @brief Turns a header text into a dictionary key, e.g. "Classes Held" into "classes_held".
+    @param header The header text.
+    @return The key.
+    """
+    return re.sub(r"\W+", "_", header.lower()).strip("_")
+
+def attendance_rows(table: dict) -> list:
+    """
+    @brief Converts the result of ATTENDANCE_SCRIPT (or the equivalent from httpEngine) into one dictionary per subject.
+    @param table Dictionary with the header texts and the cell texts of every row.
+    @return List of dictionaries with subject, credits and absences, every cell text in cells and,
+            when the table has a header, every column by its header in columns (e.g. columns["percentage"]).
+    """
+    keys = [column_key(header) or f"column_{index}" for index, header in enumerate(table["headers"])]
+    return [
+        {
+            "subject": cells[SUBJECT_COLUMN],
+            "credits": cells[CREDITS_COLUMN],
+            "absences": cells[ABSENCES_COLUMN],
+            "cells": cells,
+            "columns": dict(zip(keys, cells))
+        }
+        for cells in table["rows"] if len(cells) > ABSENCES_COLUMN
+    ]
@@ -0,0 +1,180 @@
+from playwright.async_api import async_playwright
+from datetime import datetime
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import json
+import os
+import asyncPipeline
+import checkAttendance
+import githubActions
+from downloadCache import DownloadCache, CACHE_FILE_NAME
+from notifications import NtfyClient
+from stateStore import StateStore, STATE_FILE_NAME
+
+load_dotenv()
+accounts_file = os.getenv("ACCOUNTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "accounts.json"))
+batch_data_dir = os.getenv("BATCH_DATA_DIR", os.path.join(os.path.expanduser("~"), ".bahria", "accounts"))
+batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "2"))
+notification_level = int(os.getenv("NOTIFICATION_LEVEL", "0"))
+instituition = int(os.getenv("INSTITUTION", "6"))
+
+STORAGE_STATE_FILE_NAME = "storageState.json"
+
+def load_accounts(path: str) -> list:
+    """
+    @brief Reads the list of accounts from a JSON file.
+    @param path Path of the accounts file, a list of objects with at least enrollment_number and password.
+    @return List of account dictionaries.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        accounts = json.load(f)
+
+    for account in accounts:
+        if not account.get("enrollment_number") or not account.get("password"):
+            print(f"Error: every account in {path} needs an enrollment_number and a password.")
+            exit(1)
+
+    return accounts
+
+def report_account(account: dict, pipeline: asyncPipeline.ScrapePipeline, state: StateStore, debug_mode: bool):
+    """
+    @brief Prints the report of one account and sends its notifications for whatever changed since its last run.
+    @param account The account dictionary.
+    @param pipeline The finished pipeline of the account.
+    @param state The StateStore of the account.
+    @param debug_mode Boolean flag to enable debug output.
+    @return None
+    """
+    name = account.get("name", account["enrollment_number"])
+    ntfy = NtfyClient(account["ntfy_server"]) if account.get("ntfy_server") else None
+    today = datetime.today().date()
+
+    lines = [f"=== {name} ==="]
+
+    parsed_deadlines = []
+    for assignment_number, subject, date_str, submitted, extended, final_path in pipeline.deadlines:
+        deadline_date = datetime.strptime(date_str, "%d %B %Y").date()
+        parsed_deadlines.append((assignment_number, subject, deadline_date, (deadline_date - today).days, submitted, extended, final_path))
+    parsed_deadlines.sort(key=lambda x: x[3])
+
+    for assignment_number, subject, deadline_date, days_left, submitted, extended, final_path in parsed_deadlines:
+        display_date = deadline_date.strftime("%#d %B") if os.name == "nt" else deadline_date.strftime("%-d %B")
+        lines.append(f"A{assignment_number} {subject} - {display_date} ({days_left} Days Left){' (Submitted)' if submitted else ''}{' (Extended)' if extended else ''}")
+
+    for row in pipeline.attendance:
+        left, allowed = checkAttendance.classes_left(row["subject"], row["credits"], row["absences"])
+        lines.append(f"{row['subject']}: {checkAttendance.format_number(left)}/{checkAttendance.format_number(allowed)}")
+
+    for failure in pipeline.failures:
+        lines.append(f"Failed to check {failure['task']}: {failure['error']}")
+        if failure["report_file"]:
+            lines.append(f"Failure report: {failure['report_file']}")
+        if debug_mode:
+            lines.append(failure["traceback"])
+
+    if debug_mode:
+        lines.append(pipeline.request_blocker.summary())
+
+    print("\n".join(lines) + "\n")
+
+    # Same rules as githubActions.py, and like there nothing is recorded without a notifier so a topic added later still gets every deadline
+    if ntfy:
+        level = int(account.get("notification_level", notification_level))
+        notifications = githubActions.deadline_notifications(pipeline.deadlines, state, level, f" ({name})")
+        notifications += githubActions.attendance_alerts(pipeline.attendance, state, title_suffix=f" ({name})")
+        githubActions.send_notifications(ntfy, notifications, bool(account.get("digest", False)))
+
+async def run_account(browser, semaphore: asyncio.Semaphore, account: dict, download_workers: int, debug_mode: bool):
+    """
+    @brief Scrapes one account in its own context once a slot of the semaphore is free, then reports it.
+    @param browser The Browser shared by all accounts.
+    @param semaphore Semaphore bounding the number of accounts scraped at the same time.
+    @param account The account dictionary.
+    @param download_workers Maximum number of assignment files downloaded at the same time per account.
+    @param debug_mode Boolean flag to enable debug output.
+    @return True if the account was checked without failures.
+    """
+    account_dir = os.path.join(batch_data_dir, account["enrollment_number"])
+    download_dir = account.get("download_dir", "")
+
+    pipeline = asyncPipeline.ScrapePipeline(
+        account["enrollment_number"],
+        account["password"],
+        int(account.get("institution", instituition)),
+        download_dir=download_dir,
+        download_workers=download_workers,
+        cache=DownloadCache(os.path.join(account_dir, CACHE_FILE_NAME)) if download_dir else None,
+        concurrency=int(account.get("concurrency", 1)),
+        error_dir=os.path.join(account_dir, "error_logs"),
+        storage_state_file=os.path.join(account_dir, STORAGE_STATE_FILE_NAME),
+        debug_mode=debug_mode
+    )
+
+    async with semaphore:
+        try:
+            await pipeline.run(browser)
+        except Exception as e:
+            # Only the login can fail here, the other accounts carry on
+            pipeline.failures.append({"task": "login", "error": e, "traceback": "", "report_file": ""})
+
+    state = StateStore(os.path.join(account_dir, STATE_FILE_NAME), "batchAccounts")
+    try:
+        report_account(account, pipeline, state, debug_mode)
+    finally:
+        state.close()
+
+    return not pipeline.failures
+
+async def run_batch(accounts: list, concurrency: int, download_workers: int, debug_mode: bool) -> int:
+    """
+    @brief Checks every account in its own isolated context of a single Chromium process.
+    @param accounts List of account dictionaries.
+    @param concurrency Maximum number of accounts checked at the same time.
+    @param download_workers Maximum number of assignment files downloaded at the same time per account.
+    @param debug_mode Boolean flag to show the browser and enable debug output.
+    @return Number of accounts with failures.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not debug_mode, args=asyncPipeline.BROWSER_ARGS)
+        try:
+            results = await asyncio.gather(*(run_account(browser, semaphore, account, download_workers, debug_mode) for account in accounts))
+        finally:
+            await browser.close()
+
+    return results.count(False)
+
+def parse_args():
+    """
+    @brief Parses command-line arguments for the batch checker.
+    @return Parsed arguments object with accounts, concurrency, download_workers and debug options.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--accounts", default=accounts_file, help="JSON file with the accounts to check")
+    parser.add_argument("-c", "--concurrency", type=int, default=batch_concurrency, help="Number of accounts checked at the same time")
+    parser.add_argument("-j", "--download-workers", type=int, default=4, help="Number of assignment files downloaded in parallel per account")
+    parser.add_argument("-d", "--debug", action="store_true", help="Enable debug mode")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        args = parse_args()
+
+        if not os.path.exists(args.accounts):
+            print(f"Error: accounts file {args.accounts} not found.")
+            exit(1)
+
+        accounts = load_accounts(args.accounts)
+        failed = asyncio.run(run_batch(accounts, args.concurrency, args.download_workers, args.debug))
+
+        if failed:
+            print(f"{failed} of {len(accounts)} accounts could not be checked completely.")
+            exit(1)
+    except KeyboardInterrupt:
+        print("Stopped.")
+        exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        exit(1)
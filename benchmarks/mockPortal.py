@@ -0,0 +1,543 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from html import escape
+import threading
+import argparse
+import secrets
+import random
+import json
+import time
+
+# LMS and CMS are separate hosts on the real portals, two loopback addresses keep their cookies apart the same way
+LMS_HOST = "127.0.0.2"
+CMS_HOST = "127.0.0.1"
+
+COURSE_NAMES = [
+    "Operating Systems",
+    "Operating Systems Lab",
+    "Theory of Automata",
+    "Artificial Intelligence",
+    "Artificial Intelligence Lab",
+    "Computer Architecture",
+    "Computer Architecture Lab",
+    "Design and Analysis of Algorithms"
+]
+
+TEACHER_GROUPS = {0: 13, 1: 5}
+COURSE_GROUPS = {0: 3, 1: 3, 2: 4, 3: 4, 4: 3, 5: 3, 6: 4, 7: 3, 8: 2}
+DEMOGRAPHIC_GROUP = 11
+DEMOGRAPHIC_QUESTIONS = 6
+RADIO_PREFIX = "BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions"
+
+class PortalFixtures:
+    """
+    @brief Deterministic courses, assignments, attendance and surveys served by the mock portals.
+    """
+    def __init__(self, courses: int = 6, assignments: int = 4, surveys: int = 4, file_size: int = 64, seed: int = 1):
+        """
+        @brief Generates the fixtures.
+        @param courses Number of courses in the dropdown and the attendance table.
+        @param assignments Number of assignments per course.
+        @param surveys Number of pending Quality Assurance surveys.
+        @param file_size Size of each assignment file in KiB.
+        @param seed Seed of the generator, equal seeds give equal fixtures.
+        """
+        rng = random.Random(seed)
+        today = datetime.today().date()
+
+        self.courses = []
+        for index in range(courses):
+            name = COURSE_NAMES[index % len(COURSE_NAMES)]
+            if index >= len(COURSE_NAMES):
+                name = f"{name} {index // len(COURSE_NAMES) + 1}"
+            self.courses.append({"id": str(1000 + index), "name": name, "credits": "1" if name.split()[-1] == "Lab" else "3", "absences": str(rng.randint(0, 6))})
+
+        self.assignments = {}
+        file_id = 0
+        for course in self.courses:
+            rows = []
+            for number in range(1, assignments + 1):
+                file_id += 1
+                rows.append({
+                    "number": str(number),
+                    "name": f"Assignment {number}",
+                    "file_id": str(file_id),
+                    "deadline": (today + timedelta(days=rng.randint(0, 20))).strftime("%d %B %Y"),
+                    "submitted": rng.random() < 0.3,
+                    "extended": rng.random() < 0.2
+                })
+            self.assignments[course["id"]] = rows
+
+        self.file_size = file_size * 1024
+        self.surveys = [
+            {
+                "id": str(index + 1),
+                "form": "Teacher Evaluation Form" if index % 2 == 0 else "Course Evaluation Form",
+                "course": self.courses[index % len(self.courses)]["name"] if self.courses else f"Course {index + 1}",
+                "teacher": f"Teacher {index + 1}"
+            }
+            for index in range(surveys)
+        ]
+
+class MockPortal:
+    """
+    @brief Serves a local copy of the LMS and CMS pages the scripts use, with configurable latency.
+    """
+    def __init__(self, fixtures: PortalFixtures, enrollment_number: str = "01-134221-001", password: str = "password", latency: float = 0.0, gate_surveys: bool = False, lms_port: int = 0, cms_port: int = 0):
+        """
+        @brief Binds both servers, nothing is served until start() is called.
+        @param fixtures The data served by the portals.
+        @param enrollment_number The only account that can log in.
+        @param password The password of that account.
+        @param latency Seconds every response is delayed by.
+        @param gate_surveys Boolean flag to redirect the CMS login to the survey page while surveys are pending.
+        @param lms_port Port of the LMS server, 0 picks a free one.
+        @param cms_port Port of the CMS server, 0 picks a free one.
+        """
+        self.fixtures = fixtures
+        self.enrollment_number = enrollment_number
+        self.password = password
+        self.latency = latency
+        self.gate_surveys = gate_surveys
+
+        self.lock = threading.Lock()
+        self.cms_sessions = set()
+        self.lms_sessions = set()
+        self.completed_surveys = set()
+        self.requests = {}
+        self.bytes_sent = 0
+        self.notifications = []
+
+        self.lms_server = ThreadingHTTPServer((LMS_HOST, lms_port), self._handler("lms"))
+        self.cms_server = ThreadingHTTPServer((CMS_HOST, cms_port), self._handler("cms"))
+        self.lms_url = f"http://{LMS_HOST}:{self.lms_server.server_address[1]}"
+        self.cms_url = f"http://{CMS_HOST}:{self.cms_server.server_address[1]}"
+        self.threads = []
+
+    def start(self):
+        """
+        @brief Serves both portals on background threads.
+        @return self, so the portal can be created and started in one expression.
+        """
+        for server in (self.lms_server, self.cms_server):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        """
+        @brief Shuts both servers down.
+        @return None
+        """
+        for server in (self.lms_server, self.cms_server):
+            server.shutdown()
+            server.server_close()
+
+    def reset_surveys(self):
+        """
+        @brief Marks every survey as pending again.
+        @return None
+        """
+        with self.lock:
+            self.completed_surveys.clear()
+
+    def stats(self) -> dict:
+        """
+        @brief Returns a snapshot of the request counters.
+        @return Dictionary with total requests, requests per "portal path", bytes sent and notifications received.
+        """
+        with self.lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "paths": dict(self.requests),
+                "bytes_sent": self.bytes_sent,
+                "notifications": len(self.notifications),
+                "surveys_completed": len(self.completed_surveys)
+            }
+
+    def _handler(self, portal_name: str):
+        """
+        @brief Builds the request handler class of one portal.
+        @param portal_name Either "lms" or "cms".
+        @return BaseHTTPRequestHandler subclass bound to this portal.
+        """
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                portal._dispatch(self, portal_name, "GET")
+
+            def do_POST(self):
+                portal._dispatch(self, portal_name, "POST")
+
+            def do_PUT(self):
+                portal._dispatch(self, portal_name, "PUT")
+
+        return Handler
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, portal_name: str, method: str):
+        """
+        @brief Counts, delays and routes one request.
+        @return None
+        """
+        url = urlsplit(handler.path)
+        with self.lock:
+            key = f"{portal_name} {url.path}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = b""
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length:
+            body = handler.rfile.read(length)
+
+        cookies = SimpleCookie(handler.headers.get("Cookie", ""))
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        form = {key: values[0] for key, values in parse_qs(body.decode("utf-8", "replace")).items()}
+
+        if portal_name == "lms":
+            self._route_lms(handler, method, url.path, query, cookies)
+        else:
+            self._route_cms(handler, method, url.path, query, form, cookies, body)
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8", headers: dict = None):
+        """
+        @brief Writes a complete response.
+        @return None
+        """
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(body)
+        with self.lock:
+            self.bytes_sent += len(body)
+
+    def _redirect(self, handler: BaseHTTPRequestHandler, location: str, cookie: str = ""):
+        """
+        @brief Sends a 302 redirect, optionally setting a cookie.
+        @return None
+        """
+        headers = {"Location": location}
+        if cookie:
+            headers["Set-Cookie"] = cookie
+        self._send(handler, 302, headers=headers)
+
+    def _html(self, handler: BaseHTTPRequestHandler, html: str):
+        """
+        @brief Sends an HTML page.
+        @return None
+        """
+        self._send(handler, 200, html.encode("utf-8"))
+
+    # ---------------------------------------------------------------- LMS
+
+    def _route_lms(self, handler, method: str, path: str, query: dict, cookies: SimpleCookie):
+        """
+        @brief Serves the LMS pages.
+        @return None
+        """
+        session = cookies["PHPSESSID"].value if "PHPSESSID" in cookies else ""
+        logged_in = session in self.lms_sessions
+
+        if path == "/Student/sso.php":
+            if query.get("token") in self.cms_sessions:
+                session = secrets.token_hex(16)
+                with self.lock:
+                    self.lms_sessions.add(session)
+                return self._redirect(handler, "/Student/", f"PHPSESSID={session}; Path=/")
+            return self._redirect(handler, "/")
+
+        if path == "/Student/includes/studentprocess.php":
+            with self.lock:
+                self.lms_sessions.discard(session)
+            return self._redirect(handler, "/", "PHPSESSID=; Path=/; Max-Age=0")
+
+        # Like the real LMS, a missing session sends the user back to the CMS login
+        if path.startswith("/Student/") and not logged_in:
+            return self._redirect(handler, f"{self.cms_url}/Logins/Student/Login.aspx")
+
+        if path == "/Student/":
+            return self._html(handler, self._lms_page("<h1>Dashboard</h1>"))
+
+        if path == "/Student/Assignments.php":
+            course_id = query.get("s", "")
+            rows = self._assignment_rows(course_id)
+            if query.get("ajax"):
+                return self._html(handler, rows)
+            return self._html(handler, self._lms_page(self._assignments_content(course_id, rows)))
+
+        if path == "/Student/download.php":
+            return self._download(handler, query.get("id", ""))
+
+        if path == "/":
+            return self._html(handler, "<html><body><h1>LMS</h1><p>Please log in through CMS.</p></body></html>")
+
+        self._send(handler, 404, b"Not Found", "text/plain")
+
+    def _lms_page(self, content: str) -> str:
+        """
+        @brief Wraps LMS content in the layout with the user menu the scripts read the enrollment number from.
+        @return The HTML page.
+        """
+        return f"""<!DOCTYPE html><html><head><title>LMS</title></head><body>
+<div class="wrapper">
+<header class="main-header"><nav class="navbar"><div class="navbar-custom-menu"><ul class="nav navbar-nav">
+<li class="dropdown user user-menu"><a href="#">Student</a><ul class="dropdown-menu">
+<li class="user-header"><p>Mock Student - {escape(self.enrollment_number)}</p></li>
+</ul></li></ul></div></nav></header>
+<div class="content-wrapper">{content}</div>
+</div></body></html>"""
+
+    def _assignments_content(self, course_id: str, rows: str) -> str:
+        """
+        @brief Builds Assignments.php with the course dropdown and the table of the selected course.
+        @return The page content.
+        """
+        options = "".join(
+            f'<option value="{course["id"]}"{" selected" if course["id"] == course_id else ""}>{escape(course["name"])}</option>'
+            for course in self.fixtures.courses
+        )
+        return f"""<select id="courseId" name="courseId"><option value="">Select Course</option>{options}</select>
+<table class="table table-hover"><tbody>{rows}</tbody></table>
+<script>
+document.querySelector("#courseId").addEventListener("change", async (event) => {{
+    const response = await fetch("Assignments.php?ajax=1&s=" + encodeURIComponent(event.target.value));
+    document.querySelector("table.table-hover tbody").innerHTML = await response.text();
+}});
+</script>"""
+
+    def _assignment_rows(self, course_id: str) -> str:
+        """
+        @brief Builds the table body of one course, the first row is the header row.
+        @return HTML of the table rows.
+        """
+        rows = ["<tr><th>#</th><th>Title</th><th>File</th><th>Description</th><th>Start</th><th>Marks</th><th>Action</th><th>Deadline</th></tr>"]
+        for assignment in self.fixtures.assignments.get(course_id, []):
+            action = "Delete" if assignment["submitted"] else "Submit"
+            title = "Extended" if assignment["extended"] else ""
+            rows.append(
+                f'<tr><td>{assignment["number"]}</td><td>{escape(assignment["name"])}</td>'
+                f'<td><a href="download.php?id={assignment["file_id"]}">Download</a></td>'
+                f'<td>Mock assignment</td><td>-</td><td>10</td>'
+                f'<td><a href="#">{action}</a></td>'
+                f'<td><small title="{title}">{assignment["deadline"]} - open</small></td></tr>'
+            )
+        return "".join(rows)
+
+    def _download(self, handler, file_id: str):
+        """
+        @brief Serves an assignment file with an ETag, answering 304 to a matching If-None-Match.
+        @return None
+        """
+        etag = f'"{file_id}-{self.fixtures.file_size}"'
+        if handler.headers.get("If-None-Match") == etag:
+            return self._send(handler, 304, headers={"ETag": etag})
+
+        line = f"%PDF-1.4 mock assignment {file_id}\n".encode("utf-8")
+        content = (line * (self.fixtures.file_size // len(line) + 1))[:self.fixtures.file_size]
+        self._send(handler, 200, content, "application/pdf", {
+            "ETag": etag,
+            "Content-Disposition": f'attachment; filename="Assignment_{file_id}.pdf"'
+        })
+
+    # ---------------------------------------------------------------- CMS
+
+    def _route_cms(self, handler, method: str, path: str, query: dict, form: dict, cookies: SimpleCookie, body: bytes):
+        """
+        @brief Serves the CMS pages and a minimal ntfy endpoint.
+        @return None
+        """
+        session = cookies["cms"].value if "cms" in cookies else ""
+        logged_in = session in self.cms_sessions
+
+        if path.startswith("/ntfy/"):
+            with self.lock:
+                self.notifications.append({"topic": path[len("/ntfy/"):], "title": handler.headers.get("Title", ""), "size": len(body)})
+            return self._send(handler, 200, json.dumps({"id": secrets.token_hex(6), "event": "message"}).encode("utf-8"), "application/json")
+
+        if path == "/Logins/Student/Login.aspx":
+            if method == "POST":
+                if form.get("enrollment") == self.enrollment_number and form.get("password") == self.password:
+                    session = secrets.token_hex(16)
+                    with self.lock:
+                        self.cms_sessions.add(session)
+                    return self._redirect(handler, self._landing_page(), f"cms={session}; Path=/")
+                return self._html(handler, self._login_page("Invalid enrollment number or password."))
+            if logged_in:
+                return self._redirect(handler, self._landing_page())
+            return self._html(handler, self._login_page())
+
+        if path == "/Sys/Student/Logoff.aspx":
+            with self.lock:
+                self.cms_sessions.discard(session)
+            return self._redirect(handler, "/Logins/Student/Login.aspx", "cms=; Path=/; Max-Age=0")
+
+        if not logged_in:
+            return self._redirect(handler, "/Logins/Student/Login.aspx")
+
+        if path == "/Sys/Student/Home.aspx":
+            return self._html(handler, self._cms_page(session, "<h1>Dashboard</h1>"))
+
+        if path == "/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx":
+            return self._html(handler, self._cms_page(session, self._attendance_content()))
+
+        if path == "/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx":
+            return self._html(handler, self._cms_page(session, self._surveys_content()))
+
+        if path == "/Sys/Student/QualityAssurance/SurveyStudentCourseWise.aspx":
+            survey = next((survey for survey in self.fixtures.surveys if survey["id"] == query.get("id")), None)
+            if survey is None:
+                return self._send(handler, 404, b"Not Found", "text/plain")
+            if method == "POST":
+                with self.lock:
+                    self.completed_surveys.add(survey["id"])
+                return self._redirect(handler, "/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx")
+            return self._html(handler, self._cms_page(session, self._survey_form(survey)))
+
+        self._send(handler, 404, b"Not Found", "text/plain")
+
+    def _landing_page(self) -> str:
+        """
+        @brief Returns where CMS sends a logged-in user, the survey list while surveys hold the account.
+        @return The path of the page.
+        """
+        if self.gate_surveys and len(self.completed_surveys) < len(self.fixtures.surveys):
+            return "/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx"
+        return "/Sys/Student/Home.aspx"
+
+    def _login_page(self, message: str = "") -> str:
+        """
+        @brief Builds Login.aspx with the fields and campus tiles the scripts fill in.
+        @return The HTML page.
+        """
+        campuses = "".join(f'<div class="campus" onclick="document.querySelector(\'#campus\').value={index}">Campus {index}</div>' for index in range(1, 11))
+        return f"""<!DOCTYPE html><html><head><title>CMS Login</title></head><body>
+<div id="pageContent"><div class="container-fluid">
+<div class="row"><div class="col">{campuses}</div></div>
+<form method="post" action="Login.aspx">
+<p>{escape(message)}</p>
+<input id="BodyPH_tbEnrollment" name="enrollment" type="text">
+<input id="BodyPH_tbPassword" name="password" type="password">
+<select id="BodyPH_ddlInstituteID" name="institute"><option value="">Select</option><option value="1">Bahria University</option></select>
+<input id="campus" name="campus" type="hidden">
+<button id="BodyPH_btnLogin" type="submit">Login</button>
+</form>
+</div></div></body></html>"""
+
+    def _cms_page(self, session: str, content: str) -> str:
+        """
+        @brief Wraps CMS content in the layout with the profile menu and the side menu linking to the LMS.
+        @return The HTML page.
+        """
+        menu = "".join(f'<a href="/Sys/Student/Home.aspx">Item {index}</a>' for index in range(1, 16))
+        menu += f'<a href="{self.lms_url}/Student/sso.php?token={session}" target="_blank">LMS</a>'
+        return f"""<!DOCTYPE html><html><head><title>CMS</title></head><body>
+<nav id="AccountsNavbar"><ul><li><span id="ProfileInfo_lblUsername">{escape(self.enrollment_number)}</span>
+<a id="ProfileInfo_hlLogoff" href="/Sys/Student/Logoff.aspx">Log off</a></li></ul></nav>
+<div id="sideMenuList">{menu}</div>
+<div id="pageContent"><div class="container-fluid">{content}</div></div>
+</body></html>"""
+
+    def _attendance_content(self) -> str:
+        """
+        @brief Builds the StudentWiseAttendance.aspx table.
+        @return The page content.
+        """
+        rows = []
+        for index, course in enumerate(self.fixtures.courses, start=1):
+            classes = 32 if course["credits"] != "1" else 16
+            absences = int(course["absences"])
+            cells = [str(index), f"CSC-{300 + index}", escape(course["name"]), course["credits"], "A", "Mock Teacher", str(classes), str(classes - absences), str(absences), "0", str(absences), f"{(classes - absences) / classes * 100:.0f}%"]
+            rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+        header = "".join(f"<th>{name}</th>" for name in ["#", "Code", "Course", "Credits", "Section", "Teacher", "Classes", "Present", "Absent", "Leave", "Absences", "Percentage"])
+        return f'<div class="table-responsive"><table class="table"><thead><tr>{header}</tr></thead><tbody>{"".join(rows)}</tbody></table></div>'
+
+    def _surveys_content(self) -> str:
+        """
+        @brief Builds the QualityAssuranceSurveys.aspx list of pending surveys.
+        @return The page content.
+        """
+        rows = []
+        for index, survey in enumerate(self.fixtures.surveys, start=1):
+            if survey["id"] in self.completed_surveys:
+                continue
+            rows.append(
+                f'<tr><td>{index}</td><td>Fall</td><td>{survey["form"]} (Not Conducted)</td>'
+                f'<td>{escape(survey["course"])}<br><small>CSC-{300 + index}</small></td><td>{escape(survey["teacher"])}</td>'
+                f'<td><a href="SurveyStudentCourseWise.aspx?id={survey["id"]}">Fill</a></td></tr>'
+            )
+        return f'<table id="BodyPH_gvSurveyConducts"><thead><tr><th>#</th><th>Semester</th><th>Survey</th><th>Course</th><th>Teacher</th><th></th></tr></thead><tbody>{"".join(rows)}</tbody></table>'
+
+    def _survey_form(self, survey: dict) -> str:
+        """
+        @brief Builds a survey form with the radio button IDs the survey filler targets.
+        @return The page content.
+        """
+        groups = dict(TEACHER_GROUPS if survey["form"] == "Teacher Evaluation Form" else COURSE_GROUPS)
+        if survey["form"] != "Teacher Evaluation Form":
+            groups[DEMOGRAPHIC_GROUP] = DEMOGRAPHIC_QUESTIONS
+
+        questions = []
+        for group_index, question_count in groups.items():
+            for question_number in range(question_count):
+                options = 3 if group_index == DEMOGRAPHIC_GROUP else 5
+                radios = "".join(
+                    f'<input type="radio" id="{RADIO_PREFIX}_{group_index}_rbl_{question_number}_{option}_{question_number}" '
+                    f'name="{RADIO_PREFIX}_{group_index}_rbl_{question_number}" value="{option}">'
+                    for option in range(options)
+                )
+                questions.append(f'<div id="{RADIO_PREFIX}_{group_index}_divOptions_{question_number}"><label>Question {group_index}.{question_number + 1}</label>{radios}</div>')
+
+        return f"""<form method="post" action="SurveyStudentCourseWise.aspx?id={survey["id"]}">
+<span id="BodyPH_surveyUserControl_lbName">{survey["form"]}</span>
+{"".join(questions)}
+<input type="submit" id="BodyPH_surveyUserControl_btnSubmit" value="Submit">
+</form>"""
+
+def parse_args():
+    """
+    @brief Parses command-line arguments for running the mock portals on their own.
+    @return Parsed arguments object.
+    """
+    parser = argparse.ArgumentParser(description="Serve a local mock of the LMS and CMS")
+    parser.add_argument("--courses", type=int, default=6, help="Number of courses")
+    parser.add_argument("--assignments", type=int, default=4, help="Number of assignments per course")
+    parser.add_argument("--surveys", type=int, default=4, help="Number of pending surveys")
+    parser.add_argument("--file-size", type=int, default=64, help="Size of each assignment file in KiB")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds every response is delayed by")
+    parser.add_argument("--gate-surveys", action="store_true", help="Redirect the login to the surveys while they are pending")
+    parser.add_argument("--lms-port", type=int, default=8801, help="Port of the LMS")
+    parser.add_argument("--cms-port", type=int, default=8802, help="Port of the CMS")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    fixtures = PortalFixtures(args.courses, args.assignments, args.surveys, args.file_size)
+    portal = MockPortal(fixtures, latency=args.latency / 1000, gate_surveys=args.gate_surveys, lms_port=args.lms_port, cms_port=args.cms_port).start()
+
+    print("Mock portals are running, point the scripts at them with:")
+    print(f"LMS_BASE_URL={portal.lms_url}")
+    print(f"CMS_BASE_URL={portal.cms_url}")
+    print(f"NTFY_BASE_URL={portal.cms_url}/ntfy")
+    print(f"ENROLLMENT_NUMBER={portal.enrollment_number}")
+    print(f"PASSWORD={portal.password}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        portal.stop()
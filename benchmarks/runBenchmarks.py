@@ -0,0 +1,255 @@
+from mockPortal import MockPortal, PortalFixtures
+from statistics import median
+import subprocess
+import tempfile
+import argparse
+import shutil
+import json
+import time
+import sys
+import os
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Stages run in this order within one round, later stages reuse the profile the earlier ones logged in with
+STAGES = [
+    {"name": "checkAssignments.login", "script": "checkAssignments.py", "args": ["-e", "browser", "-N", "benchmark"]},
+    {"name": "checkAssignments.http", "script": "checkAssignments.py", "args": ["-e", "http", "-N", "benchmark"]},
+    {"name": "checkAssignments.browser", "script": "checkAssignments.py", "args": ["-e", "browser", "-c", "4", "-N", "benchmark"]},
+    {"name": "checkAttendance", "script": "checkAttendance.py", "args": []},
+    {"name": "fillSurveys", "script": "fillSurveys.py", "args": [], "stdin": "0\n\n", "reset_surveys": True},
+    {"name": "githubActions", "script": "githubActions.py", "args": [], "profile_env": True},
+    {"name": "githubActions.async", "script": "githubActions.py", "args": [], "env": {"ASYNC_PIPELINE": "1"}, "profile_env": True}
+]
+
+def stage_env(portal: MockPortal, work_dir: str) -> dict:
+    """
+    @brief Builds the environment that points every script at the mock portals and a scratch directory.
+    @param portal The running mock portals.
+    @param work_dir Scratch directory of the current round.
+    @return Environment dictionary for the script subprocesses.
+    """
+    env = dict(os.environ)
+    env.update({
+        "LMS_BASE_URL": portal.lms_url,
+        "CMS_BASE_URL": portal.cms_url,
+        "NTFY_BASE_URL": f"{portal.cms_url}/ntfy",
+        "ENROLLMENT_NUMBER": portal.enrollment_number,
+        "PASSWORD": portal.password,
+        "USER_DATA_DIR": os.path.join(work_dir, "profile"),
+        "DOWNLOAD_DIR": os.path.join(work_dir, "downloads"),
+        "HOME": os.path.join(work_dir, "home"),
+        "STATE_DB": os.path.join(work_dir, "home", "state.db"),
+        "DOWNLOAD_CACHE_FILE": os.path.join(work_dir, "home", "downloadCache.json"),
+        "NTFY_SERVER": "benchmark",
+        "NOTIFICATION_LEVEL": "4",
+        "DOWNLOAD_ASSIGNMENTS": "1",
+        "CHECK_UPDATES": "0",
+        "ASYNC_PIPELINE": "0",
+        "TERM": env.get("TERM", "dumb"),
+        # Keep Playwright's browsers where they were installed, HOME is redirected above
+        "PLAYWRIGHT_BROWSERS_PATH": env.get("PLAYWRIGHT_BROWSERS_PATH", os.path.join(os.path.expanduser("~"), ".cache", "ms-playwright"))
+    })
+    os.makedirs(env["HOME"], exist_ok=True)
+    return env
+
+def run_stage(stage: dict, portal: MockPortal, env: dict, log_dir: str, timeout: int) -> dict:
+    """
+    @brief Runs one script against the mock portals and measures it.
+    @param stage The stage definition from STAGES.
+    @param portal The running mock portals.
+    @param env The environment of the round.
+    @param log_dir Directory the output of the script is written to.
+    @param timeout Seconds after which the script is killed.
+    @return Dictionary with seconds, requests, bytes, exit code, log file and the script's own --profile-json report.
+    """
+    if stage.get("reset_surveys"):
+        portal.reset_surveys()
+
+    stage_env = dict(env)
+    stage_env.update(stage.get("env", {}))
+    log_file = os.path.join(log_dir, f"{stage['name']}.log")
+    profile_file = os.path.join(log_dir, f"{stage['name']}.profile.json")
+    arguments = list(stage["args"])
+
+    # githubActions.py is configured through the environment only
+    if stage.get("profile_env"):
+        stage_env["PROFILE_JSON"] = profile_file
+    else:
+        arguments += ["--profile-json", profile_file]
+
+    before = portal.stats()
+
+    started = time.perf_counter()
+    with open(log_file, "w", encoding="utf-8") as log:
+        try:
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, stage["script"]), *arguments],
+                cwd=REPO_DIR,
+                env=stage_env,
+                input=stage.get("stdin", ""),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=timeout
+            )
+            returncode = result.returncode
+        except subprocess.TimeoutExpired:
+            returncode = -1
+    seconds = time.perf_counter() - started
+
+    after = portal.stats()
+    profile = None
+    if os.path.exists(profile_file):
+        with open(profile_file, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+
+    return {
+        "profile": profile,
+        "seconds": seconds,
+        "requests": after["requests"] - before["requests"],
+        "bytes_sent": after["bytes_sent"] - before["bytes_sent"],
+        "notifications": after["notifications"] - before["notifications"],
+        "returncode": returncode,
+        "log_file": log_file
+    }
+
+def run_rounds(args) -> dict:
+    """
+    @brief Runs every selected stage args.runs times, each round starting from an empty profile.
+    @param args Parsed command-line arguments.
+    @return Dictionary of stage name to the list of its measurements.
+    """
+    fixtures = PortalFixtures(args.courses, args.assignments, args.surveys, args.file_size)
+    portal = MockPortal(fixtures, latency=args.latency / 1000).start()
+    stages = [stage for stage in STAGES if not args.only or stage["name"] in args.only]
+    results = {stage["name"]: [] for stage in stages}
+
+    try:
+        for round_number in range(args.runs):
+            work_dir = tempfile.mkdtemp(prefix="bahria-benchmark-")
+            log_dir = os.path.join(work_dir, "logs")
+            os.makedirs(log_dir)
+            env = stage_env(portal, work_dir)
+
+            for stage in stages:
+                measurement = run_stage(stage, portal, env, log_dir, args.timeout)
+                results[stage["name"]].append(measurement)
+                status = "ok" if measurement["returncode"] == 0 else f"exit {measurement['returncode']}"
+                print(f"[{round_number + 1}/{args.runs}] {stage['name']}: {measurement['seconds']:.2f}s, {measurement['requests']} requests ({status})")
+
+            if args.keep:
+                print(f"Kept logs and profile in {work_dir}")
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        portal.stop()
+
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float, grace: float) -> list:
+    """
+    @brief Prints the summary table and collects the stages that failed, regressed or have no baseline.
+    @param results Dictionary of stage name to its measurements.
+    @param baseline Dictionary of stage name to baseline seconds.
+    @param tolerance Allowed relative slowdown, e.g. 0.25 for 25%.
+    @param grace Allowed absolute slowdown in seconds, absorbs noise on very short stages.
+    @return List of (stage, reason) tuples.
+    """
+    problems = []
+    print(f"\n{'Stage':<28}{'Median':>10}{'Baseline':>10}{'Change':>9}{'Requests':>10}  Status")
+
+    for name, measurements in results.items():
+        seconds = median(measurement["seconds"] for measurement in measurements)
+        requests = median(measurement["requests"] for measurement in measurements)
+        failed = [measurement for measurement in measurements if measurement["returncode"] != 0]
+        reference = baseline.get(name)
+
+        status = "ok"
+        if failed:
+            status = f"FAILED (see {failed[0]['log_file']})"
+            problems.append((name, "script failed"))
+        elif reference is not None and seconds > reference * (1 + tolerance) + grace:
+            status = "REGRESSED"
+            problems.append((name, f"{seconds:.2f}s against a baseline of {reference:.2f}s"))
+        elif reference is None:
+            status = "no baseline"
+            problems.append((name, "no baseline, record one with --update-baseline"))
+
+        change = f"{(seconds / reference - 1) * 100:+.0f}%" if reference else "-"
+        print(f"{name:<28}{seconds:>9.2f}s{(f'{reference:.2f}s' if reference else '-'):>10}{change:>9}{requests:>10.0f}  {status}")
+
+    return problems
+
+def print_breakdown(results: dict):
+    """
+    @brief Prints the median time of every span the scripts reported with --profile-json.
+    @param results Dictionary of stage name to its measurements.
+    @return None
+    """
+    for name, measurements in results.items():
+        spans = {}
+        for measurement in measurements:
+            for row in (measurement["profile"] or {}).get("summary", []):
+                spans.setdefault(row["path"], []).append(row["total"])
+        if not spans:
+            continue
+
+        print(f"\n{name}")
+        for path, totals in spans.items():
+            print(f"    {path:<36}{median(totals):>9.3f}s")
+
+def parse_args():
+    """
+    @brief Parses command-line arguments for the benchmark runner.
+    @return Parsed arguments object.
+    """
+    parser = argparse.ArgumentParser(description="Time every script against the local mock portals")
+    parser.add_argument("--runs", type=int, default=3, help="Number of rounds, the median of each stage is compared")
+    parser.add_argument("--only", nargs="*", help="Only run these stages")
+    parser.add_argument("--courses", type=int, default=6, help="Number of courses")
+    parser.add_argument("--assignments", type=int, default=4, help="Number of assignments per course")
+    parser.add_argument("--surveys", type=int, default=4, help="Number of pending surveys")
+    parser.add_argument("--file-size", type=int, default=64, help="Size of each assignment file in KiB")
+    parser.add_argument("--latency", type=float, default=50, help="Milliseconds every mock response is delayed by")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline")
+    parser.add_argument("--grace", type=float, default=0.5, help="Allowed absolute slowdown in seconds against the baseline")
+    parser.add_argument("--timeout", type=int, default=300, help="Seconds after which a script is killed")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the medians of this run as the new baseline")
+    parser.add_argument("--keep", action="store_true", help="Keep the profile, downloads and logs of every round")
+    parser.add_argument("--breakdown", action="store_true", help="Also print the median time of every stage span reported by the scripts")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    elif not args.update_baseline:
+        print(f"No baseline found at {args.baseline}, record one on this machine with --update-baseline.")
+        exit(1)
+
+    results = run_rounds(args)
+    problems = compare(results, baseline, args.tolerance, args.grace)
+    if args.breakdown:
+        print_breakdown(results)
+
+    if args.update_baseline:
+        if any(problem for problem in problems if problem[1] == "script failed"):
+            print("\nNot updating the baseline, some stages failed.")
+            exit(1)
+        baseline.update({name: round(median(measurement["seconds"] for measurement in measurements), 3) for name, measurements in results.items()})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        exit(0)
+
+    if problems:
+        print()
+        for name, reason in problems:
+            print(f"{name}: {reason}")
+        exit(1)
@@ -0,0 +1,247 @@
+from playwright.sync_api import sync_playwright, Error
+from urllib.request import urlopen
+from dotenv import load_dotenv
+from time import sleep, monotonic
+import subprocess
+import argparse
+import json
+import sys
+import os
+import profileMaintenance
+
+load_dotenv()
+data_dir = os.getenv("USER_DATA_DIR", "")
+browser_broker = int(os.getenv("BROWSER_BROKER", "0"))
+broker_port = int(os.getenv("BROKER_PORT", "9333"))
+broker_idle_timeout = float(os.getenv("BROKER_IDLE_TIMEOUT", "10"))
+
+STARTUP_TIMEOUT = 30
+
+BROKER_ARGS = [
+    "--window-size=1920,1080",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions",
+    "--disable-infobars",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-component-update",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-lazy-image-loading",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-logging",
+    "--log-level=3",
+    "--disable-features=Translate,RendererCodeIntegrity,IsolateOrigins,site-per-process",
+    "--disable-animations",
+    "--mute-audio"
+]
+
+class BrokerContext:
+    """
+    @brief The shared profile of the broker as seen by one script: its own pages only, and close() just disconnects.
+    """
+    def __init__(self, browser):
+        """
+        @brief Opens the first page of the script in the default (persistent) context of the broker.
+        @param browser The Browser connected over CDP.
+        """
+        self.browser = browser
+        self.context = browser.contexts[0]
+        self.own_pages = [self.context.new_page()]
+
+    @property
+    def pages(self) -> list:
+        """
+        @brief The open pages of this script, the first one is the page opened on connect.
+        @return List of Pages.
+        """
+        return [page for page in self.own_pages if not page.is_closed()]
+
+    def new_page(self):
+        """
+        @brief Opens another page of this script.
+        @return The new Page.
+        """
+        page = self.context.new_page()
+        self.own_pages.append(page)
+        return page
+
+    def close(self):
+        """
+        @brief Closes the pages of this script and disconnects, the broker keeps running.
+        @return None
+        """
+        for page in self.pages:
+            try:
+                page.close()
+            except Error:
+                pass
+        self.browser.close()
+
+    def __getattr__(self, name):
+        # cookies(), add_cookies(), route(), on(), tracing, ... act on the shared context
+        return getattr(self.context, name)
+
+def endpoint(port: int = broker_port) -> str:
+    """
+    @brief The CDP endpoint of the broker, only reachable from this machine.
+    @param port The remote debugging port.
+    @return URL of the endpoint.
+    """
+    return f"http://127.0.0.1:{port}"
+
+def targets(port: int = broker_port) -> list:
+    """
+    @brief Lists the CDP targets of the broker.
+    @param port The remote debugging port of the broker.
+    @return List of target dictionaries, None if no broker answers on the port.
+    """
+    try:
+        with urlopen(f"{endpoint(port)}/json/list", timeout=1) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        return None
+
+def is_running(port: int = broker_port) -> bool:
+    """
+    @brief Checks whether a broker answers on the port.
+    @param port The remote debugging port.
+    @return True if it is running.
+    """
+    return targets(port) is not None
+
+def start(port: int = broker_port, idle_timeout: float = broker_idle_timeout) -> bool:
+    """
+    @brief Starts the broker in the background and waits until it accepts connections.
+    @param port The remote debugging port.
+    @param idle_timeout Minutes without any script page after which the broker exits.
+    @return True if the broker is running.
+    """
+    if is_running(port):
+        return True
+
+    options = {"start_new_session": True} if os.name != "nt" else {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port), "--idle-timeout", str(idle_timeout)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **options
+    )
+
+    deadline = monotonic() + STARTUP_TIMEOUT
+    while monotonic() < deadline:
+        if is_running(port):
+            return True
+        sleep(0.1)
+    return False
+
+def stop(port: int = broker_port) -> bool:
+    """
+    @brief Shuts the broker down so the profile can be opened by a normal (e.g. headed) launch.
+    @param port The remote debugging port.
+    @return True if a broker was stopped.
+    """
+    if not is_running(port):
+        return False
+
+    with sync_playwright() as p:
+        browser = p.chromium.connect_over_cdp(endpoint(port))
+        try:
+            browser.new_browser_cdp_session().send("Browser.close")
+        except Error:
+            # The connection drops while Chromium exits
+            pass
+
+    deadline = monotonic() + STARTUP_TIMEOUT
+    while is_running(port) and monotonic() < deadline:
+        sleep(0.1)
+    return True
+
+def connect(p, debug_mode: bool = False) -> BrokerContext:
+    """
+    @brief Attaches to the broker, starting it first if needed.
+    @param p The running Playwright instance of the script.
+    @param debug_mode Boolean flag to enable debug output.
+    @return BrokerContext of the script, or None if no broker could be reached (the script launches Chromium itself then).
+    """
+    if not is_running() and not start():
+        if debug_mode:
+            print("Could not start the browser broker, launching Chromium directly.")
+        return None
+
+    try:
+        return BrokerContext(p.chromium.connect_over_cdp(endpoint(), timeout=STARTUP_TIMEOUT * 1000))
+    except Error as e:
+        if debug_mode:
+            print(f"Could not connect to the browser broker ({e}), launching Chromium directly.")
+        return None
+
+def serve(port: int, idle_timeout: float):
+    """
+    @brief Runs the broker: one headless Chromium on the profile, until no script had a page open for idle_timeout minutes.
+    @param port The remote debugging port.
+    @param idle_timeout Minutes without any script page after which the broker exits.
+    @return None
+    """
+    profileMaintenance.maintain_profile(data_dir)
+
+    with sync_playwright() as p:
+        context = p.chromium.launch_persistent_context(
+            user_data_dir=data_dir,
+            headless=True,
+            no_viewport=True,
+            args=[*BROKER_ARGS, f"--remote-debugging-port={port}", *profileMaintenance.cache_args(data_dir)]
+        )
+        idle_page = context.pages[0] if context.pages else context.new_page()
+        last_used = monotonic()
+
+        try:
+            while monotonic() - last_used < idle_timeout * 60:
+                # Waiting on the page keeps the Playwright connection serviced, unlike sleep()
+                idle_page.wait_for_timeout(1000)
+                pages = [target for target in (targets(port) or []) if target.get("type") == "page"]
+                if len(pages) > 1:
+                    last_used = monotonic()
+        except Error:
+            # Browser.close from stop()
+            return
+
+        context.close()
+
+def parse_args():
+    """
+    @brief Parses command-line arguments for the browser broker.
+    @return Parsed arguments object with command, port and idle_timeout options.
+    """
+    parser = argparse.ArgumentParser(description="Keep one Chromium on USER_DATA_DIR running for the scripts to attach to")
+    parser.add_argument("command", choices=["start", "stop", "status", "serve"], help="serve runs the broker in the foreground")
+    parser.add_argument("-p", "--port", type=int, default=broker_port, help="Remote debugging port (default: BROKER_PORT or 9333)")
+    parser.add_argument("-t", "--idle-timeout", type=float, default=broker_idle_timeout, help="Minutes without a script page after which the broker exits")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if data_dir == "":
+        print("Error: USER_DATA_DIR is not set.")
+        exit(1)
+
+    if args.command == "serve":
+        serve(args.port, args.idle_timeout)
+    elif args.command == "start":
+        if not start(args.port, args.idle_timeout):
+            print("The browser broker did not start.")
+            exit(1)
+        print(f"Browser broker running on {endpoint(args.port)}")
+    elif args.command == "stop":
+        print("Browser broker stopped." if stop(args.port) else "The browser broker is not running.")
+    else:
+        running_targets = targets(args.port)
+        if running_targets is None:
+            print("The browser broker is not running.")
+        else:
+            script_pages = len([target for target in running_targets if target.get("type") == "page"]) - 1
+            print(f"Browser broker running on {endpoint(args.port)} with {script_pages} script page(s) open.")
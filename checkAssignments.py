@@ -1,13 +1,46 @@
-from playwright.sync_api import Locator, sync_playwright, BrowserContext, Page, TimeoutError
+from __future__ import annotations
 from datetime import datetime
-from dotenv import load_dotenv
-from time import sleep
+from time import sleep, monotonic
+import importlib.util
 import platform
 import subprocess
-import requests
 import argparse
+import sys
 import os
-import glob
+from downloadCache import DownloadCache, CACHE_FILE_NAME
+from stateStore import StateStore, STATE_FILE_NAME
+from profiling import profiler
+import snapshot
+
+def lazy_import(name: str):
+    """
+    @brief Imports a module on first attribute access instead of right away.
+    @param name Name of the module.
+    @return The module, executed once it is first used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# Playwright and requests take longer to import than --cached needs for its whole answer
+sync_api = lazy_import("playwright.sync_api")
+requests = lazy_import("requests")
+httpEngine = lazy_import("httpEngine")
+courseTables = lazy_import("courseTables")
+downloader = lazy_import("downloader")
+notifications = lazy_import("notifications")
+checkAttendance = lazy_import("checkAttendance")
+portal = lazy_import("portal")
+requestBlocking = lazy_import("requestBlocking")
+failureCapture = lazy_import("failureCapture")
+profileMaintenance = lazy_import("profileMaintenance")
+browserBroker = lazy_import("browserBroker")
 
 class Colors:
     RED_BRIGHT = "\x1b[38;2;255;0;0m"
@@ -31,15 +64,28 @@ subject_abbreviations = {
     "Artificial Intelligence": "AI"
 }
 
-load_dotenv()
-download_dir = os.getenv("DOWNLOAD_DIR", "")
-enrollment_number = os.getenv("ENROLLMENT_NUMBER", "")
-password = os.getenv("PASSWORD", "")
-data_dir = os.getenv("USER_DATA_DIR", "")
-notification_level = int(os.getenv("NOTIFICATION_LEVEL", "0"))
-notify_extended = int(os.getenv("NOTIFY_EXTENDED", "1"))
-instituition = int(os.getenv("INSTITUTION", "6"))
-check_updates = int(os.getenv("CHECK_UPDATES", "1"))
+def load_settings(env_file: bool = True):
+    """
+    @brief Reads the settings from the environment.
+    @param env_file Boolean flag to load the .env file first, --cached skips it when the snapshot is recent enough.
+    @return None
+    """
+    global download_dir, enrollment_number, password, data_dir, notification_level, notify_extended, instituition, check_updates
+
+    if env_file:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    download_dir = os.getenv("DOWNLOAD_DIR", "")
+    enrollment_number = os.getenv("ENROLLMENT_NUMBER", "")
+    password = os.getenv("PASSWORD", "")
+    data_dir = os.getenv("USER_DATA_DIR", "")
+    notification_level = int(os.getenv("NOTIFICATION_LEVEL", "0"))
+    notify_extended = int(os.getenv("NOTIFY_EXTENDED", "1"))
+    instituition = int(os.getenv("INSTITUTION", "6"))
+    check_updates = int(os.getenv("CHECK_UPDATES", "1"))
+
+load_settings(env_file=False)
 
 def clean_text(text: str) -> str:
     """
@@ -86,108 +132,118 @@ def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("-k", "--kde", action="store", help="Send notifications via KDE Connect using Device ID")
     parser.add_argument("-N", "--ntfy", action="store", help="Send notifications via Ntfy using Server")
+    parser.add_argument("-a", "--notify-all", action="store_true", help="Notify every matching deadline, not only the ones that changed since the last run")
+    parser.add_argument("-D", "--digest", action="store_true", help="Group ntfy notifications into one message per urgency bucket")
     parser.add_argument("-n", action="store_false", dest="download_assignments", help="Don't download assignments")
     parser.add_argument("-w", "--whatsapp", action="store_true", help="Format for WhatsApp Message")
     parser.add_argument("-d", "--debug", action="store_true", help="Enable debug mode")
     parser.add_argument("-l", "--login", action="store_true", help="Enable login mode")
+    parser.add_argument("-j", "--download-workers", type=int, default=4, help="Number of assignment files downloaded in parallel")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Number of pages used to load course tables in parallel")
+    parser.add_argument("-e", "--engine", choices=["browser", "http"], default="browser", help="Scrape with the stored session cookies when they are valid (http) or always with Chromium (browser)")
+    parser.add_argument("-W", "--watch", action="store_true", help="Keep running and re-check assignments and attendance every --interval minutes")
+    parser.add_argument("-i", "--interval", type=float, default=30, help="Minutes between two checks in watch mode")
+    parser.add_argument("-C", "--cached", action="store_true", help="Print the deadlines of the last scrape without notifying, unless it is older than --max-age")
+    parser.add_argument("--max-age", type=float, default=60, help="Minutes after which --cached scrapes again")
+    parser.add_argument("-P", "--profile", action="store_true", help="Print the time spent in each stage and the request counters at the end")
+    parser.add_argument("--profile-json", metavar="FILE", default="", help="Write the stage timings and counters to a JSON file")
+    parser.add_argument("--trace", metavar="FILE", default="", help="Save a Playwright trace of the slowest browser stage (with --profile or --profile-json)")
     return parser.parse_args()
 
-def start_playwright(debug_mode: bool, login_mode: bool) -> BrowserContext:
+def start_playwright(debug_mode: bool, login_mode: bool) -> sync_api.BrowserContext:
     """
     @brief Launches a persistent Chromium browser with optimized settings.
     @param debug_mode Boolean flag to launch browser in debug mode (non-headless).
-    @param login_mode Boolean flag to indicate if login is required.
+    @param login_mode Boolean flag to indicate if login is required (non-headless so the user can log in).
     @return BrowserContext object representing the persistent browser context.
     """
-    browser = p.chromium.launch_persistent_context(
-        user_data_dir=data_dir,
-        headless=login_mode or not debug_mode,
-        no_viewport=True,
-        args=[
-            "--window-size=1920,1080",
-            "--disable-gpu",
-            "--disable-software-rasterizer",
-            "--disable-extensions",
-            "--disable-infobars",
-            "--disable-dev-shm-usage",
-            "--no-sandbox",
-            "--blink-settings=imagesEnabled=false",
-            "--disable-component-update",
-            "--disable-background-networking",
-            "--disable-sync",
-            "--disable-lazy-image-loading",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-logging",
-            "--log-level=3",
-            f"--disk-cache-dir={data_dir}/playwrightCache",
-            "--disk-cache-size=1073741824",
-            "--disable-features=Translate,RendererCodeIntegrity,IsolateOrigins,site-per-process",
-            "--disable-animations",
-            "--mute-audio"
-        ]
-    )
+    browser = None
+    if browserBroker.browser_broker:
+        if not (login_mode or debug_mode):
+            browser = browserBroker.connect(p, debug_mode)
+        else:
+            # A visible window cannot be taken from the headless broker, it needs the profile for itself
+            browserBroker.stop()
+
+    if browser is None:
+        profileMaintenance.maintain_profile(data_dir, debug_mode)
+        browser = p.chromium.launch_persistent_context(
+            user_data_dir=data_dir,
+            headless=not (login_mode or debug_mode),
+            no_viewport=True,
+            args=[
+                "--window-size=1920,1080",
+                "--disable-gpu",
+                "--disable-software-rasterizer",
+                "--disable-extensions",
+                "--disable-infobars",
+                "--disable-dev-shm-usage",
+                "--no-sandbox",
+                "--blink-settings=imagesEnabled=false",
+                "--disable-component-update",
+                "--disable-background-networking",
+                "--disable-sync",
+                "--disable-lazy-image-loading",
+                "--disable-blink-features=AutomationControlled",
+                "--disable-logging",
+                "--log-level=3",
+                "--disable-features=Translate,RendererCodeIntegrity,IsolateOrigins,site-per-process",
+                "--disable-animations",
+                "--mute-audio",
+                *profileMaintenance.cache_args(data_dir)
+            ]
+        )
 
-    browser.route("**/*", lambda route:
-        route.abort() if route.request.resource_type in ["image", "media", "font", "stylesheet"]
-        or route.request.resource_type == "script" and not (route.request.url.startswith("https://cms.bahria.edu.pk/"))
-        or "google-analytics" in route.request.url
-        or "fontawesome" in route.request.url
-        else route.continue_()
-    )
+    requestBlocking.RequestBlocker().install(browser)
+    profiler.instrument_context(browser)
+    failureCapture.recorder.instrument_context(browser)
 
     return browser
 
-def check_and_login(page: Page, debug_mode: bool, login_mode: bool):
+def check_and_login(page: sync_api.Page, debug_mode: bool, login_mode: bool, session_status: str = None) -> sync_api.Page:
     """
     @brief Handles user login and ensures proper authentication before accessing assignments.
     @param page The Playwright page object to interact with.
     @param debug_mode Boolean flag to enable debug output.
-    @param login_mode Boolean flag to indicate if login is required.
-    @return None
+    @param login_mode Boolean flag to indicate if the browser is headed for an interactive login.
+    @param session_status Optional result of httpEngine.probe_session, skips the LMS check when it is known to fail.
+    @return The page to continue with, a new one if the browser had to be relaunched headed for login.
     """
-    page.goto("https://lms.bahria.edu.pk/Student/Assignments.php", wait_until="commit")
+    if session_status not in (httpEngine.SESSION_EXPIRED, httpEngine.SESSION_CMS_ONLY, httpEngine.SESSION_SURVEY):
+        page.goto(f"{portal.LMS_BASE_URL}/Student/Assignments.php", wait_until="commit")
 
-    if  ("https://lms.bahria.edu.pk/" in page.url):
+    if  (f"{portal.LMS_BASE_URL}/" in page.url):
         logged_in_enrollment_number: str = page.locator("body > div > header > nav > div > ul > li.dropdown.user.user-menu > ul > li.user-header > p").text_content().strip()
         if enrollment_number not in logged_in_enrollment_number:
             if debug_mode:
                 print("Logged in with a different account. Logging out...")
 
-            page.goto("https://lms.bahria.edu.pk/Student/includes/studentprocess.php?s=signout", wait_until="commit")
-            page.goto("https://cms.bahria.edu.pk/Sys/Student/Logoff.aspx", wait_until="commit")
-            check_and_login(page, debug_mode, login_mode)
-            return
+            page.goto(f"{portal.LMS_BASE_URL}/Student/includes/studentprocess.php?s=signout", wait_until="commit")
+            page.goto(f"{portal.CMS_BASE_URL}/Sys/Student/Logoff.aspx", wait_until="commit")
+            return check_and_login(page, debug_mode, login_mode)
         else:
             print(f"Logged in as {enrollment_number}")
 
     else:
-        page.goto("https://cms.bahria.edu.pk/Logins/Student/Login.aspx")
+        page.goto(f"{portal.CMS_BASE_URL}/Logins/Student/Login.aspx")
         if "Login.aspx" in page.url:
                 if enrollment_number != "" and password != "":
-                    page.goto("https://cms.bahria.edu.pk/Logins/Student/Login.aspx")
+                    page.goto(f"{portal.CMS_BASE_URL}/Logins/Student/Login.aspx")
                     page.fill("#BodyPH_tbEnrollment", enrollment_number)
                     page.fill("#BodyPH_tbPassword", password)
                     page.select_option("#BodyPH_ddlInstituteID", "1")
                     page.click(f"#pageContent > div.container-fluid > div.row > div > div:nth-child({instituition})")
                     page.click("#BodyPH_btnLogin")
                     print(f"Logged in as {enrollment_number}")
-                    lms_button: Locator = page.wait_for_selector("#sideMenuList > a:nth-child(16)")
-                    page.evaluate("el => el.removeAttribute('target')", lms_button)
-                    lms_button.click()
-                elif not login_mode:
-                    subprocess.run(["python", os.path.join(os.path.dirname(__file__), "checkAssignments.py"), "--login"])
-                    exit(0)
-                elif login_mode:
-                    page.select_option("#BodyPH_ddlInstituteID", "1")
-                    page.click(f"#pageContent > div.container-fluid > div.row > div > div:nth-child({instituition})")
-                    try:
-                        lms_button: Locator = page.wait_for_selector("#sideMenuList > a:nth-child(16)", timeout=120000)
-
-                    except TimeoutError:
-                        print("Failed to log in, please enter your username and password.")
-                        exit(1)
+                    lms_button: sync_api.Locator = page.wait_for_selector("#sideMenuList > a:nth-child(16)")
                     page.evaluate("el => el.removeAttribute('target')", lms_button)
                     lms_button.click()
+                else:
+                    if not login_mode:
+                        # A headless browser cannot take the user's input, reopen the same profile headed in this process
+                        page = relaunch_headed(debug_mode)
+                        page.goto(f"{portal.CMS_BASE_URL}/Logins/Student/Login.aspx")
+                    interactive_login(page)
 
         elif ("QualityAssuranceSurveys.aspx" in page.url):
             print("Please complete the Quality Assurance Survey to proceed.")
@@ -195,18 +251,56 @@ def check_and_login(page: Page, debug_mode: bool, login_mode: bool):
 
         else:
             print(f"Logged in as {enrollment_number}")
-            lms_button: Locator = page.wait_for_selector("#sideMenuList > a:nth-child(16)")
+            lms_button: sync_api.Locator = page.wait_for_selector("#sideMenuList > a:nth-child(16)")
             page.evaluate("el => el.removeAttribute('target')", lms_button)
             lms_button.click()
 
-        persist_cookies(browser, debug_mode, login_mode)
+        persist_cookies(browser, debug_mode)
+
+    return page
+
+def relaunch_headed(debug_mode: bool) -> sync_api.Page:
+    """
+    @brief Closes the current headless context and reopens the profile headed for an interactive login.
+    @param debug_mode Boolean flag to enable debug output.
+    @return The first page of the new browser context.
+    """
+    global browser
+
+    if debug_mode:
+        print("Login required, reopening the browser window for an interactive login...")
+
+    profiler.stop_tracing()
+    browser.close()
+    with profiler.span("browser_launch"):
+        browser = start_playwright(debug_mode, True)
+    page = browser.pages[0]
+    page.set_default_timeout(60000)
+    return page
+
+def interactive_login(page: sync_api.Page):
+    """
+    @brief Waits for the user to log in on the CMS login page and opens the LMS.
+    @param page The Playwright page showing the CMS login page in a headed browser.
+    @return None
+    """
+    page.select_option("#BodyPH_ddlInstituteID", "1")
+    page.click(f"#pageContent > div.container-fluid > div.row > div > div:nth-child({instituition})")
+    print("Please log in using the browser window.")
+    try:
+        lms_button: sync_api.Locator = page.wait_for_selector("#sideMenuList > a:nth-child(16)", timeout=120000)
+
+    except sync_api.TimeoutError:
+        print("Failed to log in, please enter your username and password.")
+        exit(1)
+    page.evaluate("el => el.removeAttribute('target')", lms_button)
+    lms_button.click()
 
-def persist_cookies(browser, debug_mode: bool, login_mode: bool):
+def persist_cookies(browser, debug_mode: bool):
     """
     @brief Makes CMS cookies persistent for one year to maintain session across restarts.
     @param browser The BrowserContext object containing the cookies.
     @param debug_mode Boolean flag to enable debug output.
-    @param login_mode Boolean flag to indicate if login is required.
     @return None
     """
     cookies = browser.cookies()
@@ -217,9 +311,8 @@ def persist_cookies(browser, debug_mode: bool, login_mode: bool):
             browser.add_cookies([cookie])
             if debug_mode:
                 print(f"Made {cookie['name']} cookie persistent.")
-        if login_mode:
-            subprocess.run(["python", os.path.join(os.path.dirname(__file__), "checkAssignments.py")])
-            exit(0)
+
+    httpEngine.save_session_cookies(browser.cookies(), data_dir)
 
 def run_qa_survey(page, debug_mode: bool):
     """
@@ -239,59 +332,22 @@ def run_qa_survey(page, debug_mode: bool):
             print("Survey automation script not found.")
             exit(1)
 
-def download_assignment_file(page, subject_name: str, assignment_name: str, deadline_date: str, assignment_link: str) -> str:
-    """
-    @brief Downloads an assignment file and saves it in a subject-specific directory.
-    @param page The Playwright page object to interact with.
-    @param subject_name the name of the subject for the assignment.
-    @param assignment_name The name of the assignment.
-    @param deadline_date The deadline date formatted as string.
-    @param assignment_link The URL link to the assignment file.
-    @return File pattern used to identify downloaded files for cleanup.
-    """
-    if not os.path.exists(f"{download_dir}/{subject_name}"):
-        os.makedirs(f"{download_dir}/{subject_name}")
-
-    pattern = f"{download_dir}/{subject_name}/{assignment_name} - {deadline_date}.*"
-    matching_files = glob.glob(pattern)
-
-    if not matching_files:
-        subject_dir = f"{download_dir}\\{subject_name}" if os.name == "nt" else f"{download_dir}/{subject_name}"
-        file_base = f"{assignment_name} - {deadline_date}"
-
-        with page.expect_download() as download_info:
-            page.evaluate(f"window.location.href = '{assignment_link}'")
-
-        download = download_info.value
-        file_name = download.suggested_filename
-        _, file_ext = os.path.splitext(file_name)
-        final_path = os.path.join(subject_dir, f"{file_base}{file_ext}")
-        download.save_as(final_path)
-
-    return pattern
-
-def cleanup_old_files(download_dir: str, patterns: list, debug_mode: bool):
+def cleanup_old_files(download_dir: str, links: list, debug_mode: bool):
     """
-    @brief Deletes old assignment files not matching current download patterns.
+    @brief Deletes the files the tool downloaded for assignments that are no longer listed on the LMS.
     @param download_dir The root directory containing downloaded assignments.
-    @param patterns List of file patterns to keep during cleanup.
+    @param links List of assignment links seen in the current run (the current manifest).
     @param debug_mode Boolean flag to enable debug output.
     @return None
     """
-    all_files = glob.glob(f"{download_dir}/**/*", recursive=True)
-    keep_files = set()
-
-    for pattern in patterns:
-        keep_files.update(glob.glob(pattern))
-
-    if platform.system() == "Windows":
-        download_dir = download_dir.replace("/", "\\")
-        keep_files = {f.replace("/", "\\") for f in keep_files}
-
-    for path in all_files:
-        if os.path.isdir(path):
-            continue
-        if path not in keep_files:
+    # The download cache is the manifest of the previous runs, only its difference to this run is touched
+    cache = DownloadCache(os.path.join(data_dir, CACHE_FILE_NAME))
+    stale_files = cache.prune(set(links))
+    cache.save()
+
+    download_root = os.path.abspath(download_dir)
+    for path in stale_files:
+        if os.path.exists(path):
             try:
                 os.remove(path)
                 if debug_mode:
@@ -299,41 +355,29 @@ def cleanup_old_files(download_dir: str, patterns: list, debug_mode: bool):
             except Exception as e:
                 print(f"Error deleting {path}: {e}")
 
-    # Remove empty directories
-    for root, dirs, _ in os.walk(download_dir, topdown=False):
-        for d in dirs:
-            full_path = os.path.join(root, d)
-            if not os.listdir(full_path):
-                try:
-                    os.rmdir(full_path)
-                    if debug_mode:
-                        print(f"Deleted empty directory: {full_path}")
-                except Exception as e:
-                    print(f"Error deleting directory {full_path}: {e}")
-
-def send_notification(title, message: str, priority: int, ntfy_server: str):
-    """
-    @brief Sends a notification via ntfy.sh service.
-    @param title The title of the notification.
-    @param message The message body of the notification.
-    @param priority The priority level of the notification (1-5).
-    @param ntfy_server The ntfy server name/topic to send the notification to.
-    @return None
-    """
-    if ntfy_server:
-        requests.put(
-            f"https://ntfy.sh/{ntfy_server}",
-            data=message,
-            headers={"Title": title, "Priority": str(priority)}
-        )
-    else:
-        print("ntfy_server is not set. Cannot send notification.")
+        # Remove the subject directory once its last file is gone
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory != download_root and directory.startswith(download_root) and os.path.isdir(directory) and not os.listdir(directory):
+            try:
+                os.rmdir(directory)
+                if debug_mode:
+                    print(f"Deleted empty directory: {directory}")
+            except Exception as e:
+                print(f"Error deleting directory {directory}: {e}")
 
-def fetch_assignments(page: Page, download_assignments: bool, debug_mode: bool) -> tuple[list, list]:
-    deadlines = []
-    patterns = []
+def fetch_assignments(page: sync_api.Page, download_assignments: bool, debug_mode: bool, concurrency: int = 1, download_workers: int = 4) -> tuple[list, list]:
+    """
+    @brief Fetches all assignments from the LMS, optionally loading course tables on several pages at once.
+    @param page The Playwright page object to interact with.
+    @param download_assignments Boolean flag to download the assignment files.
+    @param debug_mode Boolean flag to enable debug output.
+    @param concurrency Maximum number of pages loading course tables at the same time (1 keeps the serial loop).
+    @param download_workers Maximum number of assignment files downloaded at the same time.
+    @return Tuple of (deadlines, assignment links), deadlines are in course order.
+    """
+    links = []
     if "Assignments.php" not in page.url:
-        page.goto("https://lms.bahria.edu.pk/Student/Assignments.php", wait_until="networkidle")
+        page.goto(f"{portal.LMS_BASE_URL}/Student/Assignments.php", wait_until="networkidle")
 
     # Extract courses and values
     courses = page.evaluate("""() => {
@@ -342,45 +386,62 @@ def fetch_assignments(page: Page, download_assignments: bool, debug_mode: bool)
             .map(opt => ({ id: opt.value, name: opt.innerText.trim() }));
     }""")
 
-    for course in courses:
-        page.select_option("#courseId", value=course['id'])
-
-        page.wait_for_selector("table.table-hover tbody tr:not(:first-child)")
-
-        table_data = page.evaluate("""() => {
-            const rows = Array.from(document.querySelectorAll("table.table-hover tbody tr")).slice(1);
-            return rows.map(row => {
-                const cells = row.querySelectorAll("td");
-                if (cells.length < 8) return null;
-                return {
-                    action: cells[6].innerText,
-                    assignment_number: cells[0].innerText.trim(),
-                    assignment_name: cells[1].innerText.trim(),
-                    deadline_text: cells[7].querySelector("small")?.innerText || "",
-                    deadline_title: cells[7].querySelector("small")?.getAttribute("title") || "",
-                    download_url: cells[2].querySelector("a")?.getAttribute("href") || ""
-                };
-            }).filter(item => item !== null);
-        }""")
-
-        for item in table_data:
-            if "Submit" in item['action'] or "Delete" in item['action']:
-                deadline_date = item['deadline_text'].split('-')[0].strip()
-                if not deadline_date: continue
-
-                if download_assignments and item['download_url']:
-                    link = f"https://lms.bahria.edu.pk/Student/{item['download_url']}"
-                    patterns.append(download_assignment_file(page, course['name'], item['assignment_name'], deadline_date, link))
-
-                deadlines.append((
-                    item['assignment_number'],
-                    course['name'],
-                    deadline_date,
-                    "Delete" in item['action'],
-                    "Extended" in item['deadline_title']
-                ))
-
-    return deadlines, patterns
+    # Downloads run on their own pool with the context's cookies while the remaining courses are scraped
+    assignment_downloader = None
+    if download_assignments:
+        session = httpEngine.session_from_cookies(page.context.cookies(), download_workers)
+        cache = DownloadCache(os.path.join(data_dir, CACHE_FILE_NAME))
+        assignment_downloader = downloader.AssignmentDownloader(session, download_dir, download_workers, cache=cache, debug_mode=debug_mode)
+
+    course_deadlines = [[] for _ in courses]
+
+    def download(subject_name: str, assignment_name: str, deadline_date: str, link: str):
+        links.append(link)
+        return assignment_downloader.submit(subject_name, assignment_name, deadline_date, link)
+
+    def process_table(index: int, table_data: list):
+        course_deadlines[index] = [
+            deadline for deadline, _ in courseTables.table_deadlines(courses[index]['name'], table_data, download if assignment_downloader else None)
+        ]
+
+    if concurrency > 1:
+        courseTables.extract_course_tables(page, courses, concurrency, on_table=process_table, debug_mode=debug_mode)
+    else:
+        for index, course in enumerate(courses):
+            page.evaluate(courseTables.MARK_AND_SELECT_SCRIPT, course['id'])
+
+            # Returns as soon as the table refreshed, also for a course without assignments
+            process_table(index, courseTables.read_course_table(page))
+
+    if assignment_downloader:
+        with profiler.span("downloads_wait"):
+            assignment_downloader.wait()
+
+    deadlines = [deadline for deadlines_of_course in course_deadlines for deadline in deadlines_of_course]
+    return deadlines, links
+
+def fetch_assignments_over_http(session, download_assignments: bool, debug_mode: bool, download_workers: int = 4, first_page: str = None) -> tuple[list, list]:
+    """
+    @brief Fetches all assignments with the stored session cookies, without a browser.
+    @param session The requests session carrying the LMS cookies.
+    @param download_assignments Boolean flag to download the assignment files.
+    @param debug_mode Boolean flag to enable debug output.
+    @param download_workers Maximum number of assignment files downloaded at the same time.
+    @param first_page Optional Assignments.php HTML already fetched by the session probe.
+    @return Tuple of (deadlines, assignment links), deadlines are in course order.
+    @throws httpEngine.SessionExpiredError If the LMS no longer accepts the session.
+    """
+    assignment_downloader = None
+    if download_assignments:
+        cache = DownloadCache(os.path.join(data_dir, CACHE_FILE_NAME))
+        assignment_downloader = downloader.AssignmentDownloader(session, download_dir, download_workers, cache=cache, debug_mode=debug_mode)
+
+    deadlines, links = httpEngine.fetch_assignments(session, assignment_downloader, enrollment_number, debug_mode, first_page)
+    if assignment_downloader:
+        with profiler.span("downloads_wait"):
+            assignment_downloader.wait()
+
+    return deadlines, links
 
 def display_whatsapp_formatted_deadlines(deadlines: list):
     """
@@ -389,7 +450,7 @@ def display_whatsapp_formatted_deadlines(deadlines: list):
     @return None
     """
     formatted_deadlines = []
-    for subject, date, _ in deadlines:
+    for _, subject, date, _, _ in deadlines:
         short_subject = subject_abbreviations.get(subject, subject)
         try:
             parsed_date = datetime.strptime(date, "%d %B %Y")
@@ -408,12 +469,16 @@ def display_whatsapp_formatted_deadlines(deadlines: list):
     for subject, formatted_date, _ in formatted_deadlines:
         print(f"{subject} - {formatted_date}")
 
-def display_deadlines(deadlines: list, KDE_device: str, ntfy_server: str):
+def display_deadlines(deadlines: list, KDE_device: str, ntfy_server: str, digest: bool = False, state: StateStore = None, notify_all: bool = False):
     """
     @brief Displays and processes assignment deadlines with color coding and notifications.
     @param deadlines List of tuples containing deadline information.
     @param KDE_device KDE Connect device ID for notifications.
     @param ntfy_server Ntfy service name for notifications.
+    @param digest Boolean flag to send one ntfy message per urgency bucket instead of one per assignment.
+    @param state Optional StateStore, when given only new, extended or re-bucketed assignments are notified.
+                 Nothing is recorded without a notifier, and a notified assignment only once its notification was sent.
+    @param notify_all Boolean flag to notify every matching deadline even if it did not change.
     @return None
     """
     today = datetime.today().date()
@@ -439,7 +504,7 @@ def display_deadlines(deadlines: list, KDE_device: str, ntfy_server: str):
     level_to_max_days = {0: 0, 1: 4, 2: 7, 3: 14, 4: float("inf")}
     max_days_for_notification = level_to_max_days.get(notification_level, 0)
 
-    notifications = []
+    pending_notifications = []
     submitted_color = Colors.GREEN_BRIGHT
     show_submitted = lambda s: f"{submitted_color} (Submitted){Colors.RESET}" if s else ""
     show_extended = lambda e: f"{submitted_color} (Extended){Colors.RESET}" if e else ""
@@ -447,6 +512,13 @@ def display_deadlines(deadlines: list, KDE_device: str, ntfy_server: str):
     for assignment_number, subject, deadline_date, days_left, submitted, extended in parsed_deadlines:
         display_date = deadline_date.strftime("%#d %B") if os.name == "nt" else deadline_date.strftime("%-d %B")
         notification_message = f"{assignment_number}. {subject} - {display_date} {'Submitted' if submitted else ''}"
+        changed = True
+        record = None
+        # Without a notifier there is nothing to announce, recording would hide the assignments from a notifier added later
+        if state and (KDE_device or ntfy_server):
+            record = (subject, assignment_number, deadline_date.isoformat(), submitted, extended, notifications.deadline_title(days_left))
+            changed = state.assignment_change(*record) is not None or notify_all
+        queued = False
 
         for start, end, color, target, priority in rules:
             if start <= days_left <= end:
@@ -461,8 +533,12 @@ def display_deadlines(deadlines: list, KDE_device: str, ntfy_server: str):
                 )
                 target.append(colored)
 
-                if (KDE_device or ntfy_server) and (days_left <= max_days_for_notification) and not submitted or (notify_extended and extended):
-                    notifications.append((notification_message, days_left, priority, submitted, extended))
+                if changed and ((KDE_device or ntfy_server) and (days_left <= max_days_for_notification) and not submitted or (notify_extended and extended)):
+                    pending_notifications.append((notification_message, days_left, priority, submitted, extended, record))
+                    queued = True
+
+        if record and not queued:
+            state.record_assignment(*record)
 
     sections = [
         ("=== Due Today ===", due_today),
@@ -478,84 +554,287 @@ def display_deadlines(deadlines: list, KDE_device: str, ntfy_server: str):
             print()
 
     if ntfy_server or KDE_device:
-        for notification, days_left, priority, submitted, extended in notifications:
+        ntfy_notifications = []
+        kde_notifications = []
+        failed = set()
+        for notification, days_left, priority, submitted, extended, _ in pending_notifications:
             if KDE_device and (not submitted or (notify_extended and extended)):
-                subprocess.run(["kdeconnect-cli", "--device", KDE_device, "--ping-msg", notification])
+                kde_notifications.append(notification)
 
             if ntfy_server and (not submitted or (notify_extended and extended)):
-                if days_left == 0:
-                    send_notification("Assignment Due Today", notification, priority, ntfy_server)
-                elif days_left <= 4:
-                    send_notification("Assignment Due in Next 4 Days", notification, priority, ntfy_server)
-                elif days_left <= 7:
-                    send_notification("Assignment Due in Next 7 Days", notification, priority, ntfy_server)
-                elif days_left <= 14:
-                    send_notification("Assignment Due in Next 14 Days", notification, priority, ntfy_server)
+                ntfy_notifications.append((notifications.deadline_title(days_left), notification, priority, ""))
+
+        if kde_notifications:
+            with profiler.span("notify_kde"):
+                for notification, error in notifications.KdeConnectClient(KDE_device).send_all(kde_notifications):
+                    print(f"Failed to send KDE Connect notification '{notification.strip()}': {error}")
+                    failed.add(notification)
+
+        if ntfy_notifications:
+            with profiler.span("notify_ntfy"):
+                failed.update(message for _, message, _, _ in notifications.NtfyClient(ntfy_server).send_all(ntfy_notifications, digest))
+
+        # A notification that did not reach every notifier stays unrecorded, so the next run sends it again
+        for notification, _, _, _, _, record in pending_notifications:
+            if record and notification not in failed:
+                state.record_assignment(*record)
+
+def watch_assignments(args, session):
+    """
+    @brief Fetches the assignments of one watch cycle, reusing the warm session or browser.
+    @param args Parsed command-line arguments.
+    @param session The HTTP session of the previous cycle, or None if it has to be (re)established.
+    @return Tuple of (deadlines, assignment links, session to reuse in the next cycle).
+    """
+    global p, browser
+
+    if session is not None and args.engine == "http":
+        try:
+            deadlines, links = fetch_assignments_over_http(session, args.download_assignments, args.debug, args.download_workers)
+            return deadlines, links, session
+        except httpEngine.SessionExpiredError as e:
+            if args.debug:
+                print(f"Session expired ({e}), logging in again.")
+
+    session_status = None
+    if args.engine == "http" and browser is None:
+        session_status, session, first_page = httpEngine.probe_session(data_dir, enrollment_number, args.download_workers)
+        if session_status == httpEngine.SESSION_VALID:
+            deadlines, links = fetch_assignments_over_http(session, args.download_assignments, args.debug, args.download_workers, first_page)
+            return deadlines, links, session
+        if session_status == httpEngine.SESSION_UNKNOWN:
+            raise ConnectionError("No internet connection or the LMS is unreachable.")
+
+    # Only reached on the first cycle or after the session expired, the browser renews the cookies
+    if browser is None:
+        login_mode = args.login or (session_status == httpEngine.SESSION_EXPIRED and (enrollment_number == "" or password == ""))
+        if p is None:
+            p = sync_api.sync_playwright().start()
+        browser = start_playwright(args.debug, login_mode)
+        browser.pages[0].set_default_timeout(60000)
+    else:
+        login_mode = args.login
+
+    page = check_and_login(browser.pages[0], args.debug, login_mode, session_status)
+    deadlines, links = fetch_assignments(page, args.download_assignments, args.debug, args.concurrency, args.download_workers)
+    httpEngine.save_session_cookies(browser.cookies(), data_dir)
+    session = httpEngine.session_from_cookies(browser.cookies(), args.download_workers)
+
+    if args.engine == "http":
+        # The next cycles only need the renewed cookies, there is no reason to keep Chromium in memory
+        browser.close()
+        browser = None
+
+    return deadlines, links, session
+
+def watch_attendance(args, session, state: StateStore):
+    """
+    @brief Checks the attendance of one watch cycle over HTTP, or with the warm browser when one is running.
+    @param args Parsed command-line arguments.
+    @param session The HTTP session carrying the CMS cookies.
+    @param state The StateStore of the current cycle.
+    @return None
+    """
+    global p, browser
+
+    if browser is None:
+        try:
+            checkAttendance.display_attendance(httpEngine.fetch_attendance(session), args.debug, state)
+            return
+        except httpEngine.SessionExpiredError as e:
+            if args.debug:
+                print(f"CMS session expired ({e}), logging in with the browser.")
+            if p is None:
+                p = sync_api.sync_playwright().start()
+            browser = start_playwright(args.debug, False)
+
+    page = browser.new_page()
+    try:
+        checkAttendance.check_and_login_to_CMS(browser, page, args.debug)
+        checkAttendance.display_attendance(checkAttendance.extract_attendance(page), args.debug, state)
+        httpEngine.save_session_cookies(browser.cookies(), data_dir)
+    finally:
+        page.close()
+        if args.engine == "http":
+            browser.close()
+            browser = None
+
+def watch(args):
+    """
+    @brief Runs the assignment and attendance checks every args.interval minutes until interrupted.
+    @param args Parsed command-line arguments.
+    @return None
+    """
+    global browser
+
+    session = None
+    print(f"Watching assignments and attendance every {args.interval:g} minutes. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            started = monotonic()
+            print(f"=== {datetime.now().strftime('%Y-%m-%d %H:%M')} ===")
+
+            state = StateStore(os.path.join(data_dir, STATE_FILE_NAME), "checkAssignments")
+            try:
+                deadlines, links, session = watch_assignments(args, session)
+                snapshot.save_snapshot(deadlines)
+                if args.whatsapp:
+                    display_whatsapp_formatted_deadlines(deadlines)
                 else:
-                    send_notification("Upcoming Assignments", notification, priority, ntfy_server)
+                    display_deadlines(deadlines, args.kde, args.ntfy, args.digest, state, args.notify_all)
+                if args.download_assignments:
+                    cleanup_old_files(download_dir, links, args.debug)
+
+                watch_attendance(args, session, state)
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                # One failed cycle (LMS down, no internet) must not end the daemon, the next cycle starts from a fresh probe
+                print(f"Check failed: {e}")
+                try:
+                    page = browser.pages[0] if browser is not None and browser.pages else None
+                    print(f"Saved failure report to: {failureCapture.recorder.save('checkAssignments', e, page)}")
+                except Exception as inner_e:
+                    print(f"Failed to save debug info: {inner_e}")
+                session = None
+                if browser is not None:
+                    browser.close()
+                    browser = None
+            finally:
+                state.close()
+
+            remaining = args.interval * 60 - (monotonic() - started)
+            if remaining > 0:
+                sleep(remaining)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        if browser is not None:
+            browser.close()
+        if p is not None:
+            p.stop()
 
 if __name__ == "__main__":
     try:
+        args = parse_args()
+
+        if args.cached:
+            deadlines = snapshot.load_snapshot(args.max_age)
+            if deadlines is not None:
+                if args.whatsapp:
+                    display_whatsapp_formatted_deadlines(deadlines)
+                else:
+                    display_deadlines(deadlines, None, None)
+                exit(0)
+
+        load_settings()
         if download_dir == "" or data_dir == "":
             print("Error: One or more required environment variables are not set.")
             exit(1)
 
-        args = parse_args()
         browser = None
+        deadlines = None
+
+        if args.profile or args.profile_json:
+            profiler.enable(args.trace)
+
+        if args.watch:
+            p = None
+            if check_updates:
+                check_for_updates()
+            watch(args)
+            exit(0)
+
+        session_status = None
+
+        if args.engine == "http" and not args.login:
+            # One request with the stored cookies tells whether Chromium is needed at all
+            with profiler.span("probe_session"):
+                session_status, session, first_page = httpEngine.probe_session(data_dir, enrollment_number, args.download_workers)
+            if args.debug:
+                print(f"Session probe: {session_status}")
+
+            if session_status == httpEngine.SESSION_VALID:
+                try:
+                    with profiler.span("fetch_assignments_http"):
+                        deadlines, links = fetch_assignments_over_http(session, args.download_assignments, args.debug, args.download_workers, first_page)
+                except httpEngine.SessionExpiredError as e:
+                    session_status = None
+                    if args.debug:
+                        print(f"Stored session is not usable ({e}), falling back to the browser.")
+
+            elif session_status == httpEngine.SESSION_SURVEY:
+                print("Please complete the Quality Assurance Survey to proceed.")
+                run_qa_survey(None, args.debug)
+
+            elif session_status == httpEngine.SESSION_UNKNOWN:
+                # Launching Chromium would only fail the same way, or worse, open a login window on a headless machine
+                print("No internet connection. Please check your connection and try again.")
+                exit(1)
 
         try:
-            with sync_playwright() as p:
-                browser = start_playwright(args.debug, args.login)
-                page = browser.pages[0]
-                page.set_default_timeout(60000)
-                check_and_login(page, args.debug, args.login)
-                deadlines, patterns = fetch_assignments(page, args.download_assignments, args.debug)
-                browser.close()
+            if deadlines is None:
+                # Without credentials an expired session can only be renewed by the user, so start headed right away
+                login_mode = args.login or (session_status == httpEngine.SESSION_EXPIRED and (enrollment_number == "" or password == ""))
+
+                with sync_api.sync_playwright() as p:
+                    with profiler.span("browser_launch"):
+                        browser = start_playwright(args.debug, login_mode)
+                    page = browser.pages[0]
+                    page.set_default_timeout(60000)
+                    with profiler.span("login", trace=True):
+                        page = check_and_login(page, args.debug, login_mode, session_status)
+                    with profiler.span("fetch_assignments", trace=True):
+                        deadlines, links = fetch_assignments(page, args.download_assignments, args.debug, args.concurrency, args.download_workers)
+                    httpEngine.save_session_cookies(browser.cookies(), data_dir)
+                    profiler.stop_tracing()
+                    browser.close()
 
         except Exception as e:
             error_message = str(e)
 
-            if e == TimeoutError:
+            if isinstance(e, sync_api.TimeoutError):
                 print("Operation timed out. The LMS or CMS might be down or unresponsive.")
 
             elif ("ERR_INTERNET_DISCONNECTED" in error_message):
                 print("No internet connection. Please check your connection and try again.")
 
             else:
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                error_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_logs")
-                os.makedirs(error_dir, exist_ok=True)
-
-                html_file = f"{error_dir}/checkAssignments_error_{timestamp}.html"
-                screenshot_file = f"{error_dir}/checkAssignments_error_{timestamp}.png"
-
                 try:
                     print(f"A playwright error occurred: {e}")
-                    if browser and browser.pages:
-                        page = browser.pages[0]
-                        with open(html_file, "w", encoding="utf-8") as f:
-                            f.write(page.content())
-                        page.screenshot(path=screenshot_file, full_page=True)
-                        print(f"Saved debug HTML to: {html_file}")
-                        print(f"Saved screenshot to: {screenshot_file}")
+                    page = browser.pages[0] if browser and browser.pages else None
+                    bundle_file = failureCapture.recorder.save("checkAssignments", e, page)
+                    print(f"Saved failure report to: {bundle_file}")
+                    if browser:
                         browser.close()
-
                 except Exception as inner_e:
                     print(f"Failed to save debug info: {inner_e}")
             exit(1)
 
-        clear_terminal()
+        snapshot.save_snapshot(deadlines)
+        if not args.cached:
+            clear_terminal()
 
         if args.whatsapp:
             display_whatsapp_formatted_deadlines(deadlines)
         else:
-            display_deadlines(deadlines, args.kde, args.ntfy)
+            state = StateStore(os.path.join(data_dir, STATE_FILE_NAME), "checkAssignments")
+            try:
+                with profiler.span("display_deadlines"):
+                    display_deadlines(deadlines, args.kde, args.ntfy, args.digest, state, args.notify_all)
+            finally:
+                state.close()
 
         if args.download_assignments:
-            cleanup_old_files(download_dir, patterns, args.debug)
+            with profiler.span("cleanup"):
+                cleanup_old_files(download_dir, links, args.debug)
 
         if check_updates:
-            check_for_updates()
+            with profiler.span("check_for_updates"):
+                check_for_updates()
+
+        profiler.report(args.profile, args.profile_json)
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         exit(1)
\ No newline at end of file
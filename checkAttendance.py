@@ -1,10 +1,17 @@
 from playwright.sync_api import sync_playwright, BrowserContext, Page
-from datetime import datetime
+from datetime import datetime, timedelta
 import argparse
 import requests
 import os
 from dotenv import load_dotenv
 from time import sleep
+from stateStore import StateStore, STATE_FILE_NAME
+import portal
+import attendanceTable
+from profiling import profiler
+import failureCapture
+import profileMaintenance
+import browserBroker
 
 load_dotenv()
 enrollment_number = os.getenv("ENROLLMENT_NUMBER", "")
@@ -50,7 +57,7 @@ def check_and_login_to_CMS(browser, page, debug_mode: bool):
     @param debug_mode Boolean flag to enable debug output.
     @return None
     """
-    page.goto("https://cms.bahria.edu.pk/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx")
+    page.goto(f"{portal.CMS_BASE_URL}/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx")
     if "Login.aspx" in page.url:
         if debug_mode:
             print("Login required. Navigating to login page...")
@@ -60,7 +67,7 @@ def check_and_login_to_CMS(browser, page, debug_mode: bool):
         page.click(f"#pageContent > div.container-fluid > div.row > div > div:nth-child({instituition})")
 
         persist_cookies(browser, debug_mode)
-        page.goto("https://cms.bahria.edu.pk/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx")
+        page.goto(f"{portal.CMS_BASE_URL}/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx")
 
     else:
         logged_in_enrollment_number = page.locator("#ProfileInfo_lblUsername").text_content().strip()
@@ -93,69 +100,169 @@ def start_playwright(debug_mode: bool) -> BrowserContext:
     @param debug_mode Boolean flag to launch browser in debug mode (non-headless).
     @return BrowserContext object representing the persistent browser context.
     """
-    browser = p.chromium.launch_persistent_context(
-        user_data_dir=data_dir,
-        headless=not debug_mode,
-        no_viewport=True,
-        args=[
-            "--window-size=1920,1080",
-            "--disable-gpu",
-            "--disable-software-rasterizer",
-            "--disable-extensions",
-            "--disable-infobars",
-            "--disable-dev-shm-usage",
-            "--no-sandbox",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-logging",
-            "--log-level=3",
-            "--disable-features=Translate,BackForwardCache,RendererCodeIntegrity,IsolateOrigins,site-per-process",
-            "--blink-settings=imagesEnabled=false",
-            "--disable-animations",
-            "--mute-audio"
-        ]
-    )
+    browser = None
+    if browserBroker.browser_broker:
+        if not debug_mode:
+            browser = browserBroker.connect(p, debug_mode)
+        else:
+            # A visible window cannot be taken from the headless broker, it needs the profile for itself
+            browserBroker.stop()
+
+    if browser is None:
+        profileMaintenance.maintain_profile(data_dir, debug_mode)
+        browser = p.chromium.launch_persistent_context(
+            user_data_dir=data_dir,
+            headless=not debug_mode,
+            no_viewport=True,
+            args=[
+                "--window-size=1920,1080",
+                "--disable-gpu",
+                "--disable-software-rasterizer",
+                "--disable-extensions",
+                "--disable-infobars",
+                "--disable-dev-shm-usage",
+                "--no-sandbox",
+                "--disable-blink-features=AutomationControlled",
+                "--disable-logging",
+                "--log-level=3",
+                "--disable-features=Translate,BackForwardCache,RendererCodeIntegrity,IsolateOrigins,site-per-process",
+                "--blink-settings=imagesEnabled=false",
+                "--disable-animations",
+                "--mute-audio",
+                *profileMaintenance.cache_args(data_dir)
+            ]
+        )
+    profiler.instrument_context(browser)
+    failureCapture.recorder.instrument_context(browser)
 
     return browser
 
-def scrape_attendance(page: Page, debug_mode: bool):
+def extract_attendance(page: Page) -> list:
     """
-    @brief Extracts and displays attendance statistics for all subjects.
+    @brief Reads the attendance table of StudentWiseAttendance.aspx in one evaluate call.
     @param page The Playwright page object containing attendance data.
+    @return List of dictionaries with subject, credits, absences and every other column of every row (see attendanceTable.attendance_rows).
+    """
+    return attendanceTable.attendance_rows(page.evaluate(attendanceTable.ATTENDANCE_SCRIPT))
+
+def absence_limits(subject: str, credits: str) -> tuple:
+    """
+    @brief Calculates the absence limit of a subject and what one missed class counts as.
+    @param subject The subject name, labs allow 12 absences per credit hour instead of 4.
+    @param credits The credit hours of the subject.
+    @return Tuple of (maximum absences, absences per missed class).
+    """
+    credits = int(credits) or 1
+    if subject.split()[-1] == "Lab":
+        return credits * 12, credits * 3
+    return credits * 4, credits / 2
+
+def classes_left(subject: str, credits: str, absences) -> tuple:
+    """
+    @brief Calculates the classes a student can still miss in a subject.
+    @param subject The subject name.
+    @param credits The credit hours of the subject.
+    @param absences The current number of absences.
+    @return Tuple of (classes left, classes allowed), classes left is negative once the limit is exceeded.
+    """
+    max_absences, per_class = absence_limits(subject, credits)
+    return (max_absences - float(absences)) / per_class, max_absences / per_class
+
+def display_attendance(attendance: list, debug_mode: bool, state: StateStore = None):
+    """
+    @brief Displays the remaining absences of every subject.
+    @param attendance List of dictionaries as returned by extract_attendance.
     @param debug_mode Boolean flag to enable debug output.
+    @param state Optional StateStore the absences of this run are recorded in.
     @return None
     """
-    rows = page.locator("#pageContent > div.container-fluid > div.table-responsive > table > tbody > tr").all()
-    for row in rows:
-        cells = row.locator("td").all()
-        subject = cells[2].inner_text().strip()
-        credits = cells[3].inner_text().strip()
-        absences = cells[10].inner_text().strip()
+    for row in attendance:
+        subject = row["subject"]
+        credits = row["credits"]
+        absences = row["absences"]
 
         if debug_mode:
             print(f"Processing subject: {subject}, Credits: {credits}, Absences: {absences}")
 
-        if credits == "0":
-            credits = "1"
-            if debug_mode:
-                print(f"Credits for {subject} was 0, setting to 1 to avoid division by zero.")
+        if state:
+            state.record_attendance(subject, credits, float(absences))
+
+        left, allowed = classes_left(subject, credits, absences)
 
-        if(subject.split()[-1] == "Lab"):
-            max_absences = int(credits) * 12
+        if left <= 2:
+            print(f"\033[1;97m{subject}\033[0m: \033[1;91m{format_number(left)}/{int(allowed)}\033[0m")
         else:
-            max_absences = int(credits) * 4
-        absences_remaining = max_absences - float(absences)
+            print(f"\033[1;97m{subject}\033[0m: {format_number(left)}/{int(allowed)}")
 
-        if subject.split()[-1] == "Lab":
-            if int(format_number(absences_remaining / (int(credits) * 3))) <= 2:
-                print(f"\033[1;97m{subject}\033[0m: \033[1;91m{format_number(absences_remaining / (int(credits) * 3))}/{int(max_absences / (int(credits) * 3))}\033[0m")
-            else:
-                print(f"\033[1;97m{subject}\033[0m: {format_number(absences_remaining / (int(credits) * 3))}/{int(max_absences / (int(credits) * 3))}")
+def forecast_attendance(state: StateStore) -> list:
+    """
+    @brief Projects from the stored history how many classes can still be missed and when the limit is reached at the current pace.
+    @param state The StateStore holding the attendance history, nothing is scraped.
+    @return List of dictionaries with subject, classes_left, classes_allowed, days_per_class (None without new absences),
+            limit_date (None if not projected) and since (start of the measured period).
+    """
+    forecast = []
+    for subject, credits, absences, checked in state.current_attendance():
+        left, allowed = classes_left(subject, credits, absences)
+        per_class = absence_limits(subject, credits)[1]
+        checked = datetime.fromisoformat(checked)
+
+        # The pace is measured since the absences last went down, i.e. since the start of the semester
+        history = state.attendance_history(subject)
+        start = 0
+        for index in range(1, len(history)):
+            if history[index][2] < history[index - 1][2]:
+                start = index
+        since, _, start_absences = history[start] if history else (checked.isoformat(), credits, absences)
+        since = datetime.fromisoformat(since)
+        days = (checked - since).total_seconds() / 86400
+        missed = (absences - start_absences) / per_class
+
+        days_per_class = days / missed if missed > 0 and days >= 1 else None
+        limit_date = None
+        if days_per_class is not None and left > 0:
+            limit_date = (checked + timedelta(days=left * days_per_class)).date()
+
+        forecast.append({
+            "subject": subject,
+            "classes_left": left,
+            "classes_allowed": allowed,
+            "days_per_class": days_per_class,
+            "limit_date": limit_date,
+            "since": since.date()
+        })
+    return forecast
+
+def display_forecast(forecast: list):
+    """
+    @brief Prints the classes left of every subject and the date the limit is reached at the current pace.
+    @param forecast List of dictionaries as returned by forecast_attendance.
+    @return None
+    """
+    if not forecast:
+        print("No attendance history yet, run checkAttendance.py once first.")
+        return
 
+    for row in forecast:
+        left = f"{format_number(row['classes_left'])}/{format_number(row['classes_allowed'])} classes left"
+        if row["classes_left"] <= 0:
+            outlook = "limit reached"
+        elif row["limit_date"]:
+            outlook = f"one class missed every {format_number(row['days_per_class'])} days, limit around {row['limit_date'].strftime('%d %B %Y')}"
         else:
-            if int(format_number(absences_remaining / int(credits) * 2)) <= 2:
-                print(f"\033[1;97m{subject}\033[0m: \033[1;91m{format_number((absences_remaining / int(credits) * 2))}/{int(max_absences / int(credits) * 2)}\033[0m")
-            else:
-                print(f"\033[1;97m{subject}\033[0m: {format_number((absences_remaining / int(credits) * 2))}/{int(max_absences / int(credits) * 2)}")
+            outlook = f"no classes missed since {row['since'].strftime('%d %B %Y')}"
+        color = "\033[1;91m" if row["classes_left"] <= 2 else ""
+        print(f"\033[1;97m{row['subject']}\033[0m: {color}{left}\033[0m ({outlook})")
+
+def scrape_attendance(page: Page, debug_mode: bool, state: StateStore = None):
+    """
+    @brief Extracts and displays attendance statistics for all subjects.
+    @param page The Playwright page object containing attendance data.
+    @param debug_mode Boolean flag to enable debug output.
+    @param state Optional StateStore the absences of this run are recorded in.
+    @return None
+    """
+    display_attendance(extract_attendance(page), debug_mode, state)
 
 def parse_args():
     """
@@ -164,23 +271,44 @@ def parse_args():
     """
     parser = argparse.ArgumentParser()
     parser.add_argument("--debug", "-d", action="store_true", help="Enable debug mode")
+    parser.add_argument("--forecast", "-f", action="store_true", help="Show the classes left and the projected date of reaching the limit from the stored history, without checking CMS")
+    parser.add_argument("--profile", "-P", action="store_true", help="Print the time spent in each stage and the request counters at the end")
+    parser.add_argument("--profile-json", metavar="FILE", default="", help="Write the stage timings and counters to a JSON file")
+    parser.add_argument("--trace", metavar="FILE", default="", help="Save a Playwright trace of the slowest browser stage (with --profile or --profile-json)")
     return parser.parse_args()
 
 if __name__ == "__main__":
     try:
+        args = parse_args()
+
+        if args.forecast and data_dir != "":
+            state = StateStore(os.path.join(data_dir, STATE_FILE_NAME))
+            display_forecast(forecast_attendance(state))
+            state.close()
+            exit(0)
+
         if enrollment_number == "" or password == "" or data_dir == "":
             print("Error: ENROLLMENT_NUMBER, PASSWORD, and USER_DATA_DIR must be set in the .env file.")
             exit(1)
-
-        args = parse_args()
         browser = None
 
+        if args.profile or args.profile_json:
+            profiler.enable(args.trace)
+
         try:
             with sync_playwright() as p:
-                browser = start_playwright(args.debug)
+                with profiler.span("browser_launch"):
+                    browser = start_playwright(args.debug)
                 page = browser.pages[0]
-                check_and_login_to_CMS(browser, page, args.debug)
-                scrape_attendance(page, args.debug)
+                with profiler.span("login", trace=True):
+                    check_and_login_to_CMS(browser, page, args.debug)
+                state = StateStore(os.path.join(data_dir, STATE_FILE_NAME), "checkAttendance")
+                try:
+                    with profiler.span("scrape_attendance", trace=True):
+                        scrape_attendance(page, args.debug, state)
+                finally:
+                    state.close()
+                profiler.stop_tracing()
                 browser.close()
 
         except Exception as e:
@@ -193,29 +321,22 @@ if __name__ == "__main__":
                 print("No internet connection. Please check your connection and try again.")
 
             else:
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                error_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_logs")
-                os.makedirs(error_dir, exist_ok=True)
-
-                html_file = f"{error_dir}/checkAttendance_error_{timestamp}.html"
-                screenshot_file = f"{error_dir}/checkAttendance_error_{timestamp}.png"
-
                 try:
                     print(f"A playwright error occurred: {e}")
-                    if browser and browser.pages:
-                        page = browser.pages[0]
-                        with open(html_file, "w", encoding="utf-8") as f:
-                            f.write(page.content())
-                        page.screenshot(path=screenshot_file, full_page=True)
-                        print(f"Saved debug HTML to: {html_file}")
-                        print(f"Saved screenshot to: {screenshot_file}")
+                    page = browser.pages[0] if browser and browser.pages else None
+                    bundle_file = failureCapture.recorder.save("checkAttendance", e, page)
+                    print(f"Saved failure report to: {bundle_file}")
+                    if browser:
                         browser.close()
                 except Exception as inner_e:
                     print(f"Failed to save debug info: {inner_e}")
             exit(1)
 
         if check_updates:
-            check_for_updates()
+            with profiler.span("check_for_updates"):
+                check_for_updates()
+
+        profiler.report(args.profile, args.profile_json)
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         exit(1)
\ No newline at end of file
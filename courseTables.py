@@ -0,0 +1,161 @@
+from playwright.sync_api import Page, TimeoutError
+from collections import deque
+import portal
+
+ASSIGNMENTS_URL = f"{portal.LMS_BASE_URL}/Student/Assignments.php"
+
+# Marks the currently shown table so a refreshed one can be told apart from it, even when the new course has no rows at all
+MARK_AND_SELECT_SCRIPT = """(courseId) => {
+    const table = document.querySelector("table.table-hover");
+    window.courseTableObserver?.disconnect();
+    if (table) {
+        table.setAttribute("data-stale", "1");
+        table.removeAttribute("data-refreshed");
+        window.courseTableObserver = new MutationObserver(() => {
+            table.setAttribute("data-refreshed", "1");
+            window.courseTableObserver.disconnect();
+        });
+        window.courseTableObserver.observe(table, { childList: true, subtree: true });
+    }
+    const select = document.querySelector("#courseId");
+    select.value = courseId;
+    select.dispatchEvent(new Event("input", { bubbles: true }));
+    select.dispatchEvent(new Event("change", { bubbles: true }));
+}"""
+
+# Truthy once the refreshed table is complete: it has assignment rows, or positively shows no assignments with only
+# its header row or a "no records" row. A table that was cleared and is still loading keeps the wait going.
+TABLE_READY_SCRIPT = """() => {
+    const table = document.querySelector("table.table-hover:not([data-stale]), table.table-hover[data-refreshed]");
+    if (!table) return false;
+    const rows = Array.from(table.querySelectorAll("tbody tr"));
+    if (rows.length === 0) return false;
+    const body = rows.slice(1);
+    if (body.some(row => row.querySelectorAll("td").length >= 8)) return "rows";
+    if (body.length <= 1 && /no (data|records?|assignments?)|not found/i.test(rows[rows.length - 1].innerText)) return "empty";
+    const isHeader = rows[0].querySelector("th") !== null || rows[0].querySelectorAll("td").length >= 8;
+    return body.length === 0 && isHeader ? "empty" : false;
+}"""
+
+TABLE_SCRIPT = """() => {
+    const rows = Array.from(document.querySelectorAll("table.table-hover tbody tr")).slice(1);
+    return rows.map(row => {
+        const cells = row.querySelectorAll("td");
+        if (cells.length < 8) return null;
+        return {
+            action: cells[6].innerText,
+            assignment_number: cells[0].innerText.trim(),
+            assignment_name: cells[1].innerText.trim(),
+            deadline_text: cells[7].querySelector("small")?.innerText || "",
+            deadline_title: cells[7].querySelector("small")?.getAttribute("title") || "",
+            download_url: cells[2].querySelector("a")?.getAttribute("href") || ""
+        };
+    }).filter(item => item !== null);
+}"""
+
+def table_deadlines(course_name: str, table_data: list, download=None) -> list:
+    """
+    @brief Turns the rows of one course table into deadlines, shared by every engine.
+    @param course_name The name of the course the table belongs to.
+    @param table_data Rows as returned by TABLE_SCRIPT or httpEngine.parse_assignments_page.
+    @param download Optional callback called with (course name, assignment name, deadline date, link) for every
+                    open assignment with a file, e.g. AssignmentDownloader.submit.
+    @return List of ((assignment number, course name, deadline date, submitted, extended), download result) tuples,
+            the result is None without a callback or file.
+    """
+    deadlines = []
+    for item in table_data:
+        # Only open assignments have a Submit or Delete action
+        if "Submit" not in item['action'] and "Delete" not in item['action']:
+            continue
+
+        # Drop the time / days left suffix
+        deadline_date = item['deadline_text'].split('-')[0].strip()
+        if not deadline_date:
+            continue
+
+        result = None
+        if download and item['download_url']:
+            result = download(course_name, item['assignment_name'], deadline_date, f"{portal.LMS_BASE_URL}/Student/{item['download_url']}")
+
+        deadlines.append(((
+            item['assignment_number'],
+            course_name,
+            deadline_date,
+            "Delete" in item['action'],
+            "Extended" in item['deadline_title']
+        ), result))
+    return deadlines
+
+def read_course_table(page: Page, timeout: int = 60000) -> list:
+    """
+    @brief Waits for the table of the course selected with MARK_AND_SELECT_SCRIPT and reads its rows.
+    @param page The page the course was selected on.
+    @param timeout Milliseconds to wait for the table to show its rows or that the course has none.
+    @return List of table rows, empty if the course has no assignments.
+    @throws TimeoutError If the table did not finish loading in time.
+    """
+    page.wait_for_function(TABLE_READY_SCRIPT, timeout=timeout)
+    return page.evaluate(TABLE_SCRIPT)
+
+def extract_course_tables(page: Page, courses: list, concurrency: int, timeout: int = 60000, on_table=None, debug_mode: bool = False) -> list:
+    """
+    @brief Extracts the assignment table of every course using up to `concurrency` pages of the same context.
+    @param page A page already showing Assignments.php, used as the first worker.
+    @param courses List of course dictionaries with id and name keys.
+    @param concurrency Maximum number of pages loading a course at the same time.
+    @param timeout Milliseconds to wait for a course table to finish loading before skipping the course.
+    @param on_table Optional callback called with (index, table rows) as soon as a course table is extracted.
+    @param debug_mode Boolean flag to enable debug output.
+    @return List of table rows per course, in the same order as `courses`.
+    """
+    results = [[] for _ in courses]
+    if not courses:
+        return results
+
+    worker_count = max(1, min(concurrency, len(courses)))
+    workers = [page]
+
+    # Extra pages start loading in the background, we only block on them when a course is assigned
+    for _ in range(worker_count - 1):
+        worker = page.context.new_page()
+        worker.evaluate(f"window.location.href = '{ASSIGNMENTS_URL}'")
+        workers.append(worker)
+
+    pending = deque(enumerate(courses))
+    in_flight = deque()
+
+    def assign(worker: Page):
+        index, course = pending.popleft()
+        worker.wait_for_selector("#courseId", state="attached")
+        # Rows of the default course parsed after the select would not be marked as stale
+        worker.wait_for_load_state("domcontentloaded")
+        worker.evaluate(MARK_AND_SELECT_SCRIPT, course["id"])
+        in_flight.append((worker, index, course))
+
+    try:
+        for worker in workers:
+            if pending:
+                assign(worker)
+
+        # Courses were dispatched in order, so waiting on the oldest one first never blocks a finished page
+        while in_flight:
+            worker, index, course = in_flight.popleft()
+            try:
+                results[index] = read_course_table(worker, timeout)
+            except TimeoutError:
+                # Never silent, the deadlines of this course are missing from the run
+                print(f"The table of {course['name']} did not load")
+
+            if debug_mode:
+                print(f"Extracted {len(results[index])} rows for {course['name']}")
+            if on_table:
+                on_table(index, results[index])
+
+            if pending:
+                assign(worker)
+    finally:
+        for worker in workers[1:]:
+            worker.close()
+
+    return results
@@ -0,0 +1,119 @@
+from datetime import datetime
+import threading
+import json
+import os
+
+CACHE_FILE_NAME = "downloadCache.json"
+
+class DownloadCache:
+    """
+    @brief Persistent record of downloaded files (path, ETag / Last-Modified, SHA-256) keyed by assignment link.
+    """
+    def __init__(self, cache_file: str):
+        """
+        @brief Loads the cache from disk, starting empty if the file is missing or unreadable.
+        @param cache_file Path of the JSON file backing the cache.
+        """
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable download cache {cache_file}: {e}")
+
+    def get(self, link: str) -> dict:
+        """
+        @brief Returns the entry of a link if its file still exists on disk.
+        @param link The assignment download URL.
+        @return Entry dictionary or None.
+        """
+        with self.lock:
+            entry = self.entries.get(link)
+        if entry and os.path.exists(entry["path"]):
+            return entry
+        return None
+
+    def conditional_headers(self, link: str) -> dict:
+        """
+        @brief Builds the If-None-Match / If-Modified-Since headers for a link.
+        @param link The assignment download URL.
+        @return Dictionary of request headers, empty if nothing is cached.
+        """
+        entry = self.get(link)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, link: str, path: str, etag: str, last_modified: str, sha256: str, size: int):
+        """
+        @brief Records a freshly downloaded file.
+        @param link The assignment download URL.
+        @param path The final path of the file.
+        @param etag The ETag response header, if any.
+        @param last_modified The Last-Modified response header, if any.
+        @param sha256 Hex digest of the file content.
+        @param size Size of the file in bytes.
+        @return None
+        """
+        with self.lock:
+            self.entries[link] = {
+                "path": path,
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+                "sha256": sha256,
+                "size": size,
+                "checked": datetime.now().isoformat(timespec="seconds")
+            }
+
+    def move(self, link: str, path: str):
+        """
+        @brief Updates the saved path of an unchanged file, e.g. after its deadline moved.
+        @param link The assignment download URL.
+        @param path The new path of the file.
+        @return None
+        """
+        with self.lock:
+            if link in self.entries:
+                self.entries[link]["path"] = path
+                self.entries[link]["checked"] = datetime.now().isoformat(timespec="seconds")
+
+    def remove(self, link: str):
+        """
+        @brief Forgets a link, e.g. after its download failed.
+        @param link The assignment download URL.
+        @return None
+        """
+        with self.lock:
+            self.entries.pop(link, None)
+
+    def prune(self, current_links: set) -> list:
+        """
+        @brief Drops the entries of links that were not seen in the current run.
+        @param current_links Set of assignment links listed by the LMS in this run.
+        @return List of file paths that belonged to the dropped entries.
+        """
+        with self.lock:
+            stale_links = [link for link in self.entries if link not in current_links]
+            return [self.entries.pop(link)["path"] for link in stale_links]
+
+    def save(self):
+        """
+        @brief Atomically writes the cache back to disk.
+        @return None
+        """
+        with self.lock:
+            directory = os.path.dirname(self.cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = f"{self.cache_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(temp_file, self.cache_file)
@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from downloadCache import DownloadCache
+import requests
+import hashlib
+import glob
+import os
+import portal
+from profiling import profiler
+
+REFERER = f"{portal.LMS_BASE_URL}/Student/Assignments.php"
+
+def filename_from_response(response: requests.Response) -> str:
+    """
+    @brief Determines the server-side file name of a download response.
+    @param response The streamed response of the download request.
+    @return File name from the Content-Disposition header, or the last URL path segment.
+    """
+    disposition = response.headers.get("Content-Disposition", "")
+    for part in disposition.split(";"):
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "filename*":
+            return requests.utils.unquote(value.split("''")[-1].strip('"'))
+        if key.lower() == "filename":
+            return requests.utils.unquote(value.strip('"'))
+    return os.path.basename(requests.utils.unquote(response.url.split("?")[0]))
+
+class AssignmentDownloader:
+    """
+    @brief Downloads assignment files concurrently through a bounded worker pool.
+    """
+    def __init__(self, session: requests.Session, download_dir: str, max_workers: int = 4, skip_existing: bool = True, cache: DownloadCache = None, debug_mode: bool = False):
+        """
+        @brief Creates the worker pool.
+        @param session The requests session carrying the LMS cookies, shared by all workers.
+        @param download_dir The root directory, files are saved under download_dir/<subject>.
+        @param max_workers Maximum number of downloads running at the same time.
+        @param skip_existing Boolean flag to skip assignments that already have a matching file (only used without a cache).
+        @param cache Optional DownloadCache used to send conditional requests instead of skipping by file name.
+        @param debug_mode Boolean flag to enable debug output.
+        """
+        self.session = session
+        self.download_dir = download_dir
+        self.skip_existing = skip_existing
+        self.cache = cache
+        self.debug_mode = debug_mode
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+        self.futures = []
+
+    def submit(self, subject_name: str, assignment_name: str, deadline_date: str, assignment_link: str) -> Future:
+        """
+        @brief Queues an assignment file for download and returns immediately.
+        @param subject_name The name of the subject for the assignment.
+        @param assignment_name The name of the assignment.
+        @param deadline_date The deadline date formatted as string.
+        @param assignment_link The URL link to the assignment file.
+        @return Future resolving to the final path of the file.
+        """
+        future = self.executor.submit(self._download, subject_name, assignment_name, deadline_date, assignment_link)
+        future.description = f"{subject_name}/{assignment_name}"
+        self.futures.append(future)
+        return future
+
+    def _download(self, subject_name: str, assignment_name: str, deadline_date: str, assignment_link: str) -> str:
+        """
+        @brief Streams one assignment file straight to its final path.
+        @return The final path of the file.
+        """
+        with profiler.span("download"):
+            return self._fetch(subject_name, assignment_name, deadline_date, assignment_link)
+
+    def _fetch(self, subject_name: str, assignment_name: str, deadline_date: str, assignment_link: str) -> str:
+        """
+        @brief Does the work of _download.
+        @return The final path of the file.
+        """
+        subject_dir = os.path.join(self.download_dir, subject_name)
+        os.makedirs(subject_dir, exist_ok=True)
+
+        final_base = os.path.join(subject_dir, f"{assignment_name} - {deadline_date}")
+
+        cached = self.cache.get(assignment_link) if self.cache else None
+        if self.cache and cached is None:
+            # The entry (if any) points to a file that was deleted, download it like a new one
+            self.cache.remove(assignment_link)
+
+        # Without validators a conditional request always returns the whole file, so fall back to the file name
+        has_validators = cached is not None and bool(cached.get("etag") or cached.get("last_modified"))
+        if not has_validators and self.skip_existing and (self.cache is None or cached is not None):
+            matching_files = glob.glob(glob.escape(final_base) + ".*")
+            if matching_files:
+                return matching_files[0]
+
+        headers = {"Referer": REFERER}
+        if has_validators:
+            headers.update(self.cache.conditional_headers(assignment_link))
+
+        with self.session.get(assignment_link, stream=True, timeout=60, headers=headers) as response:
+            if has_validators and response.status_code == 304:
+                if not os.path.exists(cached["path"]):
+                    # Deleted while the request was in flight, fetch it again unconditionally
+                    self.cache.remove(assignment_link)
+                    return self._fetch(subject_name, assignment_name, deadline_date, assignment_link)
+                return self._reuse_cached(assignment_link, cached["path"], final_base)
+
+            response.raise_for_status()
+            _, file_ext = os.path.splitext(filename_from_response(response))
+            final_path = f"{final_base}{file_ext}"
+            digest = hashlib.sha256()
+            size = 0
+
+            try:
+                with open(final_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                profiler.count("bytes_downloaded", size)
+            except BaseException:
+                # Never leave a truncated file behind, it would be mistaken for a finished download
+                if os.path.exists(final_path):
+                    os.remove(final_path)
+                if self.cache:
+                    self.cache.remove(assignment_link)
+                raise
+
+        if self.cache:
+            if cached and cached["path"] != final_path and os.path.exists(cached["path"]):
+                os.remove(cached["path"])
+            self.cache.update(assignment_link, final_path, response.headers.get("ETag"), response.headers.get("Last-Modified"), digest.hexdigest(), size)
+
+        if self.debug_mode:
+            print(f"Downloaded: {final_path}")
+
+        return final_path
+
+    def _reuse_cached(self, assignment_link: str, cached_path: str, final_base: str) -> str:
+        """
+        @brief Keeps an unchanged file, renaming it when the deadline in its name moved.
+        @return The final path of the file.
+        """
+        _, file_ext = os.path.splitext(cached_path)
+        final_path = f"{final_base}{file_ext}"
+
+        if cached_path != final_path:
+            os.replace(cached_path, final_path)
+            self.cache.move(assignment_link, final_path)
+            if self.debug_mode:
+                print(f"Renamed unchanged file: {cached_path} -> {final_path}")
+        elif self.debug_mode:
+            print(f"Not modified: {final_path}")
+
+        return final_path
+
+    def wait(self) -> list:
+        """
+        @brief Blocks until every queued download has finished and shuts the pool down.
+        @return List of (description, exception) tuples for the downloads that failed.
+        """
+        wait(self.futures)
+        self.executor.shutdown()
+        if self.cache:
+            self.cache.save()
+
+        failures = []
+        for future in self.futures:
+            if future.exception() is not None:
+                failures.append((future.description, future.exception()))
+                print(f"Failed to download {future.description}: {future.exception()}")
+
+        return failures
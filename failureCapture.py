@@ -0,0 +1,191 @@
+from collections import deque
+from datetime import datetime
+from dotenv import load_dotenv
+import traceback
+import time
+import json
+import os
+
+load_dotenv()
+capture_html = int(os.getenv("CAPTURE_HTML", "1"))
+capture_screenshot = int(os.getenv("CAPTURE_SCREENSHOT", "0"))
+error_logs_max_mb = float(os.getenv("ERROR_LOGS_MAX_MB", "50"))
+error_logs_max_days = float(os.getenv("ERROR_LOGS_MAX_DAYS", "14"))
+
+ERROR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_logs")
+EVENT_BUFFER_SIZE = 100
+MAX_EVENT_TEXT = 500
+MAX_HTML_BYTES = 256 * 1024
+SCREENSHOT_TIMEOUT = 5000
+
+class FailureRecorder:
+    """
+    @brief Keeps the last navigations, failed responses and console errors of a browser context and writes them as a small bundle when a run fails.
+    """
+    def __init__(self, error_dir: str = ERROR_DIR, size: int = EVENT_BUFFER_SIZE):
+        """
+        @brief Creates an empty ring buffer.
+        @param error_dir Directory the bundles are written to.
+        @param size Number of events kept, older ones are dropped.
+        """
+        self.error_dir = error_dir
+        self.events = deque(maxlen=size)
+        self.started = time.monotonic()
+
+    def instrument_context(self, context):
+        """
+        @brief Records the events of every current and future page of a (sync or async) browser context.
+        @param context The BrowserContext to record.
+        @return None
+        """
+        context.on("page", self.instrument_page)
+        context.on("response", self._on_response)
+        context.on("requestfailed", self._on_request_failed)
+        for page in context.pages:
+            self.instrument_page(page)
+
+    def instrument_page(self, page):
+        """
+        @brief Records the main-frame navigations, console errors and uncaught exceptions of a page.
+        @param page The Page to record.
+        @return None
+        """
+        page.on("framenavigated", lambda frame: self.record("navigation", frame.url) if frame.parent_frame is None else None)
+        page.on("console", lambda message: self.record("console", message.text) if message.type == "error" else None)
+        page.on("pageerror", lambda error: self.record("pageerror", str(error)))
+
+    def record(self, kind: str, text: str):
+        """
+        @brief Adds an event to the ring buffer.
+        @param kind Kind of the event, e.g. navigation or console.
+        @param text URL or message of the event, truncated to MAX_EVENT_TEXT characters.
+        @return None
+        """
+        self.events.append({"time": round(time.monotonic() - self.started, 3), "kind": kind, "text": text[:MAX_EVENT_TEXT]})
+
+    def _on_response(self, response):
+        # Successful responses only matter for documents and XHRs, the URL of everything else is noise
+        if response.status >= 400 or response.request.resource_type in ["document", "xhr", "fetch"]:
+            self.record("response", f"{response.status} {response.url}")
+
+    def _on_request_failed(self, request):
+        # Requests aborted by the request blocker are expected
+        if request.failure != "net::ERR_FAILED":
+            self.record("requestfailed", f"{request.failure} {request.url}")
+
+    def save(self, name: str, error: Exception, page=None) -> str:
+        """
+        @brief Writes the bundle of a failure, with the capped HTML and a viewport screenshot of a (sync) page if enabled.
+        @param name Name of the script or task that failed.
+        @param error The exception.
+        @param page Optional Page that was in use, skipped if it is closed or does not answer.
+        @return Path of the JSON bundle.
+        """
+        bundle, html_file, screenshot_file = self._prepare(name, error, page)
+        if page is not None and not page.is_closed():
+            bundle["url"] = page.url
+            if html_file:
+                try:
+                    bundle["html_file"] = self._write_html(html_file, page.content())
+                except Exception as e:
+                    bundle["html_error"] = str(e)
+            if screenshot_file:
+                try:
+                    page.screenshot(path=screenshot_file, type="jpeg", quality=60, timeout=SCREENSHOT_TIMEOUT)
+                    bundle["screenshot_file"] = screenshot_file
+                except Exception as e:
+                    bundle["screenshot_error"] = str(e)
+        return self._finish(bundle)
+
+    async def save_async(self, name: str, error: Exception, page=None) -> str:
+        """
+        @brief Writes the bundle of a failure, with the capped HTML and a viewport screenshot of an async page if enabled.
+        @param name Name of the script or task that failed.
+        @param error The exception.
+        @param page Optional async Page that was in use, skipped if it is closed or does not answer.
+        @return Path of the JSON bundle.
+        """
+        bundle, html_file, screenshot_file = self._prepare(name, error, page)
+        if page is not None and not page.is_closed():
+            bundle["url"] = page.url
+            if html_file:
+                try:
+                    bundle["html_file"] = self._write_html(html_file, await page.content())
+                except Exception as e:
+                    bundle["html_error"] = str(e)
+            if screenshot_file:
+                try:
+                    await page.screenshot(path=screenshot_file, type="jpeg", quality=60, timeout=SCREENSHOT_TIMEOUT)
+                    bundle["screenshot_file"] = screenshot_file
+                except Exception as e:
+                    bundle["screenshot_error"] = str(e)
+        return self._finish(bundle)
+
+    def _prepare(self, name: str, error: Exception, page) -> tuple:
+        """
+        @brief Builds the bundle and the paths of its optional attachments.
+        @return Tuple of (bundle, HTML path or "", screenshot path or "").
+        """
+        os.makedirs(self.error_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        base = os.path.join(self.error_dir, f"{name}_error_{timestamp}")
+
+        bundle = {
+            "name": name,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "error": f"{type(error).__name__}: {error}",
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__))[-8000:],
+            "events": list(self.events),
+            "file": f"{base}.json"
+        }
+        html_file = f"{base}.html" if capture_html and page is not None else ""
+        screenshot_file = f"{base}.jpg" if capture_screenshot and page is not None else ""
+        return bundle, html_file, screenshot_file
+
+    def _write_html(self, html_file: str, html: str) -> str:
+        encoded = html.encode("utf-8")
+        with open(html_file, "wb") as f:
+            f.write(encoded[:MAX_HTML_BYTES])
+        return html_file
+
+    def _finish(self, bundle: dict) -> str:
+        with open(bundle["file"], "w", encoding="utf-8") as f:
+            json.dump(bundle, f, indent=2)
+        prune_error_logs(self.error_dir)
+        return bundle["file"]
+
+def prune_error_logs(error_dir: str = ERROR_DIR, max_mb: float = error_logs_max_mb, max_days: float = error_logs_max_days):
+    """
+    @brief Deletes failure files older than max_days, then the oldest ones until the directory fits in max_mb.
+    @param error_dir Directory of the failure bundles.
+    @param max_mb Maximum total size of the directory in megabytes.
+    @param max_days Maximum age of a file in days.
+    @return Number of deleted files.
+    """
+    if not os.path.isdir(error_dir):
+        return 0
+
+    files = []
+    for entry in os.scandir(error_dir):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+
+    cutoff = time.time() - max_days * 86400
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= max_mb * 1024 * 1024:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            deleted += 1
+        except OSError as e:
+            print(f"Failed to delete old failure file {path}: {e}")
+
+    return deleted
+
+recorder = FailureRecorder()
@@ -5,7 +5,14 @@ import requests
 import os
 import platform
 import argparse
-from time import sleep
+from collections import deque
+import portal
+from profiling import profiler
+import failureCapture
+import profileMaintenance
+import browserBroker
+import rateLimiter
+import surveySchema
 
 load_dotenv()
 enrollment_number = os.getenv("ENROLLMENT_NUMBER", "")
@@ -17,6 +24,17 @@ age = int(os.getenv("AGE", 0))
 on_campus = int(os.getenv("ON_CAMPUS", 1))
 instituition = int(os.getenv("INSTITUTION", "6"))
 check_updates = int(os.getenv("CHECK_UPDATES", "1"))
+survey_rate = float(os.getenv("SURVEY_RATE", "1"))
+
+SURVEYS_URL = f"{portal.CMS_BASE_URL}/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx"
+
+# Marks the heading of the current survey before leaving it, so a form still parsed from the old page after the URL changed is not taken for the new one
+NAVIGATE_SCRIPT = """(url) => {
+    document.querySelector("#BodyPH_surveyUserControl_lbName")?.setAttribute("data-stale", "1");
+    window.location.href = url;
+}"""
+
+FRESH_HEADING_SELECTOR = "#BodyPH_surveyUserControl_lbName:not([data-stale])"
 
 def clear_terminal():
     """
@@ -55,27 +73,40 @@ def start_playwright(debug_mode: bool):
     @param debug_mode Boolean flag to launch browser in debug mode (non-headless).
     @return BrowserContext object representing the persistent browser context.
     """
-    browser = p.chromium.launch_persistent_context(
-        user_data_dir=data_dir,
-        headless= not debug_mode,
-        no_viewport=True,
-        args=[
-            "--window-size=1920,1080",
-            "--disable-gpu",
-            "--disable-software-rasterizer",
-            "--disable-extensions",
-            "--disable-infobars",
-            "--disable-dev-shm-usage",
-            "--no-sandbox",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-logging",
-            "--log-level=3",
-            "--disable-features=Translate,BackForwardCache,RendererCodeIntegrity,IsolateOrigins,site-per-process",
-            "--blink-settings=imagesEnabled=false",
-            "--disable-animations",
-            "--mute-audio"
-        ]
-    )
+    browser = None
+    if browserBroker.browser_broker:
+        if not debug_mode:
+            browser = browserBroker.connect(p, debug_mode)
+        else:
+            # A visible window cannot be taken from the headless broker, it needs the profile for itself
+            browserBroker.stop()
+
+    if browser is None:
+        profileMaintenance.maintain_profile(data_dir, debug_mode)
+        browser = p.chromium.launch_persistent_context(
+            user_data_dir=data_dir,
+            headless= not debug_mode,
+            no_viewport=True,
+            args=[
+                "--window-size=1920,1080",
+                "--disable-gpu",
+                "--disable-software-rasterizer",
+                "--disable-extensions",
+                "--disable-infobars",
+                "--disable-dev-shm-usage",
+                "--no-sandbox",
+                "--disable-blink-features=AutomationControlled",
+                "--disable-logging",
+                "--log-level=3",
+                "--disable-features=Translate,BackForwardCache,RendererCodeIntegrity,IsolateOrigins,site-per-process",
+                "--blink-settings=imagesEnabled=false",
+                "--disable-animations",
+                "--mute-audio",
+                *profileMaintenance.cache_args(data_dir)
+            ]
+        )
+    profiler.instrument_context(browser)
+    failureCapture.recorder.instrument_context(browser)
 
     return browser
 
@@ -86,6 +117,10 @@ def parse_args():
     """
     parser = argparse.ArgumentParser()
     parser.add_argument("--debug", "-d", action="store_true", help="Enable debug mode")
+    parser.add_argument("--concurrency", "-c", type=int, default=1, help="Number of pages filling the automatic surveys at the same time")
+    parser.add_argument("--profile", "-P", action="store_true", help="Print the time spent in each stage and the request counters at the end")
+    parser.add_argument("--profile-json", metavar="FILE", default="", help="Write the stage timings and counters to a JSON file")
+    parser.add_argument("--trace", metavar="FILE", default="", help="Save a Playwright trace of the slowest browser stage (with --profile or --profile-json)")
     return parser.parse_args()
 
 def check_and_login_to_CMS(page, debug_mode: bool):
@@ -95,20 +130,20 @@ def check_and_login_to_CMS(page, debug_mode: bool):
     @param debug_mode Boolean flag to enable debug output.
     @return None
     """
-    page.goto("https://cms.bahria.edu.pk/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx")
+    page.goto(SURVEYS_URL)
 
     if "Login.aspx" in page.url in page.url:
         if debug_mode:
             print("Login required. Navigating to login page...")
 
-        page.goto("https://cms.bahria.edu.pk/Logins/Student/Login.aspx")
+        page.goto(f"{portal.CMS_BASE_URL}/Logins/Student/Login.aspx")
         page.fill("#BodyPH_tbEnrollment", enrollment_number)
         page.fill("#BodyPH_tbPassword", password)
         page.select_option("#BodyPH_ddlInstituteID", "1")
         page.click(f"#pageContent > div.container-fluid > div.row > div > div:nth-child({instituition})")
 
         persist_cookies(browser, debug_mode)
-        page.goto("https://cms.bahria.edu.pk/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx")
+        page.goto(SURVEYS_URL)
 
     else:
         logged_in_enrollment_number = page.locator("#ProfileInfo_lblUsername").text_content().strip()
@@ -135,15 +170,16 @@ def persist_cookies(browser, debug_mode: bool):
             if debug_mode:
                 print(f"Made {cookie['name']} cookie persistent.")
 
-def handle_surveys(page, option: int, debug_mode: bool):
+def handle_surveys(page, option: int, debug_mode: bool, concurrency: int = 1):
     """
     @brief Finds and handles all pending survey forms, allowing manual or automatic filling.
     @param page The Playwright page object to interact with.
     @param option The default survey response option (0-4).
     @param debug_mode Boolean flag to enable debug output.
-    @return None
+    @param concurrency Maximum number of pages filling the automatic surveys at the same time.
+    @return List of result dictionaries with survey, success and error keys.
     """
-    page.goto("https://cms.bahria.edu.pk/Sys/Student/QualityAssurance/QualityAssuranceSurveys.aspx")
+    page.goto(SURVEYS_URL)
     page.wait_for_selector("#BodyPH_gvSurveyConducts")
 
     rows = page.query_selector_all("#BodyPH_gvSurveyConducts > tbody > tr")
@@ -155,19 +191,109 @@ def handle_surveys(page, option: int, debug_mode: bool):
     custom_input = input("\nEnter the survey numbers to fill manually (comma-separated), or press Enter to fill all: ")
     custom_input = [x.strip() for x in custom_input.split(",")]
 
+    # Every survey page opened, automatic or manual, takes a token, which spaces out the requests to CMS
+    limiter = rateLimiter.TokenBucket(survey_rate, max(1, concurrency))
+
+    automatic_surveys = [survey for survey in survey_data if survey["sr_no"] not in custom_input]
+    results = fill_surveys(page, automatic_surveys, option, concurrency, limiter, debug_mode)
+
+    # Manual surveys ask for input, so they are filled one at a time after the automatic ones
     for survey in survey_data:
-        sleep(1) 
-        survey_url = "https://cms.bahria.edu.pk/Sys/Student/QualityAssurance/" + survey["url"]
-        page.goto(survey_url)
+        if survey["sr_no"] not in custom_input:
+            continue
 
         currently_filling = f"Filling survey: {survey['course']} - {survey['teacher']}({survey['survey_name']})"
-
-        if survey["sr_no"] in custom_input:
+        try:
+            limiter.acquire()
+            page.goto(survey_url(survey))
             fill_custom_survey(page, currently_filling, debug_mode)
-        else:
+            results.append({"survey": survey, "success": True, "error": ""})
+        except Exception as e:
+            results.append({"survey": survey, "success": False, "error": str(e)})
+
+    return results
+
+def survey_url(survey: dict) -> str:
+    """
+    @brief Builds the absolute URL of a survey form.
+    @param survey Survey dictionary from extract_survey_data.
+    @return The URL.
+    """
+    return f"{portal.CMS_BASE_URL}/Sys/Student/QualityAssurance/" + survey["url"]
+
+def fill_surveys(page, surveys: list, option: int, concurrency: int, limiter, debug_mode: bool) -> list:
+    """
+    @brief Fills surveys automatically using up to `concurrency` pages of the same context.
+    @param page The page used as the first worker.
+    @param surveys List of survey dictionaries to fill with the default option.
+    @param option The default survey response option (0-4).
+    @param concurrency Maximum number of pages loading a survey at the same time.
+    @param limiter TokenBucket taken before every survey page is opened.
+    @param debug_mode Boolean flag to enable debug output.
+    @return List of result dictionaries with survey, success and error keys, in the order the surveys finished.
+    """
+    results = []
+    if not surveys:
+        return results
+
+    worker_count = max(1, min(concurrency, len(surveys)))
+    workers = [page] + [page.context.new_page() for _ in range(worker_count - 1)]
+
+    pending = deque(surveys)
+    in_flight = deque()
+
+    # Surveys start loading in the background, we only block on a page when its form is filled
+    def assign(worker):
+        while pending:
+            survey = pending.popleft()
+            limiter.acquire()
+            try:
+                worker.evaluate(NAVIGATE_SCRIPT, survey_url(survey))
+                in_flight.append((worker, survey))
+                return
+            except Exception as e:
+                results.append({"survey": survey, "success": False, "error": str(e)})
+
+    try:
+        for worker in workers:
+            assign(worker)
+
+        # Surveys were dispatched in order, so waiting on the oldest one first never blocks a finished page
+        while in_flight:
+            worker, survey = in_flight.popleft()
             if debug_mode:
-                print(currently_filling)
-            fill_survey(page, debug_mode, option)
+                print(f"Filling survey: {survey['course']} - {survey['teacher']}({survey['survey_name']})")
+
+            try:
+                with profiler.span("survey"):
+                    # The survey list or a submit postback may show the survey control too, only the new URL proves the navigation happened
+                    worker.wait_for_url(survey_url(survey), timeout=30000)
+                    worker.wait_for_selector(FRESH_HEADING_SELECTOR, timeout=30000)
+                    fill_survey(worker, debug_mode, option)
+                results.append({"survey": survey, "success": True, "error": ""})
+            except Exception as e:
+                bundle_file = failureCapture.recorder.save("fillSurveys", e, worker)
+                results.append({"survey": survey, "success": False, "error": f"{e} (report: {bundle_file})"})
+
+            assign(worker)
+    finally:
+        for worker in workers[1:]:
+            worker.close()
+
+    return results
+
+def print_summary(results: list):
+    """
+    @brief Prints which surveys were filled and why the others failed.
+    @param results List of result dictionaries returned by handle_surveys.
+    @return None
+    """
+    filled = [result for result in results if result["success"]]
+    print(f"\nFilled {len(filled)} of {len(results)} surveys.")
+    for result in results:
+        if not result["success"]:
+            survey = result["survey"]
+            print(f"Failed: {survey['course']} - {survey['teacher']}({survey['survey_name']}): {result['error']}")
 
 def extract_survey_data(rows, debug_mode: bool):
     """
@@ -211,6 +337,76 @@ def extract_survey_data(rows, debug_mode: bool):
         print(f"Extracted {len(survey_data)} surveys.")
     return survey_data
 
+# Clicks every radio button in one round trip, element.click() fires the same click/change events ASP.NET's validators listen to
+SELECT_INPUTS_SCRIPT = """(ids) => {
+    const missing = [];
+    for (const id of ids) {
+        const input = document.getElementById(id);
+        if (!input) {
+            missing.push(id);
+        } else if (!input.checked) {
+            input.click();
+        }
+    }
+    return missing;
+}"""
+
+def select_inputs(page, input_ids: list, debug_mode: bool) -> list:
+    """
+    @brief Selects the given radio buttons with a single evaluate call.
+    @param page The Playwright page object containing the survey form.
+    @param input_ids List of element IDs of the radio buttons.
+    @param debug_mode Boolean flag to enable debug output.
+    @return List of the IDs that are not on the page.
+    """
+    missing = page.evaluate(SELECT_INPUTS_SCRIPT, input_ids)
+    for input_id in missing:
+        print(f"Survey option not found: {input_id}")
+    if debug_mode:
+        print(f"Selected {len(input_ids) - len(missing)} of {len(input_ids)} options.")
+    return missing
+
+def demographic_input_ids() -> list:
+    """
+    @brief The IDs of the demographic answers of course evaluation surveys.
+    @return List of element IDs.
+    """
+    return [
+        # Fulltime/Parttime
+        surveySchema.input_id(surveySchema.DEMOGRAPHIC_GROUP, 0, 1),
+        # Disabled/Non-Disabled
+        surveySchema.input_id(surveySchema.DEMOGRAPHIC_GROUP, 1, int(not disabled)),
+        # Male/Female
+        surveySchema.input_id(surveySchema.DEMOGRAPHIC_GROUP, 3, gender),
+        # Age:>22/22-29/>29
+        surveySchema.input_id(surveySchema.DEMOGRAPHIC_GROUP, 4, age),
+        # On Campus/Off Campus
+        surveySchema.input_id(surveySchema.DEMOGRAPHIC_GROUP, 5, on_campus)
+    ]
+
+def load_schema(page, debug_mode: bool) -> dict:
+    """
+    @brief Waits for the survey form and returns its schema.
+    @param page The Playwright page object containing the survey form.
+    @param debug_mode Boolean flag to enable debug output.
+    @return Dictionary returned by surveySchema.survey_schema.
+    """
+    page.wait_for_selector("#BodyPH_surveyUserControl_lbName")
+    schema = surveySchema.survey_schema(page, debug_mode)
+    if not schema["groups"]:
+        raise Exception(f"No questions found on the survey form ({schema['name']}).")
+    return schema
+
+def is_attendance_question(schema: dict, group_index: int, question_number: int) -> bool:
+    """
+    @brief Checks whether a question asks for the attendance percentage (first question of the second group of course surveys).
+    @param schema Dictionary returned by load_schema.
+    @param group_index Index of the question group.
+    @param question_number Index of the question in its group.
+    @return True if it is the attendance question.
+    """
+    return group_index == 1 and question_number == 0 and "Teacher Evaluation Form" not in schema["name"]
+
 # Format: BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_{section}_rbl_{question_number}_{option}_{question_number}
 def fill_survey(page, debug_mode: bool, option: int):
     """
@@ -220,61 +416,39 @@ def fill_survey(page, debug_mode: bool, option: int):
     @param option The response option to select (0=Strongly Agree, 4=Strongly Disagree).
     @return None
     """
-    # Detect which survey is loaded
-    heading_element = page.wait_for_selector("#BodyPH_surveyUserControl_lbName")
-    heading_text = heading_element.inner_text()
-
-    # Question groups for both survey types
-    teacher_groups = {
-        0: 13,
-        1: 5
-    }
+    schema = load_schema(page, debug_mode)
 
-    course_groups = {
-        0: 3,
-        1: 3,
-        2: 4,
-        3: 4,
-        4: 3,
-        5: 3,
-        6: 4,
-        7: 3,
-        8: 2
-    }
+    # Every answer is known up front, so the whole form is filled in one go
+    input_ids = []
+    demographic = False
+    for group in schema["groups"]:
+        if group["group"] == surveySchema.DEMOGRAPHIC_GROUP:
+            demographic = True
+            continue
+        for question_number, question in enumerate(group["questions"]):
+            if not question["options"]:
+                continue
+            answer = 4 if is_attendance_question(schema, group["group"], question_number) else option
+            input_ids.append(surveySchema.input_id(group["group"], question_number, min(answer, question["options"] - 1)))
 
-    # Pick correct mapping
-    groups = teacher_groups if "Teacher Evaluation Form" in heading_text else course_groups
-
-    # Fill the survey
-    for group_index, question_count in groups.items():
-        for question_number in range(question_count):
-            if question_number == 0 and group_index == 1 and groups == course_groups:
-                input_id = (
-                    f"BodyPH_surveyUserControl_repeaterQuestionGroups_"
-                    f"repeaterQuestions_{group_index}_rbl_{question_number}_{4}_{question_number}"
-                )
-            else:
-                input_id = (
-                    f"BodyPH_surveyUserControl_repeaterQuestionGroups_"
-                    f"repeaterQuestions_{group_index}_rbl_{question_number}_{option}_{question_number}"
-                )
-            selector = f"#{input_id}"
+    if demographic:
+        input_ids.extend(demographic_input_ids())
 
-            try:
-                page.wait_for_selector(selector, timeout=10000)
-                page.click(selector)
-                if debug_mode:
-                    print(f"Clicked: {input_id}")
-            except Exception as e:
-                if debug_mode:
-                    print(f"Failed to click ({input_id}): {e}")
+    select_inputs(page, input_ids, debug_mode)
 
-    if groups == course_groups:
-        fill_demographic_info(page)
+    submit_survey(page, debug_mode)
 
-    # Submit
+def submit_survey(page, debug_mode: bool):
+    """
+    @brief Submits the survey form and waits until the postback has loaded the next page.
+    @param page The Playwright page object containing the survey form.
+    @param debug_mode Boolean flag to enable debug output.
+    @return None
+    """
     submit_selector = "#BodyPH_surveyUserControl_btnSubmit"
-    page.click(submit_selector)
+    # The page is reused for the next survey, navigating it before the postback finished would cancel the submission
+    with page.expect_navigation():
+        page.click(submit_selector)
 
     if debug_mode:
         print(f"Clicked: {submit_selector}")
@@ -301,39 +475,19 @@ def fill_custom_survey(page, currently_filling, debug_mode: bool):
         fill_survey(page, debug_mode, selected_option)
 
     else:
-        # Detect which survey is loaded
-        heading_element = page.wait_for_selector("#BodyPH_surveyUserControl_lbName")
-        heading_text = heading_element.inner_text()
-
-        # Question groups for both survey types
-        teacher_groups = {
-            0: 13,
-            1: 5
-        }
-
-        course_groups = {
-            0: 3,
-            1: 3,
-            2: 4,
-            3: 4,
-            4: 3,
-            5: 3,
-            6: 4,
-            7: 3,
-            8: 2
-        }
-
-        # Pick correct mapping
-        groups = teacher_groups if "Teacher Evaluation Form" in heading_text else course_groups
-        for group_index, question_count in groups.items():
-            for question_number in range(question_count):
-                question_selector = f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_{group_index}_divOptions_{question_number} > label"
-                question = page.query_selector(question_selector)
-                if question:
+        schema = load_schema(page, debug_mode)
+
+        demographic = False
+        for group in schema["groups"]:
+            if group["group"] == surveySchema.DEMOGRAPHIC_GROUP:
+                demographic = True
+                continue
+            for question_number, question in enumerate(group["questions"]):
+                if question["text"] and question["options"]:
                     clear_terminal()
                     print(currently_filling + "\n")
-                    print(f"Question: {question.inner_text().strip()}")
-                    if question_number == 0 and group_index == 1 and groups == course_groups:
+                    print(f"Question: {question['text']}")
+                    if is_attendance_question(schema, group["group"], question_number):
                         selected_option = int(input(
                             "Select your answer option (0=<21%, 1=21-40%, 2=41-60%, 3=61-80%, 4=>80%): "
                         ))
@@ -341,52 +495,20 @@ def fill_custom_survey(page, currently_filling, debug_mode: bool):
                         selected_option = int(input(
                             "Select your answer option (0=Strongly Agree, 1=Agree, 2=Uncertain, 3=Disagree, 4=Strongly Disagree): "
                         ))
-                    input_id = (
-                        f"BodyPH_surveyUserControl_repeaterQuestionGroups_"
-                        f"repeaterQuestions_{group_index}_rbl_{question_number}_{selected_option}_{question_number}"
-                    )
-                    selector = f"#{input_id}"
-                    try:
-                        page.wait_for_selector(selector, timeout=10000)
-                        page.click(selector)
-                        if debug_mode:
-                            print(f"Clicked: {input_id}")
-                    except Exception as e:
-                        if debug_mode:
-                            print(f"Failed to click ({input_id}): {e}")
-        if groups == course_groups:
-            fill_demographic_info(page)
-
-        # Submit
-        submit_selector = "#BodyPH_surveyUserControl_btnSubmit"
-        page.click(submit_selector)
+                    select_inputs(page, [surveySchema.input_id(group["group"], question_number, selected_option)], debug_mode)
+        if demographic:
+            fill_demographic_info(page, debug_mode)
 
-def fill_demographic_info(page):
+        submit_survey(page, debug_mode)
+
+def fill_demographic_info(page, debug_mode: bool = False):
     """
     @brief Fills demographic information questions in course evaluation surveys.
     @param page The Playwright page object containing the demographic form.
+    @param debug_mode Boolean flag to enable debug output.
     @return None
     """
-    # Fulltime/Parttime
-    page.wait_for_selector("#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_0_1_0", timeout=10000)
-    page.click("#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_0_1_0")
-
-    # Disabled/Non-Disabled
-    selector = f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_1_{int(not disabled)}_1"
-    page.wait_for_selector(selector, timeout=10000)
-    page.click(selector)
-
-    # Male/Female
-    page.wait_for_selector(f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_3_{gender}_3", timeout=10000)
-    page.click(f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_3_{gender}_3")
-
-    # Age:>22/22-29/>29
-    page.wait_for_selector(f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_4_{age}_4", timeout=10000)
-    page.click(f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_4_{age}_4")
-
-    # On Campus/Off Campus
-    page.wait_for_selector(f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_5_{on_campus}_5", timeout=10000)
-    page.click(f"#BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions_11_rbl_5_{on_campus}_5")
+    select_inputs(page, demographic_input_ids(), debug_mode)
 
 if __name__ == "__main__":
     try:
@@ -397,18 +519,26 @@ if __name__ == "__main__":
         args = parse_args()
         browser = None
 
+        if args.profile or args.profile_json:
+            profiler.enable(args.trace)
+
         chosen_option = int(input(
             "Select your default answer option (0=Strongly Agree, 1=Agree, 2=Uncertain, 3=Disagree, 4=Strongly Disagree): "
         ))
 
         with sync_playwright() as p:
             try:
-                browser = start_playwright(args.debug)
+                with profiler.span("browser_launch"):
+                    browser = start_playwright(args.debug)
                 page = browser.pages[0]
-                check_and_login_to_CMS(page, args.debug)
+                with profiler.span("login", trace=True):
+                    check_and_login_to_CMS(page, args.debug)
 
-                handle_surveys(page, chosen_option, args.debug)
+                with profiler.span("handle_surveys", trace=True):
+                    results = handle_surveys(page, chosen_option, args.debug, args.concurrency)
+                print_summary(results)
 
+                profiler.stop_tracing()
                 browser.close()
             except Exception as e:
                 error_message = str(e)
@@ -420,29 +550,22 @@ if __name__ == "__main__":
                     print("No internet connection. Please check your connection and try again.")
 
                 else:
-                    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                    error_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_logs")
-                    os.makedirs(error_dir, exist_ok=True)
-
-                    html_file = f"{error_dir}/fillSurveys_error_{timestamp}.html"
-                    screenshot_file = f"{error_dir}/fillSurveys_error_{timestamp}.png"
-
                     try:
                         print(f"A playwright error occurred: {e}")
-                        if browser and browser.pages:
-                            page = browser.pages[0]
-                            with open(html_file, "w", encoding="utf-8") as f:
-                                f.write(page.content())
-                            page.screenshot(path=screenshot_file, full_page=True)
-                            print(f"Saved debug HTML to: {html_file}")
-                            print(f"Saved screenshot to: {screenshot_file}")
+                        page = browser.pages[0] if browser and browser.pages else None
+                        bundle_file = failureCapture.recorder.save("fillSurveys", e, page)
+                        print(f"Saved failure report to: {bundle_file}")
+                        if browser:
                             browser.close()
                     except Exception as inner_e:
                         print(f"Failed to save debug info: {inner_e}")
                 exit(1)
 
         if check_updates:
-            check_for_updates()
+            with profiler.span("check_for_updates"):
+                check_for_updates()
+
+        profiler.report(args.profile, args.profile_json)
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         exit(1)
\ No newline at end of file
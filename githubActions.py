@@ -1,10 +1,21 @@
 from playwright.sync_api import sync_playwright, Page
 from datetime import datetime
+from functools import partial
 from dotenv import load_dotenv
-from time import sleep
-import requests
-import json
+import asyncPipeline
+import courseTables
+import httpEngine
+import downloader
+from downloadCache import DownloadCache, CACHE_FILE_NAME
+from notifications import NtfyClient, deadline_title
+from stateStore import StateStore, STATE_FILE_NAME
+import asyncio
 import os
+import portal
+import attendanceTable
+import checkAttendance
+from profiling import profiler
+from requestBlocking import RequestBlocker
 
 load_dotenv()
 enrollment_number = os.getenv("ENROLLMENT_NUMBER", "")
@@ -14,6 +25,16 @@ notify_extended = int(os.getenv("NOTIFY_EXTENDED", "1"))
 instituition = int(os.getenv("INSTITUTION", "6"))
 ntfy_server = os.getenv("NTFY_SERVER", "")
 download_assignments = int(os.getenv("DOWNLOAD_ASSIGNMENTS", "0"))
+course_concurrency = int(os.getenv("COURSE_CONCURRENCY", "1"))
+course_table_timeout = int(os.getenv("COURSE_TABLE_TIMEOUT", "5000"))
+download_workers = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+ntfy_digest = int(os.getenv("NTFY_DIGEST", "0"))
+state_db = os.getenv("STATE_DB", os.path.join(os.environ.get("HOME", ""), ".bahria", STATE_FILE_NAME))
+async_pipeline = int(os.getenv("ASYNC_PIPELINE", "0"))
+profile = int(os.getenv("PROFILE", "0"))
+profile_json = os.getenv("PROFILE_JSON", "")
+profile_trace = os.getenv("PROFILE_TRACE", "")
+download_cache_file = os.getenv("DOWNLOAD_CACHE_FILE", os.path.join(os.environ.get("HOME", ""), ".bahria", CACHE_FILE_NAME))
 
 def clean_text(text: str) -> str:
     """
@@ -54,6 +75,8 @@ def start_playwright():
 
     return browser
 
+ntfy = NtfyClient(ntfy_server)
+
 def send_notification(title, message: str, priority: int, file_path: str = ""):
     """
     @brief Sends a notification via ntfy.sh service with optional file attachment.
@@ -63,23 +86,7 @@ def send_notification(title, message: str, priority: int, file_path: str = ""):
     @param file_path Optional file path to attach to the notification.
     @return None
     """
-    if ntfy_server and file_path != "":
-        requests.put(
-            f"https://ntfy.sh/{ntfy_server}",
-            data=open(file_path, 'rb'),
-            headers={"Title": title, "Priority": str(priority), "File": os.path.basename(file_path)},
-            params={
-                "message": message,
-            }
-        )
-    elif ntfy_server:
-        requests.post(
-            f"https://ntfy.sh/{ntfy_server}",
-            data=message.encode('utf-8'),
-            headers={"Title": title, "Priority": str(priority)},
-        )
-    else:
-        print("ntfy_server is not set. Cannot send notification.")
+    ntfy.send(title, message, priority, file_path)
 
 def check_and_login(page):
     """
@@ -87,7 +94,7 @@ def check_and_login(page):
     @param page The Playwright page object to interact with.
     @return None
     """
-    page.goto("https://cms.bahria.edu.pk/Logins/Student/Login.aspx")
+    page.goto(f"{portal.CMS_BASE_URL}/Logins/Student/Login.aspx")
     page.fill("#BodyPH_tbEnrollment", enrollment_number)
     page.fill("#BodyPH_tbPassword", password)
     page.select_option("#BodyPH_ddlInstituteID", "1")
@@ -103,32 +110,21 @@ def check_and_login(page):
         send_notification("Error" ,"Please complete the Quality Assurance Survey to proceed.", 2)
         exit(1)
 
-def download_assignment_file(page, subject_name: str, assignment_name: str, deadline_date: str, assignment_link: str) -> str:
+def prune_download_cache(cache: DownloadCache, links: list):
     """
-    @brief Downloads an assignment file and saves it in a subject-specific directory.
-    @param page The Playwright page object to interact with.
-    @param subject_name The name of the subject for the assignment.
-    @param assignment_name The name of the assignment.
-    @param deadline_date The deadline date formatted as string.
-    @param assignment_link The URL link to the assignment file.
-    @return The final path of the downloaded assignment file.
+    @brief Drops the download cache entries of assignments the LMS no longer lists, like checkAssignments.cleanup_old_files.
+    @param cache The DownloadCache used by the downloader of this run.
+    @param links List of assignment links seen in this run.
+    @return None
     """
-    if not os.path.exists(f"{os.environ.get('HOME')}/{subject_name}"):
-        os.makedirs(f"{os.environ.get('HOME')}/{subject_name}")
-
-    subject_dir = f"{os.environ.get('HOME')}/{subject_name}"
-    file_base = f"{assignment_name} - {deadline_date}"
-
-    with page.expect_download() as download_info:
-        page.evaluate(f"window.location.href = '{assignment_link}'")
-
-    download = download_info.value
-    file_name = download.suggested_filename
-    _, file_ext = os.path.splitext(file_name)
-    final_path = os.path.join(subject_dir, f"{file_base}{file_ext}")
-    download.save_as(final_path)
-
-    return final_path
+    # The cache is restored from actions/cache on every run, without pruning it grows every semester
+    for path in cache.prune(set(links)):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error deleting {path}: {e}")
+    cache.save()
 
 def fetch_assignments(page: Page) -> list:
     """
@@ -140,7 +136,7 @@ def fetch_assignments(page: Page) -> list:
 
     # Navigate to Assignments page if not already there
     if "Assignments.php" not in page.url:
-        page.goto("https://lms.bahria.edu.pk/Student/Assignments.php", wait_until="commit")
+        page.goto(f"{portal.LMS_BASE_URL}/Student/Assignments.php", wait_until="commit")
 
     # Extract subject options directly from the dropdown
     subjects = page.evaluate("""() => {
@@ -149,107 +145,65 @@ def fetch_assignments(page: Page) -> list:
             .map(opt => ({ id: opt.value, name: opt.innerText.trim() }));
     }""")
 
-    for course in subjects:
-        # Select the subject via its ID value
-        page.select_option("#courseId", value=course['id'])
-
-        # Wait for the table to refresh for the specific subject
-        try:
-            page.wait_for_selector("table.table-hover tbody tr:not(:first-child)", timeout=5000)
-        except:
-            # If no assignments are found for this subject, skip to next
-            continue
-
-        # Extract table data using browser-side execution for speed and reliability
-        table_data = page.evaluate("""() => {
-            const rows = Array.from(document.querySelectorAll("table.table-hover tbody tr")).slice(1);
-            return rows.map(row => {
-                const cells = row.querySelectorAll("td");
-                if (cells.length < 8) return null;
-
-                const deadlineSmall = cells[7].querySelector("small");
-                return {
-                    action: cells[6].innerText,
-                    assignment_number: cells[0].innerText.trim(),
-                    assignment_name: cells[1].innerText.trim(),
-                    deadline_text: deadlineSmall ? deadlineSmall.innerText : "",
-                    deadline_title: deadlineSmall ? deadlineSmall.getAttribute("title") : "",
-                    download_url: cells[2].querySelector("a") ? cells[2].querySelector("a").getAttribute("href") : ""
-                };
-            }).filter(item => item !== null);
-        }""")
-
-        for item in table_data:
-            # Check if assignment is active (Submit or Delete present)
-            if "Submit" in item['action'] or "Delete" in item['action']:
-                # Extract date (ignoring time/days left suffix)
-                deadline_date = item['deadline_text'].split('-')[0].strip()
-                if not deadline_date:
-                    continue
-
-                final_path = None
-                is_submitted = "Delete" in item['action']
-                is_extended = "Extended" in item['deadline_title']
-
-                # Handle file downloading if enabled
-                if download_assignments and item['download_url']:
-                    assignment_link = f"https://lms.bahria.edu.pk/Student/{item['download_url']}"
-                    # Re-use the existing download helper
-                    final_path = download_assignment_file(
-                        page,
-                        course['name'],
-                        item['assignment_name'],
-                        deadline_date,
-                        assignment_link
-                    )
-
-                deadlines.append((
-                    item['assignment_number'],
-                    course['name'],
-                    deadline_date,
-                    is_submitted,
-                    is_extended,
-                    final_path if download_assignments else None
-                ))
+    # Files are downloaded on a worker pool with the context's cookies while the remaining subjects are scraped
+    assignment_downloader = None
+    if download_assignments:
+        session = httpEngine.session_from_cookies(page.context.cookies(), download_workers)
+        cache = DownloadCache(download_cache_file)
+        assignment_downloader = downloader.AssignmentDownloader(session, os.environ.get('HOME'), download_workers, cache=cache)
+
+    subject_deadlines = [[] for _ in subjects]
+    links = []
+
+    def queue_download(subject_name: str, assignment_name: str, deadline_date: str, link: str):
+        links.append(link)
+        return assignment_downloader.submit(subject_name, assignment_name, deadline_date, link)
+
+    def process_table(index: int, table_data: list):
+        # Files are queued for download as soon as their subject is read
+        subject_deadlines[index] = [
+            (*deadline, download)
+            for deadline, download in courseTables.table_deadlines(subjects[index]['name'], table_data, queue_download if assignment_downloader else None)
+        ]
+
+    if course_concurrency > 1:
+        # Load several course tables at once on extra pages of the same context
+        courseTables.extract_course_tables(page, subjects, course_concurrency, timeout=course_table_timeout, on_table=process_table)
+    else:
+        for index, course in enumerate(subjects):
+            # Select the subject via its ID value
+            page.evaluate(courseTables.MARK_AND_SELECT_SCRIPT, course['id'])
+
+            # Wait for the table to refresh for the specific subject, a subject without assignments returns no rows
+            try:
+                process_table(index, courseTables.read_course_table(page, timeout=course_table_timeout))
+            except:
+                # The table did not finish loading, skip to next
+                print(f"The table of {course['name']} did not load")
+                continue
+
+    if assignment_downloader:
+        with profiler.span("downloads_wait"):
+            assignment_downloader.wait()
+        prune_download_cache(cache, links)
+
+    # Replace the download futures with the final file paths, failed downloads are sent without an attachment
+    for deadlines_of_subject in subject_deadlines:
+        for assignment_number, subject, deadline_date, is_submitted, is_extended, download in deadlines_of_subject:
+            final_path = download.result() if download and download.exception() is None else None
+            deadlines.append((assignment_number, subject, deadline_date, is_submitted, is_extended, final_path))
 
     return deadlines
 
-def fetch_cached_notifications(ntfy_server: str) -> list:
-    cached_notifications = []
-
-    titles = [
-        "Assignment+Due+Today",
-        "Assignment+Due+in+Next+4+Days",
-        "Assignment+Due+in+Next+7+Days",
-        "Assignment+Due+in+Next+14+Days",
-        "Upcoming+Assignments"
-    ]
-
-    for title in titles:
-        if ntfy_server:
-            response = requests.get(f"https://ntfy.sh/{ntfy_server}/json?poll=1&title={title}")
-            lines = response.text.splitlines()
-
-            for line in lines:
-                if line.strip():
-                    data = json.loads(line)
-                    cached_notifications.append({
-                        "id": data["id"],
-                        "message": data["message"]
-                    })
-    return cached_notifications
-
-def delete_cached_notification(ntfy_server: str, message: str, cached_notifications: list):
-    for notification in cached_notifications:
-        if notification["message"] == message.strip():
-            requests.delete(f"https://ntfy.sh/{ntfy_server}/{notification['id']}")
-
-def alert_deadline(deadlines: list, ntfy_server: str):
+def deadline_notifications(deadlines: list, state: StateStore, level: int = None, title_suffix: str = "") -> list:
     """
-    @brief Processes deadlines and sends notifications based on time remaining and notification level.
-    @param deadlines List of tuples containing assignment deadline information.
-    @param ntfy_server The ntfy service name for sending notifications.
-    @return None
+    @brief Picks the deadlines to notify: changed since the last run, within the notification level and not submitted (unless extended).
+    The other deadlines are recorded right away, the picked ones only once send_notifications sent them.
+    @param deadlines List of (assignment number, subject, deadline, submitted, extended, file path) tuples.
+    @param state The StateStore holding what the previous runs saw.
+    @param level Notification level (0-4), defaults to NOTIFICATION_LEVEL.
+    @param title_suffix Text appended to every title, e.g. the account name in batch mode.
+    @return List of ((title, message, priority, file path), record) tuples, record stores the deadline once called.
     """
     today = datetime.today().date()
     parsed_deadlines = []
@@ -262,102 +216,139 @@ def alert_deadline(deadlines: list, ntfy_server: str):
     parsed_deadlines.sort(key=lambda x: x[3], reverse=True)
 
     level_to_max_days = {0: 0, 1: 4, 2: 7, 3: 14, 4: float("inf")}
-    max_days_for_notification = level_to_max_days.get(notification_level, 0)
+    max_days_for_notification = level_to_max_days.get(notification_level if level is None else level, 0)
 
     notifications = []
 
     for assignment_number, subject, deadline_date, days_left, submitted, extended, final_path in parsed_deadlines:
-        display_date = deadline_date.strftime("%-d %B")
+        display_date = deadline_date.strftime("%#d %B") if os.name == "nt" else deadline_date.strftime("%-d %B")
         notification_message = f"{assignment_number}. {subject} - {display_date} {'Submitted' if submitted else ''}"
+        record = partial(state.record_assignment, subject, assignment_number, deadline_date.isoformat(), submitted, extended, deadline_title(days_left))
 
-        if days_left <= max_days_for_notification and (not submitted or (notify_extended and extended)):
+        if state.assignment_change(*record.args) and days_left <= max_days_for_notification and (not submitted or (notify_extended and extended)):
             priority = 5 if days_left == 0 else 4 if days_left <= 4 else 3
-            notifications.append((notification_message, days_left, priority, submitted, extended, final_path))
-
-    cached_notifications = fetch_cached_notifications(ntfy_server)
-
-    for notification, days_left, priority, submitted, extended, final_path in notifications:
-            if ntfy_server and (not submitted or (notify_extended and extended)):
-                if days_left == 0:
-                    delete_cached_notification(ntfy_server, notification, cached_notifications)
-                    send_notification("Assignment Due Today", notification, priority, final_path if final_path else "")
-                elif days_left <= 4:
-                    delete_cached_notification(ntfy_server, notification, cached_notifications)
-                    send_notification("Assignment Due in Next 4 Days", notification, priority, final_path if final_path else "")
-                elif days_left <= 7:
-                    delete_cached_notification(ntfy_server, notification, cached_notifications)
-                    send_notification("Assignment Due in Next 7 Days", notification, priority, final_path if final_path else "")
-                elif days_left <= 14:
-                    delete_cached_notification(ntfy_server, notification, cached_notifications)
-                    send_notification("Assignment Due in Next 14 Days", notification, priority, final_path if final_path else "")
-                else:
-                    delete_cached_notification(ntfy_server, notification, cached_notifications)
-                    send_notification("Upcoming Assignments", notification, priority, final_path if final_path else "")
-                sleep(0.1) # Sleep to ensure notifications are sent in order
-
-def format_number(n):
+            notifications.append(((f"{deadline_title(days_left)}{title_suffix}", notification_message, priority, final_path or ""), record))
+        else:
+            record()
+
+    return notifications
+
+def attendance_alerts(attendance: list, state: StateStore, debug_mode: bool = False, title_suffix: str = "") -> list:
     """
-    @brief Formats a number to 2 decimal places, removing trailing zeros and decimal points.
-    @param n The number to format.
-    @return Formatted string representation of the number.
+    @brief Picks the subjects that got a new absence and are past their allowed absence limit.
+    The other subjects are recorded right away, the picked ones only once send_notifications sent their alert.
+    @param attendance List of dictionaries with subject, credits and absences keys.
+    @param state The StateStore holding what the previous runs saw.
+    @param debug_mode Boolean flag to enable debug output.
+    @param title_suffix Text appended to every title, e.g. the account name in batch mode.
+    @return List of ((title, message, priority, file path), record) tuples, record stores the absences once called.
     """
-    return f"{n:.2f}".rstrip('0').rstrip('.')
+    alerts = []
+    for row in attendance:
+        subject = row["subject"]
+        credits = row["credits"]
+        absences = row["absences"]
+
+        if debug_mode:
+            print(f"Processing subject: {subject}, Credits: {credits}, Absences: {absences}")
+
+        record = partial(state.record_attendance, subject, credits, float(absences))
+        if state.attendance_change(*record.args) and checkAttendance.classes_left(subject, credits, absences)[0] < 0:
+            alerts.append(((f"Attendance Alert: {subject}{title_suffix}", f"Your attendance for {subject} has exceeded the allowed absence limit.", 5, ""), record))
+        else:
+            record()
 
+    return alerts
 
-def alert_attendance(subject):
+def send_notifications(client: NtfyClient, notifications: list, digest: bool = False):
     """
-    @brief Sends a notification alert when attendance drops below allowed absence limit.
-    @param subject The name of the subject with critical attendance.
+    @brief Sends the picked notifications and records the ones that were sent, a failed one is picked again by the next run.
+    @param client The NtfyClient to send with.
+    @param notifications List of (notification, record) tuples from deadline_notifications or attendance_alerts.
+    @param digest Boolean flag to group messages sharing a title into a single notification.
     @return None
     """
-    try:
-        response = requests.post(
-            f"https://ntfy.sh/{ntfy_server}",
-            data=f"Your attendance for {subject} has exceeded the allowed absence limit.",
-            headers={"Title": f"Attendance Alert: {subject}", "Priority": "5"},
-            timeout=5
-        )
-        response.raise_for_status()
-        print(f"Notification sent for {subject}")
-    except requests.RequestException as e:
-        print(f"Failed to send notification for {subject}: {e}")
-
-def scrape_and_alert_attendance(page: Page, debug_mode: bool):
+    if not notifications:
+        return
+
+    failed = client.send_all([notification for notification, _ in notifications], digest)
+    for notification, record in notifications:
+        if notification not in failed:
+            record()
+
+def alert_deadline(deadlines: list, ntfy_server: str, state: StateStore):
+    """
+    @brief Processes deadlines and sends notifications for the ones that changed since the last run.
+    @param deadlines List of tuples containing assignment deadline information.
+    @param ntfy_server The ntfy service name for sending notifications.
+    @param state The StateStore holding what the previous runs saw.
+    @return None
+    """
+    send_notifications(ntfy, deadline_notifications(deadlines, state), ntfy_digest)
+
+def scrape_and_alert_attendance(page: Page, debug_mode: bool, state: StateStore):
     """
     @brief Extracts and displays attendance statistics for all subjects, alerting if limits are exceeded.
     @param page The Playwright page object containing attendance data.
     @param debug_mode Boolean flag to enable debug output.
+    @param state The StateStore, alerts are only sent when a subject got a new absence.
     @return None
     """
-    page.goto("https://cms.bahria.edu.pk/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx")
-    rows = page.locator("#pageContent > div.container-fluid > div.table-responsive > table > tbody > tr").all()
-    for row in rows:
-        cells = row.locator("td").all()
-        subject = cells[2].inner_text().strip()
-        credits = cells[3].inner_text().strip()
-        absences = cells[10].inner_text().strip()
+    page.goto(f"{portal.CMS_BASE_URL}/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx")
+    attendance = attendanceTable.attendance_rows(page.evaluate(attendanceTable.ATTENDANCE_SCRIPT))
+    alert_attendance_table(attendance, debug_mode, state)
 
-        if debug_mode:
-            print(f"Processing subject: {subject}, Credits: {credits}, Absences: {absences}")
+def alert_attendance_table(attendance: list, debug_mode: bool, state: StateStore):
+    """
+    @brief Alerts for every subject that got a new absence and is past its allowed absence limit.
+    @param attendance List of dictionaries with subject, credits and absences keys.
+    @param debug_mode Boolean flag to enable debug output.
+    @param state The StateStore, alerts are only sent when a subject got a new absence.
+    @return None
+    """
+    send_notifications(ntfy, attendance_alerts(attendance, state, debug_mode))
 
-        if credits == "0":
-            credits = "1"
-            if debug_mode:
-                print(f"Credits for {subject} was 0, setting to 1 to avoid division by zero.")
+def run_async_pipeline():
+    """
+    @brief Scrapes assignments, attendance and downloads concurrently with the async pipeline and sends the alerts.
+    @return None
+    """
+    pipeline = asyncPipeline.ScrapePipeline(
+        enrollment_number,
+        password,
+        instituition,
+        download_dir=os.environ.get('HOME') if download_assignments else "",
+        download_workers=download_workers,
+        cache=DownloadCache(download_cache_file) if download_assignments else None,
+        concurrency=course_concurrency,
+        table_timeout=course_table_timeout,
+        error_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_logs")
+    )
+    with profiler.span("async_pipeline"):
+        asyncio.run(pipeline.run())
 
-        if(subject.split()[-1] == "Lab"):
-            max_absences = int(credits) * 12
-        else:
-            max_absences = int(credits) * 4
-        absences_remaining = max_absences - float(absences)
+    # A failed assignment scrape lists no links, it must not empty the cache
+    if pipeline.cache and not any(failure["task"] == "assignments" for failure in pipeline.failures):
+        prune_download_cache(pipeline.cache, pipeline.links)
+
+    # Whatever was scraped is still alerted, a failed task only costs its own part of the run
+    state = StateStore(state_db, "githubActions")
+    try:
+        with profiler.span("alert_deadline"):
+            alert_deadline(pipeline.deadlines, ntfy_server, state)
+        with profiler.span("alert_attendance"):
+            alert_attendance_table(pipeline.attendance, False, state)
+    finally:
+        state.close()
 
-        if subject.split()[-1] == "Lab":
-            if int(format_number(absences_remaining / (int(credits) * 3))) < 0:
-                alert_attendance(subject)
+    for failure in pipeline.failures:
+        if isinstance(failure["error"], asyncPipeline.SurveyRequiredError):
+            send_notification("Error", "Please complete the Quality Assurance Survey to proceed.", 2)
         else:
-            if int(format_number(absences_remaining / int(credits) * 2)) < 0:
-                alert_attendance(subject)
+            send_notification("Error", f"Error during {failure['task']}: {failure['error']}", 4)
 
+    if pipeline.failures:
+        exit(1)
 
 if __name__ == "__main__":
     try:
@@ -374,28 +365,43 @@ if __name__ == "__main__":
                 print("NTFY_SERVER is not set.")
             exit(1)
 
+        if profile or profile_json:
+            profiler.enable(profile_trace)
+
+        if async_pipeline:
+            run_async_pipeline()
+            profiler.report(profile, profile_json)
+            exit(0)
+
         browser = None
         with sync_playwright() as p:
-            browser = start_playwright()
+            with profiler.span("browser_launch"):
+                browser = start_playwright()
 
             context = browser.new_context(viewport={'width': 1920, 'height': 1080})
-            context.route("**/*", lambda route:
-                route.abort() if route.request.resource_type in ["image", "media", "font", "stylesheet"]
-                or route.request.resource_type == "script" and not (route.request.url.startswith("https://cms.bahria.edu.pk/"))
-                or "google-analytics" in route.request.url
-                or "fontawesome" in route.request.url
-                else route.continue_()
-            )
+            RequestBlocker().install(context)
+            profiler.instrument_context(context)
             page = context.new_page()
 
             page.set_default_timeout(60000)
             # sleep(2000000)
-            check_and_login(page)
-            deadlines = fetch_assignments(page)
-            alert_deadline(deadlines, ntfy_server)
-            scrape_and_alert_attendance(page, debug_mode=False)
-
+            with profiler.span("login", trace=True):
+                check_and_login(page)
+            with profiler.span("fetch_assignments", trace=True):
+                deadlines = fetch_assignments(page)
+            state = StateStore(state_db, "githubActions")
+            # Sent notifications are only committed on close, a failing attendance step must not lose them
+            try:
+                with profiler.span("alert_deadline"):
+                    alert_deadline(deadlines, ntfy_server, state)
+                with profiler.span("attendance", trace=True):
+                    scrape_and_alert_attendance(page, debug_mode=False, state=state)
+            finally:
+                state.close()
+
+            profiler.stop_tracing()
             browser.close()
+        profiler.report(profile, profile_json)
     except Exception as e:
         error_message = str(e)
 
@@ -0,0 +1,374 @@
+from html.parser import HTMLParser
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+import requests
+import json
+import os
+import portal
+import attendanceTable
+import courseTables
+
+LMS_ASSIGNMENTS_URL = f"{portal.LMS_BASE_URL}/Student/Assignments.php"
+LMS_COURSE_ASSIGNMENTS_URL = portal.LMS_BASE_URL + "/Student/Assignments.php?s={course_id}"
+LMS_STUDENT_URL = f"{portal.LMS_BASE_URL}/Student/"
+CMS_LOGIN_URL = f"{portal.CMS_BASE_URL}/Logins/Student/Login.aspx"
+CMS_ATTENDANCE_URL = f"{portal.CMS_BASE_URL}/Sys/Student/ClassAttendance/StudentWiseAttendance.aspx"
+COOKIE_FILE_NAME = "sessionCookies.json"
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Outcomes of probe_session
+SESSION_VALID = "valid"
+SESSION_MISMATCH = "mismatch"
+SESSION_SURVEY = "survey"
+SESSION_CMS_ONLY = "cms_only"
+SESSION_EXPIRED = "expired"
+SESSION_UNKNOWN = "unknown"
+
+class SessionExpiredError(Exception):
+    """
+    @brief Raised when the stored cookies no longer grant access to the LMS.
+    """
+    pass
+
+class AssignmentsPageParser(HTMLParser):
+    """
+    @brief Extracts the course dropdown and the assignment table from Assignments.php.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.courses = []
+        self.selected_course = ""
+        self.rows = []
+        self.user_header = ""
+
+        self._in_course_select = False
+        self._current_option = None
+        self._table_depth = 0
+        self._current_row = None
+        self._current_cell = None
+        self._in_small = False
+        self._in_user_header = False
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        classes = (attributes.get("class") or "").split()
+
+        if tag == "select" and attributes.get("id") == "courseId":
+            self._in_course_select = True
+        elif tag == "option" and self._in_course_select:
+            self._current_option = {"id": attributes.get("value") or "", "name": ""}
+            if "selected" in attributes:
+                self.selected_course = self._current_option["id"]
+        elif tag == "table":
+            if self._table_depth or "table-hover" in classes:
+                self._table_depth += 1
+        elif tag == "tr" and self._table_depth:
+            self._current_row = []
+        elif tag in ("td", "th") and self._current_row is not None:
+            self._current_cell = {"tag": tag, "text": "", "small_text": "", "small_title": None, "href": None}
+        elif tag == "small" and self._current_cell is not None:
+            if self._current_cell["small_title"] is None:
+                self._current_cell["small_title"] = attributes.get("title") or ""
+                self._in_small = True
+        elif tag == "a" and self._current_cell is not None and self._current_cell["href"] is None:
+            self._current_cell["href"] = attributes.get("href") or ""
+        elif tag == "li" and "user-header" in classes:
+            self._in_user_header = True
+        elif tag == "br" and self._current_cell is not None:
+            self._current_cell["text"] += "\n"
+
+    def handle_endtag(self, tag):
+        if tag == "select" and self._in_course_select:
+            self._in_course_select = False
+        elif tag == "option" and self._current_option is not None:
+            self._current_option["name"] = self._current_option["name"].strip()
+            self.courses.append(self._current_option)
+            self._current_option = None
+        elif tag == "small":
+            self._in_small = False
+        elif tag in ("td", "th") and self._current_cell is not None:
+            self._current_row.append(self._current_cell)
+            self._current_cell = None
+        elif tag == "tr" and self._current_row is not None:
+            self.rows.append(self._current_row)
+            self._current_row = None
+        elif tag == "table" and self._table_depth:
+            self._table_depth -= 1
+        elif tag == "li" and self._in_user_header:
+            self._in_user_header = False
+
+    def handle_data(self, data):
+        if self._current_option is not None:
+            self._current_option["name"] += data
+        if self._current_cell is not None:
+            self._current_cell["text"] += data
+            if self._in_small:
+                self._current_cell["small_text"] += data
+        if self._in_user_header:
+            self.user_header += data
+
+class AttendancePageParser(HTMLParser):
+    """
+    @brief Extracts the header and cell texts of the attendance table inside div.table-responsive.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.headers = []
+        self.rows = []
+
+        self._div_depth = 0
+        self._in_tbody = False
+        self._in_thead = False
+        self._current_row = None
+        self._current_cell = None
+        self._current_header = None
+
+    def handle_starttag(self, tag, attrs):
+        classes = (dict(attrs).get("class") or "").split()
+
+        if tag == "div" and (self._div_depth or "table-responsive" in classes):
+            self._div_depth += 1
+        elif tag == "thead" and self._div_depth:
+            self._in_thead = True
+        elif tag == "th" and self._in_thead:
+            self._current_header = ""
+        elif tag == "tbody" and self._div_depth:
+            self._in_tbody = True
+        elif tag == "tr" and self._in_tbody:
+            self._current_row = []
+        elif tag == "td" and self._current_row is not None:
+            self._current_cell = ""
+
+    def handle_endtag(self, tag):
+        if tag == "div" and self._div_depth:
+            self._div_depth -= 1
+        elif tag == "thead":
+            self._in_thead = False
+        elif tag == "th" and self._current_header is not None:
+            self.headers.append(" ".join(self._current_header.split()))
+            self._current_header = None
+        elif tag == "tbody":
+            self._in_tbody = False
+        elif tag == "td" and self._current_cell is not None:
+            self._current_row.append(" ".join(self._current_cell.split()))
+            self._current_cell = None
+        elif tag == "tr" and self._current_row is not None:
+            self.rows.append(self._current_row)
+            self._current_row = None
+
+    def handle_data(self, data):
+        if self._current_cell is not None:
+            self._current_cell += data
+        elif self._current_header is not None:
+            self._current_header += data
+
+def parse_assignments_page(html: str) -> dict:
+    """
+    @brief Parses an Assignments.php response into courses and assignment rows.
+    @param html The raw HTML of the page.
+    @return Dictionary with course list, the ID of the selected course, table items (same keys as the in-browser evaluate)
+            and the user header text.
+    """
+    parser = AssignmentsPageParser()
+    parser.feed(html)
+    parser.close()
+
+    items = []
+    # The first row of the table body is the header row, mirror the browser-side slice(1)
+    for row in parser.rows[1:]:
+        cells = [cell for cell in row if cell["tag"] == "td"]
+        if len(cells) < 8:
+            continue
+        items.append({
+            "action": cells[6]["text"],
+            "assignment_number": cells[0]["text"].strip(),
+            "assignment_name": " ".join(cells[1]["text"].split()),
+            "deadline_text": cells[7]["small_text"].strip(),
+            "deadline_title": cells[7]["small_title"] or "",
+            "download_url": cells[2]["href"] or ""
+        })
+
+    return {
+        "courses": [course for course in parser.courses if course["id"] != ""],
+        "selected_course": parser.selected_course,
+        "items": items,
+        "user_header": " ".join(parser.user_header.split())
+    }
+
+def save_session_cookies(cookies: list, data_dir: str):
+    """
+    @brief Exports the university cookies of a browser context next to the profile for the HTTP engine.
+    @param cookies List of cookie dictionaries as returned by BrowserContext.cookies().
+    @param data_dir The persistent browser profile directory.
+    @return None
+    """
+    session_cookies = [cookie for cookie in cookies if portal.is_portal_cookie(cookie)]
+    if not session_cookies:
+        return
+
+    os.makedirs(data_dir, exist_ok=True)
+    cookie_file = os.path.join(data_dir, COOKIE_FILE_NAME)
+    with open(cookie_file, "w", encoding="utf-8") as f:
+        json.dump(session_cookies, f)
+
+def session_from_cookies(cookies: list, pool_size: int = 10) -> requests.Session:
+    """
+    @brief Builds a pooled requests session carrying the given browser cookies.
+    @param cookies List of cookie dictionaries in the BrowserContext.cookies() format.
+    @param pool_size Maximum number of kept-alive connections per host.
+    @return requests.Session carrying the unexpired cookies.
+    """
+    now = datetime.now().timestamp()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+
+    for cookie in cookies:
+        expires = cookie.get("expires", -1)
+        if expires and expires > 0 and expires < now:
+            continue
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie["domain"],
+            path=cookie.get("path", "/"),
+            secure=cookie.get("secure", False)
+        )
+
+    return session
+
+def load_session(data_dir: str, pool_size: int = 10) -> requests.Session:
+    """
+    @brief Builds a pooled requests session from the cookies exported by save_session_cookies.
+    @param data_dir The persistent browser profile directory.
+    @param pool_size Maximum number of kept-alive connections per host.
+    @return requests.Session carrying the stored cookies.
+    @throws SessionExpiredError If no usable cookies are stored.
+    """
+    cookie_file = os.path.join(data_dir, COOKIE_FILE_NAME)
+    if not os.path.exists(cookie_file):
+        raise SessionExpiredError("No stored session cookies found.")
+
+    with open(cookie_file, "r", encoding="utf-8") as f:
+        session = session_from_cookies(json.load(f), pool_size)
+
+    if not session.cookies:
+        raise SessionExpiredError("Stored session cookies have expired.")
+
+    return session
+
+def fetch_page(session: requests.Session, url: str, enrollment_number: str = "", course_id: str = "") -> dict:
+    """
+    @brief Requests an LMS assignments page and verifies the session is still valid.
+    @param session The requests session carrying the LMS cookies.
+    @param url The assignments URL to request.
+    @param enrollment_number Optional enrollment number the session must belong to.
+    @param course_id Optional ID of the course the page must show the table of.
+    @return Parsed page dictionary from parse_assignments_page.
+    @throws SessionExpiredError If the LMS redirected away, the account does not match or another course is shown.
+    """
+    response = session.get(url, timeout=30)
+    response.raise_for_status()
+
+    if not response.url.startswith(LMS_STUDENT_URL):
+        raise SessionExpiredError(f"Redirected to {response.url}")
+
+    page = parse_assignments_page(response.text)
+    if not page["courses"]:
+        raise SessionExpiredError("Assignments page did not contain a course list.")
+    if enrollment_number and page["user_header"] and enrollment_number not in page["user_header"]:
+        raise SessionExpiredError("Stored session belongs to a different account.")
+    # If the LMS ignored the course parameter the table is the one of another course, let the browser read it instead
+    if course_id and page["selected_course"] != course_id:
+        raise SessionExpiredError(f"Assignments page showed course {page['selected_course'] or 'none'} instead of {course_id}.")
+
+    return page
+
+def fetch_attendance(session: requests.Session) -> list:
+    """
+    @brief Reads StudentWiseAttendance.aspx on CMS without a browser.
+    @param session The requests session carrying the CMS cookies.
+    @return List of dictionaries with subject, credits, absences and every other column of every row (see attendanceTable.attendance_rows).
+    @throws SessionExpiredError If CMS redirected to the login or survey page.
+    """
+    response = session.get(CMS_ATTENDANCE_URL, timeout=30)
+    response.raise_for_status()
+
+    if "StudentWiseAttendance.aspx" not in response.url:
+        raise SessionExpiredError(f"Redirected to {response.url}")
+
+    parser = AttendancePageParser()
+    parser.feed(response.text)
+    parser.close()
+
+    return attendanceTable.attendance_rows({"headers": parser.headers, "rows": parser.rows})
+
+def probe_session(data_dir: str, enrollment_number: str = "", pool_size: int = 10) -> tuple:
+    """
+    @brief Decides with the stored cookies whether a browser is needed, without launching one.
+    @param data_dir The persistent browser profile directory.
+    @param enrollment_number Optional enrollment number the session must belong to.
+    @param pool_size Maximum number of kept-alive connections per host for the returned session.
+    @return Tuple of (status, session, page): one of the SESSION_* constants, the pooled session
+            (None if no cookies are stored) and the parsed Assignments.php when the status is SESSION_VALID.
+            SESSION_UNKNOWN means the portals could not be reached (offline, DNS failure, LMS down).
+    """
+    try:
+        session = load_session(data_dir, pool_size)
+    except SessionExpiredError:
+        return SESSION_EXPIRED, None, None
+
+    try:
+        # The assignments page is needed by the HTTP engine anyway, so the probe costs no extra request
+        response = session.get(LMS_ASSIGNMENTS_URL, timeout=15)
+        if response.ok and response.url.startswith(LMS_STUDENT_URL):
+            page = parse_assignments_page(response.text)
+            if page["courses"]:
+                if enrollment_number and page["user_header"] and enrollment_number not in page["user_header"]:
+                    return SESSION_MISMATCH, session, None
+                return SESSION_VALID, session, page
+
+        # LMS session is gone, CMS tells whether we are still logged in there or held by a survey
+        response = session.get(CMS_LOGIN_URL, timeout=15)
+        if "QualityAssuranceSurveys.aspx" in response.url:
+            return SESSION_SURVEY, session, None
+        if "Login.aspx" in response.url:
+            return SESSION_EXPIRED, session, None
+        return SESSION_CMS_ONLY, session, None
+    except requests.RequestException:
+        # Only a redirect to Login.aspx proves the session expired, a network error says nothing about it
+        return SESSION_UNKNOWN, session, None
+
+def fetch_assignments(session: requests.Session, downloader, enrollment_number: str = "", debug_mode: bool = False, first_page: dict = None) -> tuple[list, list]:
+    """
+    @brief Fetches all assignments from the LMS without a browser.
+    @param session The requests session carrying the LMS cookies.
+    @param downloader Optional AssignmentDownloader that assignment files are queued on, None to skip downloads.
+    @param enrollment_number Optional enrollment number the session must belong to.
+    @param debug_mode Boolean flag to enable debug output.
+    @param first_page Already parsed Assignments.php (e.g. from probe_session), saves one request.
+    @return Tuple of (deadlines, assignment links) matching the browser engine's output.
+    @throws SessionExpiredError If the stored session is no longer valid.
+    """
+    deadlines = []
+    links = []
+
+    def download(subject_name: str, assignment_name: str, deadline_date: str, link: str):
+        links.append(link)
+        return downloader.submit(subject_name, assignment_name, deadline_date, link)
+
+    courses = (first_page or fetch_page(session, LMS_ASSIGNMENTS_URL, enrollment_number))["courses"]
+
+    for course in courses:
+        if debug_mode:
+            print(f"Fetching assignments for {course['name']} over HTTP")
+
+        table_data = fetch_page(session, LMS_COURSE_ASSIGNMENTS_URL.format(course_id=course["id"]), course_id=course["id"])["items"]
+        deadlines += [deadline for deadline, _ in courseTables.table_deadlines(course['name'], table_data, download if downloader else None)]
+
+    return deadlines, links
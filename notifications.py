@@ -0,0 +1,178 @@
+from requests.adapters import HTTPAdapter
+import requests
+import os
+
+DEFAULT_NTFY_BASE_URL = "https://ntfy.sh"
+
+def deadline_title(days_left: int) -> str:
+    """
+    @brief Maps the days left until a deadline to its notification title (urgency bucket).
+    @param days_left Number of days until the deadline.
+    @return Notification title of the bucket.
+    """
+    if days_left == 0:
+        return "Assignment Due Today"
+    elif days_left <= 4:
+        return "Assignment Due in Next 4 Days"
+    elif days_left <= 7:
+        return "Assignment Due in Next 7 Days"
+    elif days_left <= 14:
+        return "Assignment Due in Next 14 Days"
+    return "Upcoming Assignments"
+
+class NtfyClient:
+    """
+    @brief Sends ntfy notifications over one pooled, kept-alive HTTP session.
+    """
+    def __init__(self, topic: str, base_url: str = "", timeout: int = 10):
+        """
+        @brief Creates the pooled session.
+        @param topic The ntfy server name/topic to send notifications to.
+        @param base_url The ntfy server base URL, defaults to NTFY_BASE_URL or https://ntfy.sh.
+        @param timeout Seconds to wait for each request.
+        """
+        self.topic = topic
+        self.base_url = (base_url or os.getenv("NTFY_BASE_URL", "") or DEFAULT_NTFY_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    @property
+    def topic_url(self) -> str:
+        """
+        @brief Full URL of the topic on the configured server.
+        """
+        return f"{self.base_url}/{self.topic}"
+
+    def send(self, title: str, message: str, priority: int, file_path: str = "") -> bool:
+        """
+        @brief Sends one notification, optionally with a file attachment.
+        @param title The title of the notification.
+        @param message The message body of the notification.
+        @param priority The priority level of the notification (1-5).
+        @param file_path Optional file path to attach to the notification.
+        @return True if the server accepted the notification.
+        """
+        if not self.topic:
+            print("ntfy_server is not set. Cannot send notification.")
+            return False
+
+        try:
+            if file_path:
+                with open(file_path, "rb") as f:
+                    response = self.session.put(
+                        self.topic_url,
+                        data=f,
+                        headers={"Title": title, "Priority": str(priority), "File": os.path.basename(file_path)},
+                        params={"message": message},
+                        timeout=self.timeout
+                    )
+            else:
+                response = self.session.post(
+                    self.topic_url,
+                    data=message.encode("utf-8"),
+                    headers={"Title": title, "Priority": str(priority)},
+                    timeout=self.timeout
+                )
+            response.raise_for_status()
+            return True
+        except (requests.RequestException, OSError) as e:
+            print(f"Failed to send notification '{title}': {e}")
+            return False
+
+    def send_all(self, notifications: list, digest: bool = False) -> list:
+        """
+        @brief Sends a batch of notifications, either one by one or as one digest message per title.
+        @param notifications List of (title, message, priority, file_path) tuples, in display order.
+        @param digest Boolean flag to group messages sharing a title into a single notification.
+        @return List of the notification tuples the server did not accept (every member of a failed digest).
+        """
+        if not digest:
+            return [notification for notification in notifications if not self.send(*notification)]
+
+        failures = []
+        buckets = {}
+        for notification in notifications:
+            title, message, priority, file_path = notification
+            # An attachment cannot be merged into a digest, it keeps its own message
+            if file_path:
+                if not self.send(title, message, priority, file_path):
+                    failures.append(notification)
+                continue
+            bucket = buckets.setdefault(title, {"members": [], "priority": priority})
+            bucket["members"].append(notification)
+            bucket["priority"] = max(bucket["priority"], priority)
+
+        for title, bucket in buckets.items():
+            if not self.send(title, "\n".join(message.strip() for _, message, _, _ in bucket["members"]), bucket["priority"]):
+                failures.extend(bucket["members"])
+
+        return failures
+
+class KdeConnectClient:
+    """
+    @brief Sends KDE Connect pings over one D-Bus connection, falling back to kdeconnect-cli calls.
+    """
+    def __init__(self, device_id: str, use_dbus: bool = True):
+        """
+        @brief Connects to the KDE Connect daemon on the session bus if dbus-python is available.
+        @param device_id The KDE Connect device ID to ping.
+        @param use_dbus Boolean flag to try D-Bus before the CLI.
+        """
+        self.device_id = device_id
+        self.ping_interface = None
+
+        if use_dbus:
+            try:
+                import dbus
+                bus = dbus.SessionBus()
+                proxy = bus.get_object("org.kde.kdeconnect", f"/modules/kdeconnect/devices/{device_id}/ping")
+                self.ping_interface = dbus.Interface(proxy, "org.kde.kdeconnect.device.ping")
+            except Exception:
+                # dbus-python missing, no session bus or daemon not running, the CLI path still works
+                self.ping_interface = None
+
+    def send_all(self, messages: list) -> list:
+        """
+        @brief Sends every message as a ping to the device.
+        @param messages List of message strings.
+        @return List of (message, error) tuples for the pings that failed.
+        """
+        if self.ping_interface is not None:
+            failed = []
+            for message in messages:
+                try:
+                    self.ping_interface.sendPing(message)
+                except Exception:
+                    failed.append(message)
+            # A ping the daemon rejected gets one more try through the CLI
+            return self._send_all_cli(failed)
+
+        return self._send_all_cli(messages)
+
+    def _send_all_cli(self, messages: list) -> list:
+        """
+        @brief Runs one kdeconnect-cli process per message, one after another so the pings arrive in order.
+        @param messages List of message strings.
+        @return List of (message, error) tuples for the pings that failed.
+        """
+        import subprocess
+
+        failures = []
+        for message in messages:
+            try:
+                result = subprocess.run(
+                    ["kdeconnect-cli", "--device", self.device_id, "--ping-msg", message],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+            except OSError as e:
+                failures.append((message, str(e)))
+                continue
+
+            if result.returncode != 0:
+                failures.append((message, result.stderr.strip() or f"kdeconnect-cli exited with {result.returncode}"))
+
+        return failures
@@ -0,0 +1,21 @@
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+import os
+
+# The base URLs can be pointed at a local copy of the portals (see benchmarks/mockPortal.py)
+load_dotenv()
+LMS_BASE_URL = os.getenv("LMS_BASE_URL", "https://lms.bahria.edu.pk").rstrip("/")
+CMS_BASE_URL = os.getenv("CMS_BASE_URL", "https://cms.bahria.edu.pk").rstrip("/")
+
+def is_portal_cookie(cookie: dict) -> bool:
+    """
+    @brief Checks whether a browser cookie belongs to the LMS or CMS.
+    @param cookie Cookie dictionary as returned by BrowserContext.cookies().
+    @return True if the cookie domain is (a parent domain of) the LMS or CMS host.
+    """
+    domain = cookie["domain"].lstrip(".")
+    for base_url in (LMS_BASE_URL, CMS_BASE_URL):
+        host = urlsplit(base_url).hostname or ""
+        if host == domain or host.endswith("." + domain):
+            return True
+    return False
@@ -0,0 +1,198 @@
+from dotenv import load_dotenv
+import argparse
+import shutil
+import glob
+import time
+import os
+
+load_dotenv()
+data_dir = os.getenv("USER_DATA_DIR", "")
+profile_cache_mb = int(os.getenv("PROFILE_CACHE_MB", "32"))
+profile_maintenance_days = float(os.getenv("PROFILE_MAINTENANCE_DAYS", "1"))
+
+CACHE_DIR_NAME = "playwrightCache"
+MAINTENANCE_FILE_NAME = ".lastMaintenance"
+
+# Parts of the Chromium profile, relative to USER_DATA_DIR. Only the cookies and local storage are needed by the scripts,
+# everything else is rebuilt by Chromium on demand or never used by the portals.
+PROFILE_COMPONENTS = {
+    "cookies": ["Default/Cookies", "Default/Cookies-journal", "Default/Network/Cookies", "Default/Network/Cookies-journal"],
+    "local_storage": ["Default/Local Storage"],
+    "http_cache": [CACHE_DIR_NAME, "Default/Cache"],
+    "code_cache": ["Default/Code Cache", "Default/GPUCache", "Default/DawnCache", "Default/DawnGraphiteCache", "Default/DawnWebGPUCache", "ShaderCache", "GrShaderCache", "GraphiteDawnCache"],
+    "service_workers": ["Default/Service Worker"],
+    "other_storage": ["Default/IndexedDB", "Default/File System", "Default/blob_storage", "Default/Session Storage", "Default/Sessions", "Default/databases", "Default/shared_proto_db", "Default/WebStorage", "Default/Shared Dictionary"],
+    "history": ["Default/History*", "Default/Favicons*", "Default/Top Sites*", "Default/Visited Links", "Default/Network Action Predictor*", "Default/Shortcuts*", "Default/Web Data*"],
+    "diagnostics": ["Crashpad", "BrowserMetrics*", "Default/optimization_guide_*", "optimization_guide_*", "component_crx_cache", "Safe Browsing", "segmentation_platform"]
+}
+KEPT_COMPONENTS = ["cookies", "local_storage"]
+PRUNED_COMPONENTS = [name for name in PROFILE_COMPONENTS if name not in KEPT_COMPONENTS]
+
+def cache_args(user_data_dir: str) -> list:
+    """
+    @brief Chromium flags that keep the disk cache inside the profile and small.
+    @param user_data_dir The profile directory.
+    @return List of command-line flags.
+    """
+    return [
+        f"--disk-cache-dir={os.path.join(user_data_dir, CACHE_DIR_NAME)}",
+        f"--disk-cache-size={profile_cache_mb * 1024 * 1024}"
+    ]
+
+def path_size(path: str) -> int:
+    """
+    @brief Calculates the size of a file or directory tree.
+    @param path Path of the file or directory.
+    @return Size in bytes, 0 if it does not exist.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+def component_paths(user_data_dir: str, component: str) -> list:
+    """
+    @brief Lists the existing paths of a profile component.
+    @param user_data_dir The profile directory.
+    @param component Name of the component in PROFILE_COMPONENTS.
+    @return List of paths.
+    """
+    paths = []
+    for pattern in PROFILE_COMPONENTS[component]:
+        paths.extend(glob.glob(os.path.join(glob.escape(user_data_dir), pattern)))
+    return paths
+
+def profile_report(user_data_dir: str) -> dict:
+    """
+    @brief Measures the profile by component.
+    @param user_data_dir The profile directory.
+    @return Dictionary of component name to size in bytes, "other" holds everything not listed (including the scripts' own state).
+    """
+    report = {component: sum(path_size(path) for path in component_paths(user_data_dir, component)) for component in PROFILE_COMPONENTS}
+    report["other"] = max(0, path_size(user_data_dir) - sum(report.values()))
+    return report
+
+def print_report(report: dict):
+    """
+    @brief Prints the size of every component.
+    @param report Dictionary returned by profile_report.
+    @return None
+    """
+    for component, size in report.items():
+        status = "kept" if component in KEPT_COMPONENTS or component == "other" else "pruned"
+        print(f"{component:<20}{size / 1024 / 1024:>10.1f} MB  ({status})")
+    print(f"{'total':<20}{sum(report.values()) / 1024 / 1024:>10.1f} MB")
+
+def browser_running(user_data_dir: str) -> bool:
+    """
+    @brief Checks whether a Chromium instance holds the profile.
+    @param user_data_dir The profile directory.
+    @return True if the profile is locked by a running browser.
+    """
+    lock = os.path.join(user_data_dir, "SingletonLock")
+    if os.name == "nt":
+        lock_file = os.path.join(user_data_dir, "lockfile")
+        if not os.path.exists(lock_file):
+            return False
+        try:
+            # Windows keeps the lockfile open while Chromium runs, so it cannot be removed
+            os.remove(lock_file)
+            return False
+        except OSError:
+            return True
+
+    if not os.path.lexists(lock):
+        return False
+    try:
+        # The lock is a symlink to "<hostname>-<pid>", a stale one is left behind by a crashed browser
+        pid = int(os.readlink(lock).rsplit("-", 1)[1])
+        os.kill(pid, 0)
+        return True
+    except (OSError, ValueError, IndexError):
+        return False
+
+def prune_profile(user_data_dir: str, components: list = PRUNED_COMPONENTS, debug_mode: bool = False) -> int:
+    """
+    @brief Deletes the given components of a profile that is not in use.
+    @param user_data_dir The profile directory.
+    @param components Names of the components to delete, the cookies and local storage are never deleted.
+    @param debug_mode Boolean flag to print every deleted path.
+    @return Number of bytes freed, -1 if a browser is using the profile.
+    """
+    if browser_running(user_data_dir):
+        return -1
+
+    freed = 0
+    for component in components:
+        if component in KEPT_COMPONENTS:
+            continue
+        for path in component_paths(user_data_dir, component):
+            size = path_size(path)
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                freed += size
+                if debug_mode:
+                    print(f"Deleted {path} ({size / 1024 / 1024:.1f} MB)")
+            except OSError as e:
+                print(f"Failed to delete {path}: {e}")
+
+    with open(os.path.join(user_data_dir, MAINTENANCE_FILE_NAME), "w") as f:
+        f.write(str(time.time()))
+    return freed
+
+def maintain_profile(user_data_dir: str, debug_mode: bool = False):
+    """
+    @brief Prunes the profile before a launch if the last maintenance is older than PROFILE_MAINTENANCE_DAYS.
+    @param user_data_dir The profile directory.
+    @param debug_mode Boolean flag to print what was freed.
+    @return None
+    """
+    if profile_maintenance_days <= 0 or not os.path.isdir(user_data_dir):
+        return
+
+    marker = os.path.join(user_data_dir, MAINTENANCE_FILE_NAME)
+    if os.path.exists(marker) and time.time() - os.path.getmtime(marker) < profile_maintenance_days * 86400:
+        return
+
+    freed = prune_profile(user_data_dir, debug_mode=debug_mode)
+    if debug_mode and freed >= 0:
+        print(f"Profile maintenance freed {freed / 1024 / 1024:.1f} MB")
+
+def parse_args():
+    """
+    @brief Parses command-line arguments for the profile maintenance command.
+    @return Parsed arguments object with data_dir, prune, components and debug options.
+    """
+    parser = argparse.ArgumentParser(description="Report and prune the Chromium profile in USER_DATA_DIR")
+    parser.add_argument("-u", "--data-dir", default=data_dir, help="Profile directory (default: USER_DATA_DIR)")
+    parser.add_argument("-p", "--prune", action="store_true", help="Delete the caches and storage the scripts do not use")
+    parser.add_argument("-c", "--components", nargs="*", choices=PRUNED_COMPONENTS, default=PRUNED_COMPONENTS, help="Components to prune")
+    parser.add_argument("-d", "--debug", action="store_true", help="Enable debug mode")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.data_dir == "" or not os.path.isdir(args.data_dir):
+        print("Error: USER_DATA_DIR is not set or does not exist.")
+        exit(1)
+
+    print_report(profile_report(args.data_dir))
+
+    if args.prune:
+        freed = prune_profile(args.data_dir, args.components, args.debug)
+        if freed < 0:
+            print("\nThe profile is in use by a running browser, close it and try again.")
+            exit(1)
+        print(f"\nFreed {freed / 1024 / 1024:.1f} MB\n")
+        print_report(profile_report(args.data_dir))
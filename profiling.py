@@ -0,0 +1,236 @@
+from contextlib import contextmanager, nullcontext
+import threading
+import time
+import json
+import os
+
+NULL_SPAN = nullcontext()
+
+class Profiler:
+    """
+    @brief Records timing spans and counters of a run, doing nothing until enable() is called.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.trace_file = ""
+        self.tracing_context = None
+        self.slowest_trace = None
+
+    def enable(self, trace_file: str = ""):
+        """
+        @brief Starts recording spans and counting HTTP calls.
+        @param trace_file Optional path the Playwright trace of the slowest traced span is saved to.
+        @return None
+        """
+        self.enabled = True
+        self.started = time.perf_counter()
+        self.trace_file = trace_file
+        self._count_http_calls()
+
+    def span(self, name: str, trace: bool = False):
+        """
+        @brief Times the enclosed block, e.g. `with profiler.span("login"):`.
+        @param name Name of the stage, nested spans are reported as "outer/inner".
+        @param trace Boolean flag to record this (top-level) span as a Playwright trace chunk.
+        @return Context manager, a shared no-op one while profiling is disabled.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return self._span(name, trace)
+
+    @contextmanager
+    def _span(self, name: str, trace: bool):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(name)
+        path = "/".join(stack)
+
+        tracing = trace and self.tracing_context is not None and len(stack) == 1
+        if tracing:
+            self.tracing_context.tracing.start_chunk(title=name)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            with self.lock:
+                self.spans.append({
+                    "name": name,
+                    "path": path,
+                    "start": round(start - self.started, 4),
+                    "seconds": round(seconds, 4),
+                    "thread": threading.current_thread().name
+                })
+            if tracing:
+                self._stop_chunk(name, seconds)
+
+    def count(self, name: str, amount: int = 1):
+        """
+        @brief Adds to a counter, e.g. navigations or bytes downloaded.
+        @param name Name of the counter.
+        @param amount Amount to add.
+        @return None
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def instrument_context(self, context):
+        """
+        @brief Counts navigations, requests and evaluate calls of a (sync) browser context and starts tracing if requested.
+        @param context The BrowserContext to instrument.
+        @return None
+        """
+        if not self.enabled:
+            return
+
+        context.on("request", self._on_request)
+        context.on("page", self.instrument_page)
+        for page in context.pages:
+            self.instrument_page(page)
+
+        if self.trace_file and self.tracing_context is None:
+            context.tracing.start(screenshots=True, snapshots=True)
+            self.tracing_context = context
+
+    def instrument_page(self, page):
+        """
+        @brief Counts the evaluate calls of a page.
+        @param page The Page to instrument.
+        @return None
+        """
+        evaluate = page.evaluate
+
+        def counted_evaluate(*args, **kwargs):
+            self.count("evaluations")
+            return evaluate(*args, **kwargs)
+
+        page.evaluate = counted_evaluate
+
+    def stop_tracing(self):
+        """
+        @brief Ends the Playwright trace, must be called before the traced context is closed.
+        @return None
+        """
+        if self.tracing_context is not None:
+            try:
+                self.tracing_context.tracing.stop()
+            except Exception as e:
+                print(f"Failed to stop tracing: {e}")
+            self.tracing_context = None
+
+    def _on_request(self, request):
+        self.count("browser_requests")
+        if request.is_navigation_request():
+            self.count("navigations")
+
+    def _stop_chunk(self, name: str, seconds: float):
+        """
+        @brief Keeps the trace chunk of a span only if it is the slowest one so far.
+        @return None
+        """
+        try:
+            if self.slowest_trace is None or seconds > self.slowest_trace["seconds"]:
+                self.tracing_context.tracing.stop_chunk(path=self.trace_file)
+                self.slowest_trace = {"span": name, "seconds": round(seconds, 4), "file": self.trace_file}
+            else:
+                self.tracing_context.tracing.stop_chunk()
+        except Exception as e:
+            print(f"Failed to save trace chunk of {name}: {e}")
+
+    def _count_http_calls(self):
+        """
+        @brief Counts every requests call (downloads, ntfy, the HTTP engine, update checks) and its response size.
+        @return None
+        """
+        import requests
+
+        send = requests.Session.send
+        profiler = self
+
+        def counted_send(session, request, **kwargs):
+            response = send(session, request, **kwargs)
+            profiler.count("http_calls")
+            profiler.count("http_bytes", int(response.headers.get("Content-Length") or 0))
+            return response
+
+        requests.Session.send = counted_send
+
+    def summary(self) -> list:
+        """
+        @brief Aggregates the spans by path, in the order they were first entered.
+        @return List of dictionaries with path, calls, total and max seconds.
+        """
+        rows = {}
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: (span["start"], span["path"].count("/")))
+        for span in spans:
+            row = rows.setdefault(span["path"], {"path": span["path"], "calls": 0, "total": 0.0, "max": 0.0})
+            row["calls"] += 1
+            row["total"] += span["seconds"]
+            row["max"] = max(row["max"], span["seconds"])
+        return list(rows.values())
+
+    def print_table(self):
+        """
+        @brief Prints the spans and counters as a table.
+        @return None
+        """
+        total = time.perf_counter() - self.started
+        print(f"\n{'Stage':<40}{'Calls':>7}{'Total':>10}{'Max':>10}{'Share':>8}")
+        for row in self.summary():
+            print(f"{row['path']:<40}{row['calls']:>7}{row['total']:>9.3f}s{row['max']:>9.3f}s{row['total'] / total * 100 if total else 0:>7.1f}%")
+        print(f"{'Total run time':<40}{'':>7}{total:>9.3f}s")
+
+        if self.counters:
+            print()
+            for name, value in sorted(self.counters.items()):
+                print(f"{name:<40}{value:>17}")
+        if self.slowest_trace:
+            print(f"\nTrace of the slowest stage ({self.slowest_trace['span']}) saved to {self.slowest_trace['file']}")
+
+    def write_json(self, path: str):
+        """
+        @brief Writes the spans, their summary and the counters to a JSON file.
+        @param path Path of the JSON file.
+        @return None
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "total_seconds": round(time.perf_counter() - self.started, 4),
+                "summary": self.summary(),
+                "spans": spans,
+                "counters": counters,
+                "trace": self.slowest_trace
+            }, f, indent=2)
+
+    def report(self, table: bool, json_file: str = ""):
+        """
+        @brief Prints and/or writes the report if profiling is enabled.
+        @param table Boolean flag to print the table.
+        @param json_file Optional path of the JSON report.
+        @return None
+        """
+        if not self.enabled:
+            return
+        if table:
+            self.print_table()
+        if json_file:
+            self.write_json(json_file)
+            print(f"Profile written to {json_file}")
+
+profiler = Profiler()
@@ -0,0 +1,38 @@
+from time import monotonic, sleep
+import threading
+
+class TokenBucket:
+    """
+    @brief Limits requests to `rate` per second on average while allowing bursts of up to `capacity` requests.
+    """
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        @brief Creates a full bucket.
+        @param rate Tokens added per second, 0 or less disables the limit.
+        @param capacity Maximum number of tokens, i.e. requests that may start at once.
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        @brief Takes a token, sleeping until one is available.
+        @return Seconds spent waiting.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # The token is reserved before sleeping, so concurrent callers queue up behind each other
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            sleep(wait)
+        return wait
@@ -0,0 +1,105 @@
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+import re
+import os
+import portal
+from profiling import profiler
+
+load_dotenv()
+block_audit = int(os.getenv("BLOCK_AUDIT", "0"))
+
+# Hosts whose scripts are allowed to run, the portals work without the LMS' and everyone else's scripts
+SCRIPT_HOSTS = [urlsplit(portal.CMS_BASE_URL).netloc]
+
+# (rule, URL regex) pairs, only requests matching one of them are routed through Python at all
+BLOCK_RULES = [
+    ("assets", r"\.(?:png|jpe?g|gif|webp|svg|ico|bmp|css|woff2?|ttf|otf|eot|mp3|mp4|ogg|wav|webm)(?:[?#]|$)"),
+    ("trackers", r"google-analytics|googletagmanager|fontawesome"),
+    ("foreign_scripts", r"^[a-z]+://(?!(?:{hosts})/)[^/]+/[^?#]*\.js(?:[?#]|$)")
+]
+
+class RequestBlocker:
+    """
+    @brief Aborts images, styles, fonts, trackers and foreign scripts with one narrow route per rule and counts what each rule blocked.
+    """
+    def __init__(self, rules: list = None, script_hosts: list = None, audit: bool = bool(block_audit)):
+        """
+        @brief Compiles the rules once, the host allow-list is baked into the foreign_scripts pattern.
+        @param rules List of (rule, URL regex) pairs, defaults to BLOCK_RULES.
+        @param script_hosts List of hosts (with port) scripts may be loaded from, defaults to SCRIPT_HOSTS.
+        @param audit Boolean flag to let every request through and only measure what the rules would have blocked.
+        """
+        hosts = "|".join(re.escape(host) for host in (script_hosts or SCRIPT_HOSTS))
+        self.rules = [(name, re.compile(pattern.replace("{hosts}", hosts), re.IGNORECASE)) for name, pattern in (rules or BLOCK_RULES)]
+        self.audit = audit
+        self.stats = {name: {"requests": 0, "bytes": 0} for name, _ in self.rules}
+
+    def install(self, context):
+        """
+        @brief Registers the rules on a (sync) BrowserContext or persistent context.
+        @param context The BrowserContext to block requests in.
+        @return None
+        """
+        if self.audit:
+            context.on("requestfinished", self._audit_request)
+            return
+        for name, pattern in self.rules:
+            context.route(pattern, self._handler(name))
+
+    async def install_async(self, context):
+        """
+        @brief Registers the rules on an async BrowserContext.
+        @param context The async BrowserContext to block requests in.
+        @return None
+        """
+        if self.audit:
+            context.on("requestfinished", self._audit_request)
+            return
+        for name, pattern in self.rules:
+            await context.route(pattern, self._handler(name))
+
+    def _handler(self, name: str):
+        """
+        @brief Builds the route handler of a rule, the returned coroutine is awaited by the async API.
+        @param name Name of the rule.
+        @return Route handler that counts and aborts the request.
+        """
+        def block(route):
+            self._record(name, 0)
+            return route.abort()
+
+        return block
+
+    def _record(self, name: str, size: int):
+        self.stats[name]["requests"] += 1
+        self.stats[name]["bytes"] += size
+        profiler.count(f"blocked_{name}_requests")
+        if size:
+            profiler.count(f"blocked_{name}_bytes", size)
+
+    def _audit_request(self, request):
+        """
+        @brief Attributes a finished request and its response size to the first rule that would have blocked it.
+        @param request The finished Request.
+        @return None, or a coroutine with the async API.
+        """
+        name = next((name for name, pattern in self.rules if pattern.search(request.url)), None)
+        if name is None:
+            return None
+
+        sizes = request.sizes()
+        if hasattr(sizes, "__await__"):
+            return self._audit_request_async(name, sizes)
+        self._record(name, sizes["responseBodySize"] + sizes["responseHeadersSize"])
+
+    async def _audit_request_async(self, name: str, sizes):
+        sizes = await sizes
+        self._record(name, sizes["responseBodySize"] + sizes["responseHeadersSize"])
+
+    def summary(self) -> str:
+        """
+        @brief Formats the counters for debug output.
+        @return One line per rule with the requests and bytes it blocked.
+        """
+        verb = "would have blocked" if self.audit else "blocked"
+        return "\n".join(f"{name} {verb} {counts['requests']} requests ({counts['bytes']} bytes)" for name, counts in self.stats.items())
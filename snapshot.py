@@ -0,0 +1,40 @@
+import json
+import time
+import os
+
+# Next to the scripts like the .env it belongs to, so --cached can find it without loading the .env
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot.json")
+
+def save_snapshot(deadlines: list, snapshot_file: str = SNAPSHOT_FILE):
+    """
+    @brief Stores the deadlines of a successful scrape for --cached.
+    @param deadlines List of (assignment number, subject, deadline, submitted, extended) tuples.
+    @param snapshot_file Path of the snapshot.
+    @return None
+    """
+    temp_file = f"{snapshot_file}.tmp"
+    try:
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"saved": time.time(), "deadlines": deadlines}, f)
+        # Widgets may read the snapshot at any moment, they must never see a half-written file
+        os.replace(temp_file, snapshot_file)
+    except OSError as e:
+        print(f"Failed to save the deadline snapshot: {e}")
+
+def load_snapshot(max_age: float, snapshot_file: str = SNAPSHOT_FILE) -> list:
+    """
+    @brief Reads the deadlines of the last successful scrape if it is recent enough.
+    @param max_age Maximum age of the snapshot in minutes.
+    @param snapshot_file Path of the snapshot.
+    @return List of deadline tuples, or None if the snapshot is missing, unreadable or too old.
+    """
+    try:
+        with open(snapshot_file, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - snapshot.get("saved", 0) > max_age * 60:
+        return None
+
+    return [tuple(deadline) for deadline in snapshot.get("deadlines", [])]
@@ -0,0 +1,182 @@
+from datetime import datetime
+import sqlite3
+import os
+
+STATE_FILE_NAME = "state.db"
+
+# Reasons returned by StateStore.record_assignment
+CHANGE_NEW = "new"
+CHANGE_EXTENDED = "extended"
+CHANGE_BUCKET = "bucket"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    script TEXT NOT NULL,
+    started TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    subject TEXT NOT NULL,
+    assignment_number TEXT NOT NULL,
+    deadline TEXT NOT NULL,
+    submitted INTEGER NOT NULL,
+    extended INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    first_run INTEGER NOT NULL,
+    last_run INTEGER NOT NULL,
+    PRIMARY KEY (subject, assignment_number)
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    subject TEXT PRIMARY KEY,
+    credits TEXT NOT NULL,
+    absences REAL NOT NULL,
+    last_run INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attendance_history (
+    subject TEXT NOT NULL,
+    recorded TEXT NOT NULL,
+    credits TEXT NOT NULL,
+    absences REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attendance_history_subject_recorded ON attendance_history (subject, recorded);
+"""
+
+class StateStore:
+    """
+    @brief SQLite record of what previous runs saw, so notifications only fire on changes.
+    """
+    def __init__(self, db_path: str, script: str = None):
+        """
+        @brief Opens (and creates) the database and starts a new run.
+        @param db_path Path of the SQLite database file.
+        @param script Name of the script recording the run, None to only read the stored history.
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.run_id = None
+        if script:
+            self.run_id = self.connection.execute("INSERT INTO runs (script, started) VALUES (?, ?)", (script, self.started)).lastrowid
+
+    def assignment_change(self, subject: str, assignment_number: str, deadline: str, submitted: bool, extended: bool, bucket: str) -> str:
+        """
+        @brief Reports what changed since an assignment was last recorded, without storing anything.
+        @param subject The subject of the assignment.
+        @param assignment_number The assignment number within the subject.
+        @param deadline The deadline date as shown on the LMS.
+        @param submitted Boolean flag whether the assignment is submitted.
+        @param extended Boolean flag whether the deadline is extended.
+        @param bucket The urgency bucket (notification title) the assignment currently falls into.
+        @return One of CHANGE_NEW, CHANGE_EXTENDED, CHANGE_BUCKET, or None if nothing worth notifying changed.
+        """
+        previous = self.connection.execute(
+            "SELECT deadline, extended, bucket FROM assignments WHERE subject = ? AND assignment_number = ?",
+            (subject, assignment_number)
+        ).fetchone()
+
+        if previous is None:
+            return CHANGE_NEW
+        previous_deadline, previous_extended, previous_bucket = previous
+        if previous_deadline != deadline or (extended and not previous_extended):
+            return CHANGE_EXTENDED
+        if previous_bucket != bucket:
+            return CHANGE_BUCKET
+        return None
+
+    def record_assignment(self, subject: str, assignment_number: str, deadline: str, submitted: bool, extended: bool, bucket: str) -> str:
+        """
+        @brief Stores the current state of an assignment and reports what changed since the last run.
+        @param subject The subject of the assignment.
+        @param assignment_number The assignment number within the subject.
+        @param deadline The deadline date as shown on the LMS.
+        @param submitted Boolean flag whether the assignment is submitted.
+        @param extended Boolean flag whether the deadline is extended.
+        @param bucket The urgency bucket (notification title) the assignment currently falls into.
+        @return One of CHANGE_NEW, CHANGE_EXTENDED, CHANGE_BUCKET, or None if nothing worth notifying changed.
+        """
+        change = self.assignment_change(subject, assignment_number, deadline, submitted, extended, bucket)
+
+        self.connection.execute(
+            """INSERT INTO assignments (subject, assignment_number, deadline, submitted, extended, bucket, first_run, last_run)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (subject, assignment_number) DO UPDATE SET
+                   deadline = excluded.deadline, submitted = excluded.submitted, extended = excluded.extended,
+                   bucket = excluded.bucket, last_run = excluded.last_run""",
+            (subject, assignment_number, deadline, int(submitted), int(extended), bucket, self.run_id, self.run_id)
+        )
+        return change
+
+    def attendance_change(self, subject: str, credits: str, absences: float) -> bool:
+        """
+        @brief Reports whether a subject got new absences since it was last recorded, without storing anything.
+        @param subject The subject name.
+        @param credits The credit hours of the subject.
+        @param absences The current number of absences.
+        @return True if the subject is new or its absences increased.
+        """
+        previous = self.connection.execute("SELECT absences FROM attendance WHERE subject = ?", (subject,)).fetchone()
+        return previous is None or absences > previous[0]
+
+    def record_attendance(self, subject: str, credits: str, absences: float) -> bool:
+        """
+        @brief Stores the absences of a subject, adds them to its history if they changed, and reports whether new absences were added.
+        @param subject The subject name.
+        @param credits The credit hours of the subject.
+        @param absences The current number of absences.
+        @return True if the subject is new or its absences increased since the last run.
+        """
+        previous = self.connection.execute("SELECT credits, absences FROM attendance WHERE subject = ?", (subject,)).fetchone()
+
+        # Only changes are kept, an unchanged subject costs no row however often it is checked
+        if previous is None or previous != (credits, absences) or not self.connection.execute(
+            "SELECT 1 FROM attendance_history WHERE subject = ? LIMIT 1", (subject,)
+        ).fetchone():
+            self.connection.execute(
+                "INSERT INTO attendance_history (subject, recorded, credits, absences) VALUES (?, ?, ?, ?)",
+                (subject, self.started, credits, absences)
+            )
+
+        self.connection.execute(
+            """INSERT INTO attendance (subject, credits, absences, last_run) VALUES (?, ?, ?, ?)
+               ON CONFLICT (subject) DO UPDATE SET
+                   credits = excluded.credits, absences = excluded.absences, last_run = excluded.last_run""",
+            (subject, credits, absences, self.run_id)
+        )
+
+        return previous is None or absences > previous[1]
+
+    def current_attendance(self) -> list:
+        """
+        @brief Returns the subjects seen by the latest attendance check.
+        @return List of (subject, credits, absences, time of the check) tuples.
+        """
+        return self.connection.execute(
+            """SELECT attendance.subject, attendance.credits, attendance.absences, runs.started
+               FROM attendance JOIN runs ON runs.id = attendance.last_run
+               WHERE attendance.last_run = (SELECT MAX(last_run) FROM attendance)
+               ORDER BY attendance.subject"""
+        ).fetchall()
+
+    def attendance_history(self, subject: str, since: str = "") -> list:
+        """
+        @brief Returns the recorded changes of a subject's absences, oldest first.
+        @param subject The subject name.
+        @param since Optional ISO date, older changes are skipped.
+        @return List of (recorded, credits, absences) tuples.
+        """
+        return self.connection.execute(
+            "SELECT recorded, credits, absences FROM attendance_history WHERE subject = ? AND recorded >= ? ORDER BY recorded",
+            (subject, since)
+        ).fetchall()
+
+    def close(self):
+        """
+        @brief Commits the run and closes the database.
+        @return None
+        """
+        self.connection.commit()
+        self.connection.close()
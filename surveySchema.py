@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+
+# Next to the scripts like the deadline snapshot, the forms are the same for every account
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "surveySchemas.json")
+
+RADIO_PREFIX = "BodyPH_surveyUserControl_repeaterQuestionGroups_repeaterQuestions"
+DEMOGRAPHIC_GROUP = 11
+
+# Cheap fingerprint of the loaded form: its name, the number of radio buttons and the ID of the last one
+SIGNATURE_SCRIPT = """(prefix) => {
+    const radios = document.querySelectorAll(`input[type=radio][id^="${prefix}_"]`);
+    return {
+        name: document.querySelector("#BodyPH_surveyUserControl_lbName")?.innerText.trim() || "",
+        radios: radios.length,
+        last: radios.length ? radios[radios.length - 1].id : ""
+    };
+}"""
+
+# Reads every question group of the form with the text and number of options of each question
+SCHEMA_SCRIPT = """(prefix) => {
+    const pattern = new RegExp(`^${prefix}_(\\\\d+)_rbl_(\\\\d+)_(\\\\d+)_\\\\d+$`);
+    const groups = new Map();
+    for (const radio of document.querySelectorAll(`input[type=radio][id^="${prefix}_"]`)) {
+        const match = pattern.exec(radio.id);
+        if (!match) continue;
+        const [group, question, option] = match.slice(1).map(Number);
+        if (!groups.has(group)) groups.set(group, []);
+        const questions = groups.get(group);
+        questions[question] = Math.max(questions[question] || 0, option + 1);
+    }
+    return {
+        name: document.querySelector("#BodyPH_surveyUserControl_lbName")?.innerText.trim() || "",
+        groups: Array.from(groups.entries()).sort((a, b) => a[0] - b[0]).map(([group, questions]) => ({
+            group,
+            questions: Array.from(questions, (options, question) => ({
+                text: document.querySelector(`#${prefix}_${group}_divOptions_${question} > label`)?.innerText.trim() || "",
+                options: options || 0
+            }))
+        }))
+    };
+}"""
+
+_schemas = None
+
+def input_id(group: int, question: int, option: int) -> str:
+    """
+    @brief Builds the element ID of an answer.
+    @param group Index of the question group.
+    @param question Index of the question in its group.
+    @param option Index of the option.
+    @return The element ID.
+    """
+    return f"{RADIO_PREFIX}_{group}_rbl_{question}_{option}_{question}"
+
+def schema_key(signature: dict) -> str:
+    """
+    @brief Builds the cache key of a form from the survey name and a hash of its structure.
+    @param signature Dictionary returned by SIGNATURE_SCRIPT.
+    @return The key.
+    """
+    structure = hashlib.sha1(f"{signature['radios']}|{signature['last']}".encode("utf-8")).hexdigest()[:12]
+    return f"{signature['name']}|{structure}"
+
+def load_schemas(schema_file: str = SCHEMA_FILE) -> dict:
+    """
+    @brief Reads the cached form schemas, once per run.
+    @param schema_file Path of the cache.
+    @return Dictionary of cache key to schema, empty if the cache is missing or unreadable.
+    """
+    global _schemas
+    if _schemas is None:
+        try:
+            with open(schema_file, "r", encoding="utf-8") as f:
+                _schemas = json.load(f)
+        except (OSError, ValueError):
+            _schemas = {}
+    return _schemas
+
+def save_schemas(schemas: dict, schema_file: str = SCHEMA_FILE):
+    """
+    @brief Writes the cached form schemas.
+    @param schemas Dictionary of cache key to schema.
+    @param schema_file Path of the cache.
+    @return None
+    """
+    temp_file = f"{schema_file}.tmp"
+    try:
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(schemas, f, indent=2)
+        os.replace(temp_file, schema_file)
+    except OSError as e:
+        print(f"Failed to save the survey schemas: {e}")
+
+def survey_schema(page, debug_mode: bool = False) -> dict:
+    """
+    @brief Returns the schema of the loaded survey form, discovering it only if the form is not cached yet.
+    @param page The Playwright page object showing the survey form.
+    @param debug_mode Boolean flag to enable debug output.
+    @return Dictionary with the survey name and its groups, each a dictionary with group and questions
+            (a list of dictionaries with the question text and the number of options).
+    """
+    signature = page.evaluate(SIGNATURE_SCRIPT, RADIO_PREFIX)
+    key = schema_key(signature)
+    schemas = load_schemas()
+    if key in schemas:
+        return schemas[key]
+
+    schema = page.evaluate(SCHEMA_SCRIPT, RADIO_PREFIX)
+    if debug_mode:
+        print(f"Discovered {sum(len(group['questions']) for group in schema['groups'])} questions in {len(schema['groups'])} groups of {schema['name']}.")
+
+    if schema["groups"]:
+        # A changed form replaces the old schema of the same survey
+        for old_key in [old_key for old_key, old_schema in schemas.items() if old_schema["name"] == schema["name"]]:
+            del schemas[old_key]
+        schemas[key] = schema
+        save_schemas(schemas)
+    return schema